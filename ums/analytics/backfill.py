@@ -0,0 +1,159 @@
+"""
+Historical snapshot backfill: rebuild DailySnapshot and the DAY MetricSnapshot
+rows "as of" past dates from the source tables' own dates (admission_date,
+enrollment_date, paid_at, due_date, attendance date, exam date, ...).
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+from decimal import Decimal
+import django
+from django.db import connections, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from .models import DailySnapshot, SnapshotBackfill
+from .snapshots import invoices_as_of, overdue_as_of, record_daily_rows, rollup, rollup_periods
+from .utils import ADMIN_METRIC_DEFAULTS, try_import
+
+
+def historical_metrics(day):
+    """DailySnapshot values as they stood at the end of `day`, one query per table."""
+    res = dict(ADMIN_METRIC_DEFAULTS)
+
+    User = try_import('users.models.User')
+    StudentProfile = try_import('students.models.StudentProfile')
+    Enrollment = try_import('enrollments.models.Enrollment')
+    Attendance = try_import('attendance.models.Attendance')
+    Grade = try_import('exams.models.Grade')
+    RoomAllocation = try_import('hostel.models.RoomAllocation')
+    Room = try_import('hostel.models.Room')
+    MessSubscription = try_import('cafeteria.models.MessSubscription')
+    TransportPass = try_import('transport.models.TransportPass')
+    GymMembership = try_import('sports.models.GymMembership')
+
+    if User:
+        res['total_faculty'] = User.objects.filter(role='FACULTY', date_joined__date__lte=day).count()
+    if StudentProfile:
+        res['total_students'] = StudentProfile.objects.filter(admission_date__lte=day).count()
+    if Enrollment:
+        res['total_enrollments'] = Enrollment.objects.filter(enrollment_date__lte=day).count()
+
+    invoices = invoices_as_of(day)
+    if invoices is not None:
+        agg = invoices.aggregate(
+            collected=Sum('amount', filter=Q(is_paid=True, paid_day__lte=day)),
+            overdue=Sum('amount', filter=overdue_as_of(day)),
+        )
+        res['fees_collected'] = agg['collected'] or Decimal('0')
+        res['fees_overdue'] = agg['overdue'] or Decimal('0')
+
+    if Attendance:
+        agg = Attendance.objects.filter(date__lte=day).aggregate(
+            total=Count('id'), present=Count('id', filter=Q(status='PRESENT')))
+        res['attendance_avg_percent'] = (agg['present'] / agg['total'] * 100) if agg['total'] else 0.0
+
+    if Grade:
+        from exams.models import Exam
+        from exams.utils import grade_point_expression
+
+        agg = Grade.objects.filter(exam__date__lte=day, exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES).aggregate(
+            points=Sum(grade_point_expression() * F('enrollment__course__credits')),
+            credits=Sum('enrollment__course__credits'),
+        )
+        res['avg_gpa'] = round(agg['points'] / agg['credits'], 2) if agg['credits'] else 0.0
+
+    active_on_day = Q(start_date__lte=day) & (Q(end_date__isnull=True) | Q(end_date__gte=day))
+    if RoomAllocation and Room:
+        total_beds = Room.objects.aggregate(s=Sum('capacity'))['s'] or 0
+        occupied = RoomAllocation.objects.filter(active_on_day).count() if total_beds else 0
+        res['hostel_occupancy_percent'] = (occupied / total_beds * 100) if total_beds else 0.0
+    if MessSubscription:
+        res['cafeteria_active_subscriptions'] = MessSubscription.objects.filter(active_on_day).count()
+    if TransportPass:
+        res['transport_active_passes'] = TransportPass.objects.filter(active_on_day).count()
+    if GymMembership:
+        res['sports_active_memberships'] = GymMembership.objects.filter(active_on_day).count()
+
+    return res
+
+
+def backfill_days(days):
+    """Rewrite the snapshots for `days` in one transaction. Runs in a worker process."""
+    with transaction.atomic():
+        for day in days:
+            # Delete + create so created_at marks when this backfill wrote the row
+            DailySnapshot.objects.filter(date=day).delete()
+            DailySnapshot.objects.create(date=day, **historical_metrics(day))
+            record_daily_rows(day)
+    return days
+
+
+def _init_worker():
+    django.setup()
+
+
+def _chunks(days, size):
+    for i in range(0, len(days), size):
+        yield days[i:i + size]
+
+
+def run_backfill(date_from, date_to, workers=4, chunk_days=7, resume=False, progress=None):
+    """
+    Backfill every date in [date_from, date_to] across a process pool, one
+    committed chunk of `chunk_days` dates per task, then rebuild the rollups.
+    With resume=True, dates already written by the last unfinished run for the
+    same range are skipped. Returns the SnapshotBackfill record.
+    """
+    run = None
+    if resume:
+        run = (SnapshotBackfill.objects
+               .filter(date_from=date_from, date_to=date_to)
+               .exclude(status='COMPLETED').first())
+    if run is None:
+        run = SnapshotBackfill.objects.create(date_from=date_from, date_to=date_to)
+    else:
+        run.status = 'RUNNING'
+        run.save(update_fields=['status'])
+
+    done = set(DailySnapshot.objects
+               .filter(date__range=(date_from, date_to), created_at__gte=run.started_at)
+               .values_list('date', flat=True))
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    pending = [day for day in days if day not in done]
+    run.days_done = len(done)
+    run.save(update_fields=['days_done'])
+
+    errors = []
+    if workers <= 1:
+        for chunk in _chunks(pending, chunk_days):
+            try:
+                backfill_days(chunk)
+                run.days_done += len(chunk)
+            except Exception as exc:
+                errors.append(f"{chunk[0]}..{chunk[-1]}: {exc}")
+            if progress: progress(run)
+    else:
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(backfill_days, chunk): chunk for chunk in _chunks(pending, chunk_days)}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    future.result()
+                    run.days_done += len(chunk)
+                except Exception as exc:
+                    errors.append(f"{chunk[0]}..{chunk[-1]}: {exc}")
+                if progress: progress(run)
+
+    if not errors:
+        periods = set()
+        for day in days:
+            periods |= rollup_periods(day)
+        for period, start, end in sorted(periods):
+            rollup(period, start, end)
+
+    run.status = 'FAILED' if errors else 'COMPLETED'
+    run.last_error = '\n'.join(errors) or None
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'days_done', 'last_error', 'finished_at'])
+    return run
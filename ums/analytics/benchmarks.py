@@ -0,0 +1,245 @@
+"""
+Benchmark runner for the analytics and report code paths. Each scenario is
+timed over several iterations with its query count captured, and the results
+are written as a JSON report that can be compared with a previous one.
+"""
+import json
+import platform
+import subprocess
+import threading
+import time
+from functools import partial
+import numpy as np
+from django.core.cache import caches
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+def _percentile(samples, p):
+    return round(float(np.percentile(samples, p)), 3) if samples else None
+
+
+def _call_function(func, *args, **kwargs):
+    func(*args, **kwargs)
+    return 'ok'
+
+
+def _call_endpoint(path, user):
+    request = APIRequestFactory().get(path)
+    force_authenticate(request, user=user)
+    match = resolve(path.split('?', 1)[0])
+    response = match.func(request, *match.args, **match.kwargs)
+    if getattr(response, 'streaming', False):
+        for _ in response.streaming_content:
+            pass
+    elif hasattr(response, 'render'):
+        response.render()
+    return response.status_code
+
+
+class _QueryCounter:
+    """
+    Counts the queries of this thread's connections and of every connection
+    opened while active, so those of run_jobs' worker threads are included.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.active = False
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active:
+            with self._lock:
+                self.count += 1
+        return execute(sql, params, many, context)
+
+    def _install(self, conn):
+        if self not in conn.execute_wrappers:
+            conn.execute_wrappers.append(self)
+
+    def _connection_created(self, sender, connection, **kwargs):
+        self._install(connection)
+
+    def __enter__(self):
+        for conn in connections.all():
+            self._install(conn)
+        connection_created.connect(self._connection_created)
+        self.active = True
+        return self
+
+    def __exit__(self, *exc_info):
+        self.active = False
+        connection_created.disconnect(self._connection_created)
+        for conn in connections.all():
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+
+
+def benchmark_subjects():
+    """Representative ids and users to point the scenarios at (the busiest ones)."""
+    from academics.models import Batch
+    from courses.models import Course
+    from students.models import StudentProfile
+    from users.models import User
+
+    admin = User.objects.filter(role='ADMIN').first()
+    if admin is None:
+        admin = User.objects.create_user(email='benchmark-admin@example.edu', first_name='Benchmark',
+                                         last_name='Admin', role='ADMIN')
+    faculty_id = (Course.objects.filter(faculty__isnull=False).values('faculty_id')
+                  .annotate(n=Count('enrollments')).order_by('-n').values_list('faculty_id', flat=True).first())
+    batch = Batch.objects.annotate(n=Count('students')).order_by('-n').first()
+    student = (StudentProfile.objects.annotate(n=Count('enrollments__grades')).order_by('-n')
+               .select_related('user').first())
+    return {
+        'admin': admin,
+        'faculty': User.objects.filter(pk=faculty_id).first(),
+        'student': student.user if student else None,
+        'student_id': student.pk if student else None,
+        'batch_id': batch.pk if batch else None,
+        'program_id': student.program_id if student else None,
+    }
+
+
+def default_scenarios(subjects):
+    """(name, callable) pairs; endpoint scenarios go through the URL resolver and the view."""
+    from .utils import admin_metrics, faculty_metrics
+
+    admin, faculty, student = subjects['admin'], subjects['faculty'], subjects['student']
+    batch_id, student_id = subjects['batch_id'], subjects['student_id']
+
+    def endpoint(path, user):
+        return partial(_call_endpoint, path, user)
+
+    scenarios = [
+        ('admin_metrics()', partial(_call_function, admin_metrics)),
+        ('admin_metrics(batch)', partial(_call_function, admin_metrics, filters={'batch_id': batch_id})),
+        ('GET analytics/admin/overview', endpoint('/api/analytics/admin/overview/', admin)),
+        ('GET analytics/admin/overview?metrics=fees_overdue',
+         endpoint('/api/analytics/admin/overview/?metrics=fees_overdue', admin)),
+        ('GET analytics/snapshots/series', endpoint('/api/analytics/snapshots/series/?metric=total_students', admin)),
+        ('GET analytics/export overview', endpoint('/api/analytics/export/?dataset=overview', admin)),
+        ('GET analytics/cohorts/retention', endpoint('/api/analytics/cohorts/retention/', admin)),
+        ('GET analytics/cohorts/gpa-distribution', endpoint('/api/analytics/cohorts/gpa-distribution/', admin)),
+        ('GET analytics/cohorts/fee-collection', endpoint('/api/analytics/cohorts/fee-collection/', admin)),
+        ('GET fees/reports/overdue', endpoint('/api/fees/reports/overdue/', admin)),
+    ]
+    if batch_id:
+        scenarios += [
+            ('GET analytics/cohorts/attendance-decay',
+             endpoint(f'/api/analytics/cohorts/attendance-decay/?batch_id={batch_id}', admin)),
+            ('GET fees/reports/batch', endpoint(f'/api/fees/reports/batch/{batch_id}/', admin)),
+        ]
+    if faculty:
+        scenarios += [
+            ('faculty_metrics()', partial(_call_function, faculty_metrics, faculty)),
+            ('GET analytics/faculty/overview', endpoint('/api/analytics/faculty/overview/', faculty)),
+        ]
+    if student:
+        scenarios += [
+            ('GET fees/reports/student', endpoint(f'/api/fees/reports/student/{student_id}/', admin)),
+            ('GET exams/grades/my/gpa', endpoint('/api/exams/grades/my/gpa/', student)),
+        ]
+    return scenarios
+
+
+def run_scenario(name, func, iterations=10, warmup=1, cold=True):
+    """
+    Time `func` over `iterations` runs. With cold=True the analytics result
+    cache is emptied before every run so the computation itself is measured.
+    Queries are counted on every connection, worker threads' included.
+    """
+    from .cache import ANALYTICS_CACHE_ALIAS
+
+    timings, queries, statuses, error = [], [], set(), None
+    for i in range(warmup + iterations):
+        if cold:
+            caches[ANALYTICS_CACHE_ALIAS].clear()
+        try:
+            with _QueryCounter() as counter:
+                start = time.perf_counter()
+                status = func()
+                elapsed = (time.perf_counter() - start) * 1000
+        except Exception as exc:
+            error = f'{type(exc).__name__}: {exc}'
+            break
+        if i >= warmup:
+            timings.append(elapsed)
+            queries.append(counter.count)
+            statuses.add(status)
+    return {
+        'name': name,
+        'iterations': len(timings),
+        'p50_ms': _percentile(timings, 50),
+        'p95_ms': _percentile(timings, 95),
+        'mean_ms': round(float(np.mean(timings)), 3) if timings else None,
+        'max_ms': round(max(timings), 3) if timings else None,
+        'queries': max(queries) if queries else None,
+        'status': sorted(statuses),
+        'error': error,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _row_counts():
+    from attendance.models import Attendance
+    from enrollments.models import Enrollment
+    from exams.models import Grade
+    from fees.models import Invoice
+    from students.models import StudentProfile
+
+    return {model.__name__: model.objects.count()
+            for model in (StudentProfile, Enrollment, Attendance, Grade, Invoice)}
+
+
+def run_benchmarks(iterations=10, warmup=1, cold=True, only=None, progress=None):
+    """Run the default scenarios (names containing `only`, if given) and return the report dict."""
+    results = []
+    for name, func in default_scenarios(benchmark_subjects()):
+        if only and only not in name:
+            continue
+        result = run_scenario(name, func, iterations=iterations, warmup=warmup, cold=cold)
+        results.append(result)
+        if progress: progress(result)
+    return {
+        'created_at': timezone.now().isoformat(),
+        'commit': _git_commit(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'cache': 'cold' if cold else 'warm',
+        'rows': _row_counts(),
+        'results': results,
+    }
+
+
+def compare_reports(report, baseline, threshold=0.2):
+    """(name, metric, before, after, change) for every p50/p95 that got slower by more than `threshold`."""
+    before = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        old = before.get(result['name'])
+        if not old:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'queries'):
+            if old.get(metric) and result.get(metric) is not None:
+                change = (result[metric] - old[metric]) / old[metric]
+                if change > threshold:
+                    regressions.append((result['name'], metric, old[metric], result[metric], change))
+    return regressions
+
+
+def write_report(report, path):
+    with open(path, 'w') as fh:
+        json.dump(report, fh, indent=2, default=str)
@@ -0,0 +1,191 @@
+"""
+Result cache for the dashboard metrics.
+
+Entries are stored per metric job and filter combination in the Django cache
+configured as ANALYTICS_CACHE_ALIAS, which provides TTL and LRU eviction.
+Each entry key embeds a generation token for every table the job reads, at the
+scope of the request (a batch, a program, a faculty member or everything).
+A write bumps the tokens for its table and scopes, so only the entries that
+could have changed stop being found.
+
+Concurrent misses for the same entry are coalesced: threads in a process wait
+on a shared lock, and processes wait on a lock key in the shared cache.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from .registry import metric_defaults
+from .utils import admin_metric_jobs, faculty_metrics, run_jobs
+
+ANALYTICS_CACHE_ALIAS = getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')
+ANALYTICS_CACHE_TTL = getattr(settings, 'ANALYTICS_CACHE_TTL', 300)
+# How long a process may hold the compute lock before others compute themselves
+ANALYTICS_CACHE_LOCK_TIMEOUT = getattr(settings, 'ANALYTICS_CACHE_LOCK_TIMEOUT', 30)
+
+FACULTY_TABLES = ('enrollments', 'attendance', 'grades')
+# Writes to these tables are attributed to a batch/program/faculty scope;
+# writes to any other table only invalidate the 'all' scope.
+SCOPED_TABLES = ('students', 'enrollments', 'attendance', 'fees', 'grades')
+
+_MISSING = object()
+_inflight = {}
+_inflight_guard = threading.Lock()
+
+
+def _cache():
+    return caches[ANALYTICS_CACHE_ALIAS]
+
+
+def _generation_key(table, scope):
+    return f'analytics:gen:{table}:{scope}'
+
+
+def bump_generations(table, scopes):
+    """Invalidate every cached entry reading `table` at any of `scopes`."""
+    token = time.time_ns()
+    _cache().set_many({_generation_key(table, scope): token for scope in scopes}, None)
+
+
+def invalidate_on_commit(table, batch_id=None, program_id=None, faculty_id=None):
+    """Drop cached metrics affected by a write to `table`, once the write is committed."""
+    scopes = ['all']
+    if batch_id: scopes.append(f'batch:{batch_id}')
+    if program_id: scopes.append(f'program:{program_id}')
+    if faculty_id: scopes.append(f'faculty:{faculty_id}')
+    transaction.on_commit(lambda: bump_generations(table, scopes))
+
+
+def _generations(pairs):
+    """Current token per (table, scope); unknown pairs get a fresh token."""
+    cache = _cache()
+    keys = {pair: _generation_key(*pair) for pair in pairs}
+    found = cache.get_many(keys.values())
+    tokens = {}
+    for pair, key in keys.items():
+        if key not in found:
+            # Never reuse an old token after eviction: start from the clock
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        tokens[pair] = found[key]
+    return tokens
+
+
+@contextmanager
+def _single_flight(key):
+    with _inflight_guard:
+        entry = _inflight.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _inflight_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                _inflight.pop(key, None)
+
+
+def get_or_compute(key, compute, timeout=None):
+    """Cached value for `key`, computing it at most once across concurrent callers."""
+    cache = _cache()
+    timeout = ANALYTICS_CACHE_TTL if timeout is None else timeout
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    with _single_flight(key):
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        lock_key = f'{key}:lock'
+        locked = cache.add(lock_key, 1, ANALYTICS_CACHE_LOCK_TIMEOUT)
+        if not locked:
+            # Another process is computing it; wait for its result
+            deadline = time.monotonic() + ANALYTICS_CACHE_LOCK_TIMEOUT
+            while time.monotonic() < deadline and cache.get(lock_key) is not None:
+                time.sleep(0.05)
+                value = cache.get(key, _MISSING)
+                if value is not _MISSING:
+                    return value
+            # The lock may have been released with the result since the last read
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return value
+
+
+def _table_scope(table, scope):
+    return scope if table in SCOPED_TABLES else 'all'
+
+
+def _entry_key(view, scope, params, tables, tokens):
+    gens = '.'.join(str(tokens[(table, _table_scope(table, scope))]) for table in tables)
+    return f'analytics:{view}:{scope}:{":".join(tables)}:{params}:{gens}'
+
+
+def cached_jobs(view, scope, params, jobs):
+    """
+    Merge the results of (tables, job) pairs, serving each job from the cache
+    and computing only the missing ones (concurrently, coalesced per key).
+    """
+    tokens = _generations({(table, _table_scope(table, scope)) for tables, _ in jobs for table in tables})
+    keys = [_entry_key(view, scope, params, tables, tokens) for tables, _ in jobs]
+    found = _cache().get_many(keys)
+
+    missing = [(key, job) for key, (_, job) in zip(keys, jobs) if key not in found]
+    for (key, _), value in zip(missing, run_jobs([
+        lambda key=key, job=job: get_or_compute(key, job) for key, job in missing
+    ])):
+        found[key] = value
+
+    res = {}
+    for key in keys:
+        res.update(found[key])
+    return res
+
+
+def _params(filters, date_from, date_to):
+    filters = filters or {}
+    return f"b{filters.get('batch_id') or ''}-p{filters.get('program_id') or ''}-f{date_from or ''}-t{date_to or ''}"
+
+
+def _filter_scope(filters):
+    # Entries depend on the narrowest scope a write can be attributed to
+    if filters.get('batch_id'):
+        return f"batch:{filters['batch_id']}"
+    if filters.get('program_id'):
+        return f"program:{filters['program_id']}"
+    return 'all'
+
+
+def cached_admin_metrics(filters=None, date_from=None, date_to=None, metrics=None):
+    filters = filters or {}
+    scope = _filter_scope(filters)
+    params = _params(filters, date_from, date_to)
+    if metrics: params += f"-m{','.join(sorted(metrics))}"
+    res = metric_defaults(metrics)
+    res.update(cached_jobs('admin', scope, params, admin_metric_jobs(filters, date_from, date_to, metrics)))
+    return res
+
+
+def cached_faculty_metrics(user, filters=None, date_from=None, date_to=None):
+    job = lambda: faculty_metrics(user, filters=filters, date_from=date_from, date_to=date_to)
+    return cached_jobs('faculty', f'faculty:{user.pk}', _params(filters, date_from, date_to),
+                       [(FACULTY_TABLES, job)])
+
+
+def cached_analysis(name, tables, compute, filters=None, date_from=None, date_to=None):
+    """Result of a cohort analysis `compute()` reading `tables`, cached like the dashboard metrics."""
+    filters = filters or {}
+    return cached_jobs(f'cohort-{name}', _filter_scope(filters), _params(filters, date_from, date_to),
+                       [(tables, compute)])
@@ -0,0 +1,215 @@
+"""
+Cohort and trend analytics computed with NumPy over columnar arrays.
+
+Rows are read with values_list through a server-side cursor in chunks of
+ANALYTICS_COHORT_CHUNK_SIZE and stacked into one array per column; every
+grouping and reduction after that is vectorized.
+"""
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from ums.columns import load_columns
+from .utils import try_import
+
+ANALYTICS_COHORT_CHUNK_SIZE = getattr(settings, 'ANALYTICS_COHORT_CHUNK_SIZE', 50000)
+
+GPA_BINS = np.linspace(0.0, 4.0, 9)
+PERCENTILES = (10, 25, 50, 75, 90)
+FEE_COLLECTION_DAYS = (0, 7, 14, 30, 60, 90)
+
+def _scoped(qs, prefix, filters):
+    if filters.get('batch_id'): qs = qs.filter(**{f'{prefix}batch_id': filters['batch_id']})
+    if filters.get('program_id'): qs = qs.filter(**{f'{prefix}program_id': filters['program_id']})
+    return qs
+
+
+def _percentiles(values):
+    if not len(values):
+        return {f'p{p}': None for p in PERCENTILES}
+    return {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def retention_curves(filters=None):
+    """
+    Per batch/program cohort: share of students still enrolled (any course not
+    dropped) at each course semester, from the semester of their enrollments.
+    """
+    filters = filters or {}
+    StudentProfile = try_import('students.models.StudentProfile')
+    Enrollment = try_import('enrollments.models.Enrollment')
+    if not (StudentProfile and Enrollment):
+        return {'cohorts': []}
+
+    students = load_columns(
+        _scoped(StudentProfile.objects.all(), '', filters)
+        .annotate(cohort_batch=Coalesce('batch_id', 0), cohort_program=Coalesce('program_id', 0))
+        .order_by('id'),
+        {'id': np.int64, 'cohort_batch': np.int64, 'cohort_program': np.int64},
+        ANALYTICS_COHORT_CHUNK_SIZE,
+    )
+    enrollments = load_columns(
+        _scoped(Enrollment.objects.exclude(status='DROPPED'), 'student__', filters),
+        {'student_id': np.int64, 'course__semester': np.int64},
+        ANALYTICS_COHORT_CHUNK_SIZE,
+    )
+
+    if not len(students['id']):
+        return {'cohorts': []}
+
+    # Highest semester each student reached (0 when never enrolled)
+    reached = np.zeros(len(students['id']), dtype=np.int64)
+    rows = np.searchsorted(students['id'], enrollments['student_id'])
+    known = students['id'][np.minimum(rows, len(reached) - 1)] == enrollments['student_id']
+    np.maximum.at(reached, rows[known], enrollments['course__semester'][known])
+
+    cohorts, cohort_index = np.unique(
+        np.column_stack([students['cohort_batch'], students['cohort_program']]), axis=0, return_inverse=True)
+    cohort_index = cohort_index.ravel()
+    semesters = int(reached.max()) + 1 if len(reached) else 1
+    counts = np.bincount(cohort_index * semesters + reached,
+                         minlength=len(cohorts) * semesters).reshape(len(cohorts), semesters)
+    # Students still active at semester k = those whose highest semester is >= k
+    active = counts[:, ::-1].cumsum(axis=1)[:, ::-1]
+    sizes = counts.sum(axis=1)
+
+    return {'cohorts': [
+        {
+            'batch_id': int(batch_id) or None,
+            'program_id': int(program_id) or None,
+            'students': int(size),
+            'retention': [
+                {'semester': k, 'active': int(active[i, k]), 'rate': round(active[i, k] / size, 4)}
+                for k in range(1, semesters)
+            ],
+        }
+        for i, ((batch_id, program_id), size) in enumerate(zip(cohorts, sizes))
+    ]}
+
+
+def gpa_distribution(filters=None):
+    """Distribution of students' semester GPAs (credit-weighted, per course semester, published results)."""
+    filters = filters or {}
+    Grade = try_import('exams.models.Grade')
+    if not Grade:
+        return {'semesters': []}
+    from exams.grading import get_grading_scales
+    from exams.models import Exam
+    from exams.utils import percentage_expression
+
+    grades = load_columns(
+        _scoped(Grade.objects.filter(exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES), 'enrollment__student__',
+                filters)
+        .annotate(percentage=percentage_expression(),
+                  scale_program=Coalesce('enrollment__student__program_id', 0),
+                  scale_batch=Coalesce('enrollment__student__batch_id', 0)),
+        {'enrollment__student_id': np.int64, 'enrollment__course__semester': np.int64,
+         'enrollment__course__credits': np.float64, 'percentage': np.float64,
+         'scale_program': np.int64, 'scale_batch': np.int64, 'exam__date': 'datetime64[D]'},
+        ANALYTICS_COHORT_CHUNK_SIZE,
+    )
+    credits = grades['enrollment__course__credits']
+    points = get_grading_scales().grade_points(grades['percentage'], grades['scale_program'], grades['scale_batch'],
+                                               grades['exam__date']) * credits
+
+    keys, index = np.unique(
+        np.column_stack([grades['enrollment__course__semester'], grades['enrollment__student_id']]),
+        axis=0, return_inverse=True)
+    index = index.ravel()
+    total_credits = np.bincount(index, weights=credits, minlength=len(keys))
+    total_points = np.bincount(index, weights=points, minlength=len(keys))
+    graded = total_credits > 0
+    keys, gpas = keys[graded], total_points[graded] / total_credits[graded]
+
+    semesters = []
+    for semester in np.unique(keys[:, 0]) if len(keys) else []:
+        values = gpas[keys[:, 0] == semester]
+        histogram, _ = np.histogram(values, bins=GPA_BINS)
+        semesters.append({
+            'semester': int(semester),
+            'students': int(len(values)),
+            'mean': round(float(values.mean()), 2),
+            **_percentiles(values),
+            'histogram': [
+                {'from': float(lo), 'to': float(hi), 'students': int(n)}
+                for lo, hi, n in zip(GPA_BINS[:-1], GPA_BINS[1:], histogram)
+            ],
+        })
+    return {'semesters': semesters}
+
+
+def attendance_decay(date_from, date_to, filters=None):
+    """Weekly attendance rate over a term, with its least-squares trend per week."""
+    filters = filters or {}
+    Attendance = try_import('attendance.models.Attendance')
+    if not Attendance:
+        return {'from': date_from, 'to': date_to, 'weeks': [], 'trend_per_week': None}
+
+    rows = load_columns(
+        _scoped(Attendance.objects.filter(date__range=(date_from, date_to)), 'enrollment__student__', filters)
+        .annotate(present=Case(When(status='PRESENT', then=Value(1)), default=Value(0), output_field=IntegerField())),
+        {'date': 'datetime64[D]', 'present': np.int64},
+        ANALYTICS_COHORT_CHUNK_SIZE,
+    )
+    week = (rows['date'] - np.datetime64(date_from, 'D')).astype(np.int64) // 7
+    n_weeks = (date_to - date_from).days // 7 + 1
+    sessions = np.bincount(week, minlength=n_weeks)
+    present = np.bincount(week, weights=rows['present'], minlength=n_weeks)
+    held = sessions > 0
+    rates = np.divide(present, sessions, out=np.zeros(n_weeks), where=held)
+
+    trend = None
+    if held.sum() >= 2:
+        trend = round(float(np.polyfit(np.flatnonzero(held), rates[held] * 100, 1)[0]), 4)
+
+    start = np.datetime64(date_from, 'D')
+    return {
+        'from': date_from,
+        'to': date_to,
+        'weeks': [
+            {'week': w + 1, 'week_start': (start + 7 * w).item(), 'sessions': int(sessions[w]),
+             'present_percent': round(float(rates[w]) * 100, 2)}
+            for w in range(n_weeks)
+        ],
+        'trend_per_week': trend,
+    }
+
+
+def fee_collection_curves(filters=None):
+    """Per batch: share of the billed amount paid within N days of the due date."""
+    filters = filters or {}
+    Invoice = try_import('fees.models.Invoice')
+    if not Invoice:
+        return {'cohorts': []}
+
+    invoices = load_columns(
+        _scoped(Invoice.objects.all(), 'student__', filters)
+        .annotate(cohort_batch=Coalesce('student__batch_id', 0),
+                  paid_day=TruncDate(Coalesce('paid_at', 'created_at'))),
+        {'cohort_batch': np.int64, 'amount': np.float64, 'is_paid': np.bool_,
+         'due_date': 'datetime64[D]', 'paid_day': 'datetime64[D]'},
+        ANALYTICS_COHORT_CHUNK_SIZE,
+    )
+    batches, index = np.unique(invoices['cohort_batch'], return_inverse=True)
+    billed = np.bincount(index, weights=invoices['amount'], minlength=len(batches))
+    days_late = (invoices['paid_day'] - invoices['due_date']).astype(np.int64)
+
+    curves = []
+    for days in FEE_COLLECTION_DAYS:
+        paid = invoices['is_paid'] & (days_late <= days)
+        curves.append(np.bincount(index[paid], weights=invoices['amount'][paid], minlength=len(batches)))
+    paid_total = np.bincount(index[invoices['is_paid']], weights=invoices['amount'][invoices['is_paid']],
+                             minlength=len(batches))
+
+    return {'cohorts': [
+        {
+            'batch_id': int(batch_id) or None,
+            'billed': round(float(billed[i]), 2),
+            'paid': round(float(paid_total[i]), 2),
+            'collected_within_days': [
+                {'days': days, 'rate': round(float(curve[i] / billed[i]), 4) if billed[i] else 0.0}
+                for days, curve in zip(FEE_COLLECTION_DAYS, curves)
+            ],
+        }
+        for i, batch_id in enumerate(batches)
+    ]}
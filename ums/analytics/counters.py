@@ -0,0 +1,213 @@
+"""
+Live metric counters: per-row contributions of the source models to
+LiveMetricCounter, delta application, and a rebuild from source tables.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from .models import LiveMetricCounter
+
+DIMENSIONS = ('date', 'campus_id', 'department_id', 'batch_id', 'program_id')
+COUNTER_FIELDS = (
+    'enrollments', 'attendance_total', 'attendance_present',
+    'fees_collected', 'fees_unpaid', 'grade_points', 'grade_credits',
+)
+
+
+def _key(day, student):
+    return (day, student.campus_id, student.department_id, student.batch_id, student.program_id)
+
+
+def enrollment_contribution(enrollment):
+    return {_key(enrollment.enrollment_date, enrollment.student): {'enrollments': 1}}
+
+
+def attendance_contribution(attendance):
+    return {_key(attendance.date, attendance.enrollment.student): {
+        'attendance_total': 1,
+        'attendance_present': 1 if attendance.status == 'PRESENT' else 0,
+    }}
+
+
+def invoice_contribution(invoice):
+    if invoice.is_paid:
+        paid_at = invoice.paid_at or invoice.created_at or timezone.now()
+        return {_key(timezone.localdate(paid_at), invoice.student): {'fees_collected': invoice.amount}}
+    return {_key(invoice.due_date, invoice.student): {'fees_unpaid': invoice.amount}}
+
+
+def grade_contribution(grade):
+    from exams.grading import grade_point
+
+    if not grade.exam.can_students_view():
+        return {}
+    credits = grade.enrollment.course.credits
+    return {_key(grade.exam.date, grade.enrollment.student): {
+        'grade_points': grade_point(grade) * credits,
+        'grade_credits': credits,
+    }}
+
+
+def safe_contribution(contribution, instance):
+    """Contribution of an instance whose related rows may already be gone (cascades)."""
+    try:
+        return contribution(instance)
+    except ObjectDoesNotExist:
+        return {}
+
+
+def diff_contributions(after, before):
+    """Deltas that turn `before` into `after`."""
+    deltas = defaultdict(dict)
+    for key, values in after.items():
+        for field, value in values.items():
+            deltas[key][field] = deltas[key].get(field, 0) + value
+    for key, values in before.items():
+        for field, value in values.items():
+            deltas[key][field] = deltas[key].get(field, 0) - value
+    return deltas
+
+
+def apply_deltas(deltas):
+    """
+    Add {key: {field: delta}} to the counters with atomic F() updates,
+    creating the row for a key the first time it is seen.
+    """
+    for key, values in deltas.items():
+        values = {field: value for field, value in values.items() if value}
+        if not values:
+            continue
+        lookup = dict(zip(DIMENSIONS, key))
+        increments = {field: F(field) + value for field, value in values.items()}
+        increments['updated_at'] = timezone.now()
+        if LiveMetricCounter.objects.filter(**lookup).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                LiveMetricCounter.objects.create(**lookup, **values)
+        except IntegrityError:
+            # Another writer created the row first
+            LiveMetricCounter.objects.filter(**lookup).update(**increments)
+
+
+def counter_metrics(batch_id=None, program_id=None, date_from=None, date_to=None, today=None):
+    """Dashboard metrics read from the counters table in a single aggregate query."""
+    today = today or timezone.now().date()
+    qs = LiveMetricCounter.objects.all()
+    if batch_id: qs = qs.filter(batch_id=batch_id)
+    if program_id: qs = qs.filter(program_id=program_id)
+
+    enrollment_q = Q()
+    if date_from: enrollment_q &= Q(date__gte=date_from)
+    if date_to: enrollment_q &= Q(date__lte=date_to)
+
+    agg = qs.aggregate(
+        enrollments=Sum('enrollments', filter=enrollment_q),
+        attendance_total=Sum('attendance_total'),
+        attendance_present=Sum('attendance_present'),
+        fees_collected=Sum('fees_collected'),
+        fees_overdue=Sum('fees_unpaid', filter=Q(date__lt=today)),
+        grade_points=Sum('grade_points'),
+        grade_credits=Sum('grade_credits'),
+    )
+    attendance_total = agg['attendance_total'] or 0
+    grade_credits = agg['grade_credits'] or 0
+    res = {
+        'total_enrollments': agg['enrollments'] or 0,
+        'fees_collected': agg['fees_collected'] or Decimal('0'),
+        'fees_overdue': agg['fees_overdue'] or Decimal('0'),
+        'attendance_avg_percent': (
+            (agg['attendance_present'] or 0) / attendance_total * 100 if attendance_total else 0.0
+        ),
+    }
+    if grade_credits:
+        res['avg_gpa'] = round(agg['grade_points'] / grade_credits, 2)
+    return res
+
+
+def compute_counters_from_source():
+    """Recompute every counter row from the source tables with grouped queries."""
+    from attendance.models import Attendance
+    from enrollments.models import Enrollment
+    from exams.grading import get_grading_scales, percentage
+    from exams.models import Exam, Grade
+    from fees.models import Invoice
+
+    counters = defaultdict(lambda: defaultdict(int))
+
+    def dims(prefix):
+        return [f'{prefix}campus_id', f'{prefix}department_id', f'{prefix}batch_id', f'{prefix}program_id']
+
+    for row in (Enrollment.objects
+                .values_list('enrollment_date', *dims('student__'))
+                .annotate(n=Count('id')).order_by()):
+        counters[row[:5]]['enrollments'] += row[5]
+
+    for row in (Attendance.objects
+                .values_list('date', *dims('enrollment__student__'))
+                .annotate(total=Count('id'), present=Count('id', filter=Q(status='PRESENT'))).order_by()):
+        counters[row[:5]]['attendance_total'] += row[5]
+        counters[row[:5]]['attendance_present'] += row[6]
+
+    for row in (Invoice.objects.filter(is_paid=True)
+                .annotate(day=TruncDate(Coalesce('paid_at', 'created_at')))
+                .values_list('day', *dims('student__'))
+                .annotate(s=Sum('amount')).order_by()):
+        counters[row[:5]]['fees_collected'] += row[5]
+
+    for row in (Invoice.objects.filter(is_paid=False)
+                .values_list('due_date', *dims('student__'))
+                .annotate(s=Sum('amount')).order_by()):
+        counters[row[:5]]['fees_unpaid'] += row[5]
+
+    scales = get_grading_scales()
+    grades = (Grade.objects.filter(exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES)
+              .values_list('marks_obtained', 'exam__total_marks', 'enrollment__course__credits',
+                           'exam__date', *dims('enrollment__student__'))
+              .iterator(chunk_size=5000))
+    for marks, total_marks, credits, *key in grades:
+        point = scales.grade_point(percentage(marks, total_marks), key[4], key[3], key[0])
+        counters[tuple(key)]['grade_points'] += point * credits
+        counters[tuple(key)]['grade_credits'] += credits
+
+    return counters
+
+
+def _differs(field, expected, actual):
+    if field == 'grade_points':
+        return abs(float(expected) - float(actual)) > 1e-6
+    return expected != actual
+
+
+def reconcile_counters(fix=False):
+    """
+    Compare the counters table with a fresh rebuild from source tables.
+    Returns a list of (key, field, stored, expected) drifts; with fix=True the
+    counters table is replaced by the rebuilt rows in one transaction.
+    """
+    expected = compute_counters_from_source()
+    stored = {
+        tuple(row[:5]): dict(zip(COUNTER_FIELDS, row[5:]))
+        for row in LiveMetricCounter.objects.values_list(*DIMENSIONS, *COUNTER_FIELDS).iterator()
+    }
+
+    drift = []
+    for key in set(expected) | set(stored):
+        want = expected.get(key, {})
+        have = stored.get(key, {})
+        for field in COUNTER_FIELDS:
+            if _differs(field, want.get(field, 0), have.get(field, 0)):
+                drift.append((key, field, have.get(field, 0), want.get(field, 0)))
+
+    if fix and drift:
+        with transaction.atomic():
+            LiveMetricCounter.objects.all().delete()
+            LiveMetricCounter.objects.bulk_create(
+                (LiveMetricCounter(**dict(zip(DIMENSIONS, key)), **values) for key, values in expected.items()),
+                batch_size=1000,
+            )
+    return drift
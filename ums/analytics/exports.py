@@ -0,0 +1,133 @@
+"""
+Streaming exports. Each dataset yields a header and rows lazily (querysets are
+read with server-side cursors via .iterator()), and the writers encode one row
+at a time, so memory stays flat however many rows are exported.
+"""
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from .models import MetricSnapshot
+from .registry import METRICS
+from .snapshots import SERIES_METRICS
+from .utils import try_import
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def overview_rows(params):
+    """Current dashboard totals as (metric, value) rows (?metrics= limits which)."""
+    from .cache import cached_admin_metrics
+
+    metrics = params['metrics'] or None
+    data = cached_admin_metrics(filters=params['filters'], date_from=params['date_from'],
+                                date_to=params['date_to'], metrics=metrics)
+    yield ['Metric', 'Value']
+    for k, v in data.items():
+        yield [k, v]
+
+
+def series_rows(params):
+    """Per-period, per-dimension snapshot rows (?period=day|week|month|term&group_by=&metrics=)."""
+    metrics = params['metrics'] or list(SERIES_METRICS)
+    qs = MetricSnapshot.objects.filter(period=params['period'] or 'DAY', dimension=params['group_by'] or 'ALL')
+    if params['date_from']: qs = qs.filter(period_end__gte=params['date_from'])
+    if params['date_to']: qs = qs.filter(period_start__lte=params['date_to'])
+
+    columns = ['period_start', 'period_end', 'dimension', 'dimension_id'] + metrics
+    yield columns
+    yield from (qs.order_by('period_start', 'dimension_id')
+                .values_list(*columns)
+                .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+
+def attendance_rows(params):
+    """Attendance percentage per student (drill-down of attendance_avg_percent)."""
+    Attendance = try_import('attendance.models.Attendance')
+    yield ['student_id', 'roll_no', 'total', 'present', 'attendance_percent']
+    if not Attendance:
+        return
+
+    if params['date_from'] or params['date_to']:
+        qs = Attendance.objects.all()
+        if params['date_from']: qs = qs.filter(date__gte=params['date_from'])
+        if params['date_to']: qs = qs.filter(date__lte=params['date_to'])
+        totals = dict(total=Count('id'), present=Count('id', filter=Q(status='PRESENT')))
+    else:
+        # All-time totals are kept per enrollment
+        qs = try_import('attendance.models.AttendanceSummary').objects.all()
+        totals = dict(total=Sum('total'), present=Sum('present'))
+    filters = params['filters']
+    if filters.get('batch_id'): qs = qs.filter(enrollment__student__batch_id=filters['batch_id'])
+    if filters.get('program_id'): qs = qs.filter(enrollment__student__program_id=filters['program_id'])
+
+    rows = (qs.values_list('enrollment__student_id', 'enrollment__student__roll_no')
+            .annotate(**totals)
+            .order_by('enrollment__student_id')
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    for student_id, roll_no, total, present in rows:
+        yield [student_id, roll_no, total, present, round(present / total * 100, 2) if total else 0.0]
+
+
+def overdue_invoice_rows(params):
+    """Unpaid invoices past their due date (drill-down of fees_overdue)."""
+    Invoice = try_import('fees.models.Invoice')
+    yield ['invoice_id', 'reference_number', 'roll_no', 'due_date', 'days_overdue', 'amount', 'fine_amount', 'overdue_amount']
+    if not Invoice:
+        return
+
+    today = timezone.now().date()
+    qs = Invoice.objects.filter(is_paid=False, due_date__lt=today)
+    filters = params['filters']
+    if filters.get('batch_id'): qs = qs.filter(student__batch_id=filters['batch_id'])
+    if filters.get('program_id'): qs = qs.filter(student__program_id=filters['program_id'])
+    if params['date_from']: qs = qs.filter(due_date__gte=params['date_from'])
+    if params['date_to']: qs = qs.filter(due_date__lte=params['date_to'])
+
+    rows = (qs.order_by('due_date', 'id')
+            .values_list('id', 'reference_number', 'student__roll_no', 'due_date', 'amount', 'fine_amount')
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    for invoice_id, reference, roll_no, due_date, amount, fine in rows:
+        yield [invoice_id, reference, roll_no, due_date, (today - due_date).days, amount, fine, amount + fine]
+
+
+DATASETS = {
+    'overview': overview_rows,
+    'series': series_rows,
+    'attendance': attendance_rows,
+    'overdue_invoices': overdue_invoice_rows,
+}
+
+# The ?metrics= keys of the datasets that take a metrics list (the others ignore it)
+DATASET_METRICS = {
+    'overview': METRICS,
+    'series': SERIES_METRICS,
+}
+
+
+class _Echo:
+    """File-like object whose write() hands the encoded line back to csv.writer's caller."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+WRITERS = {
+    'csv': (stream_csv, 'text/csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+}
@@ -0,0 +1,52 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from analytics.benchmarks import compare_reports, run_benchmarks, write_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the analytics and report endpoints (p50/p95 latency and query counts) "
+        "and write a JSON report, optionally compared against a previous report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='analytics_benchmark.json', help="Report path.")
+        parser.add_argument('--iterations', type=int, default=10, help="Timed runs per scenario.")
+        parser.add_argument('--warmup', type=int, default=1, help="Untimed runs per scenario.")
+        parser.add_argument('--warm', action='store_true',
+                            help="Keep the analytics result cache between runs (default: empty it each run).")
+        parser.add_argument('--only', help="Run only scenarios whose name contains this text.")
+        parser.add_argument('--baseline', help="Previous report to compare with.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Relative slowdown counted as a regression (default 0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline report: {exc}")
+
+        def progress(result):
+            if result['error']:
+                self.stdout.write(self.style.ERROR(f"{result['name']}: {result['error']}"))
+            else:
+                self.stdout.write(f"{result['name']}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                                  f"{result['queries']} queries")
+
+        report = run_benchmarks(iterations=options['iterations'], warmup=options['warmup'],
+                                cold=not options['warm'], only=options['only'], progress=progress)
+        write_report(report, options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}."))
+
+        if baseline:
+            regressions = compare_reports(report, baseline, options['threshold'])
+            for name, metric, before, after, change in regressions:
+                self.stdout.write(self.style.WARNING(f"{name} {metric}: {before} -> {after} (+{change:.0%})"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from analytics.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the live metric counters from the source tables and report drift; "
+        "--fix replaces the stored counters with the rebuilt ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Replace the counters with the rebuilt values.")
+        parser.add_argument('--show', type=int, default=20, help="Number of drifted rows to print.")
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(fix=options['fix'])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Live metric counters match the source tables."))
+            return
+
+        for key, field, stored, expected in drift[:options['show']]:
+            self.stdout.write(f"{key}: {field} stored={stored} expected={expected}")
+        if len(drift) > options['show']:
+            self.stdout.write(f"... and {len(drift) - options['show']} more")
+
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} drifted counter values."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} drifted counter values; rerun with --fix to rebuild."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from analytics.tasks import refresh_faculty_metric_summaries
+
+
+class Command(BaseCommand):
+    help = "Refresh the precomputed faculty dashboard metrics (stale rows only unless --full)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute every faculty member.")
+
+    def handle(self, *args, **options):
+        count = refresh_faculty_metric_summaries(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed metrics for {count} faculty member(s)."))
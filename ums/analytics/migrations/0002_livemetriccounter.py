@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:14
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0001_initial'),
+        ('analytics', '0001_initial'),
+        ('org_structure', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveMetricCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('enrollments', models.IntegerField(default=0)),
+                ('attendance_total', models.IntegerField(default=0)),
+                ('attendance_present', models.IntegerField(default=0)),
+                ('fees_collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fees_unpaid', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('grade_points', models.FloatField(default=0.0)),
+                ('grade_credits', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academics.batch')),
+                ('campus', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='org_structure.campus')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='org_structure.department')),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academics.program')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(
+                    models.F('date'),
+                    django.db.models.functions.comparison.Coalesce('campus', models.Value(0)),
+                    django.db.models.functions.comparison.Coalesce('department', models.Value(0)),
+                    django.db.models.functions.comparison.Coalesce('batch', models.Value(0)),
+                    django.db.models.functions.comparison.Coalesce('program', models.Value(0)),
+                    name='live_metric_counter_key',
+                )],
+            },
+        ),
+    ]
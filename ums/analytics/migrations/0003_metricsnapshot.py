@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_livemetriccounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('DAY', 'Day'), ('WEEK', 'Week'), ('MONTH', 'Month'), ('TERM', 'Term')], default='DAY', max_length=10)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('dimension', models.CharField(choices=[('ALL', 'All'), ('CAMPUS', 'Campus'), ('DEPARTMENT', 'Department'), ('BATCH', 'Batch'), ('PROGRAM', 'Program')], default='ALL', max_length=20)),
+                ('dimension_id', models.PositiveBigIntegerField(default=0)),
+                ('total_students', models.PositiveIntegerField(default=0)),
+                ('total_enrollments', models.PositiveIntegerField(default=0)),
+                ('fees_collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fees_overdue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('attendance_total', models.PositiveIntegerField(default=0)),
+                ('attendance_present', models.PositiveIntegerField(default=0)),
+                ('attendance_avg_percent', models.FloatField(default=0.0)),
+                ('grade_points', models.FloatField(default=0.0)),
+                ('grade_credits', models.PositiveIntegerField(default=0)),
+                ('avg_gpa', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['period_start'],
+                'indexes': [models.Index(fields=['period', 'dimension', 'period_start'], name='analytics_m_period_bec5c9_idx')],
+                'unique_together': {('period', 'period_start', 'dimension', 'dimension_id')},
+            },
+        ),
+    ]
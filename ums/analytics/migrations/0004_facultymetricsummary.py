@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_metricsnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacultyMetricSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('my_students', models.PositiveIntegerField(default=0)),
+                ('my_enrollments', models.PositiveIntegerField(default=0)),
+                ('my_attendance_avg_percent', models.FloatField(default=0.0)),
+                ('my_avg_grade', models.FloatField(default=0.0)),
+                ('is_stale', models.BooleanField(db_index=True, default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('faculty', models.OneToOneField(limit_choices_to={'role': 'FACULTY'}, on_delete=django.db.models.deletion.CASCADE, related_name='metric_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_facultymetricsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotBackfill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('FAILED', 'Failed'), ('COMPLETED', 'Completed')], default='RUNNING', max_length=10)),
+                ('days_done', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,112 @@
+from collections import defaultdict
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+# The default grade scale at the time of this migration, frozen here with the
+# scale lookup below so later changes to exams.grading can't change what it
+# computes: (minimum percentage, grade point)
+GRADE_SCALE = [
+    (85, 4.0),
+    (80, 3.7),
+    (75, 3.3),
+    (70, 3.0),
+    (65, 2.7),
+    (60, 2.3),
+    (55, 2.0),
+    (50, 1.7),
+]
+
+
+def load_scales(apps):
+    """[(program_id, batch_id, effective_from, bands highest first)] in lookup order."""
+    GradingScaleBand = apps.get_model('exams', 'GradingScaleBand')
+    scales = defaultdict(list)
+    for scale_id, program_id, batch_id, effective_from, min_percentage, point in GradingScaleBand.objects.values_list(
+            'scale_id', 'scale__program_id', 'scale__batch_id', 'scale__effective_from', 'min_percentage',
+            'grade_point'):
+        scales[scale_id, program_id, batch_id, effective_from].append((min_percentage, point))
+    ordered = sorted(scales.items(), key=lambda item: (item[0][1] is None, item[0][2] is None,
+                                                       -item[0][3].toordinal()))
+    return [(program_id, batch_id, effective_from, sorted(bands, reverse=True))
+            for (_, program_id, batch_id, effective_from), bands in ordered]
+
+
+def grade_point(scales, marks, total_marks, program_id, batch_id, on_date):
+    percentage = marks * 100.0 / total_marks if total_marks else 0.0
+    bands = GRADE_SCALE
+    for scale_program, scale_batch, effective_from, scale_bands in scales:
+        if scale_program in (None, program_id) and scale_batch in (None, batch_id) and effective_from <= on_date:
+            bands = scale_bands
+            break
+    for threshold, point in bands:
+        if percentage >= threshold:
+            return point
+    return 0.0
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Build the counters from the source tables, so dashboards reading them
+    (ANALYTICS_LIVE_COUNTERS) are right from the first request. Grades count
+    from published results only.
+    """
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+    Attendance = apps.get_model('attendance', 'Attendance')
+    Invoice = apps.get_model('fees', 'Invoice')
+    Grade = apps.get_model('exams', 'Grade')
+    LiveMetricCounter = apps.get_model('analytics', 'LiveMetricCounter')
+    if not any(model.objects.exists() for model in (Enrollment, Attendance, Invoice, Grade)):
+        return
+
+    counters = defaultdict(lambda: defaultdict(int))
+
+    def dims(prefix):
+        return [f'{prefix}campus_id', f'{prefix}department_id', f'{prefix}batch_id', f'{prefix}program_id']
+
+    for row in Enrollment.objects.values_list('enrollment_date', *dims('student__')).annotate(n=Count('id')).order_by():
+        counters[row[:5]]['enrollments'] += row[5]
+    for row in (Attendance.objects.values_list('date', *dims('enrollment__student__'))
+                .annotate(total=Count('id'), present=Count('id', filter=Q(status='PRESENT'))).order_by()):
+        counters[row[:5]]['attendance_total'] += row[5]
+        counters[row[:5]]['attendance_present'] += row[6]
+    for row in (Invoice.objects.filter(is_paid=True).annotate(day=TruncDate(Coalesce('paid_at', 'created_at')))
+                .values_list('day', *dims('student__')).annotate(s=Sum('amount')).order_by()):
+        counters[row[:5]]['fees_collected'] += row[5]
+    for row in (Invoice.objects.filter(is_paid=False).values_list('due_date', *dims('student__'))
+                .annotate(s=Sum('amount')).order_by()):
+        counters[row[:5]]['fees_unpaid'] += row[5]
+
+    scales = load_scales(apps)
+    grades = (Grade.objects.filter(exam__result_status__in=['PUBLISHED', 'LOCKED'])
+              .values_list('marks_obtained', 'exam__total_marks', 'enrollment__course__credits', 'exam__date',
+                           *dims('enrollment__student__'))
+              .iterator(chunk_size=5000))
+    for marks, total_marks, credits, *key in grades:
+        point = grade_point(scales, marks, total_marks, key[4], key[3], key[0])
+        counters[tuple(key)]['grade_points'] += point * credits
+        counters[tuple(key)]['grade_credits'] += credits
+
+    fields = ('date', 'campus_id', 'department_id', 'batch_id', 'program_id')
+    LiveMetricCounter.objects.all().delete()
+    LiveMetricCounter.objects.bulk_create(
+        (LiveMetricCounter(**dict(zip(fields, key)), **values) for key, values in counters.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_snapshotbackfill'),
+        ('attendance', '0005_attendance_alerts'),
+        ('enrollments', '0001_initial'),
+        ('exams', '0005_ranking'),
+        ('fees', '0001_initial'),
+        ('students', '0003_studentprofile_grade_points'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 
 class DailySnapshot(models.Model):
     """Optional cached snapshot for quick dashboards."""
@@ -30,3 +33,145 @@ class DailySnapshot(models.Model):
 
     def __str__(self):
         return f"Snapshot {self.date}"
+
+
+class LiveMetricCounter(models.Model):
+    """
+    Running totals per (date, campus, department, batch, program), kept up to
+    date by signal deltas so dashboards never have to scan the source tables.
+    Seeded by a migration; rebuild with `manage.py reconcile_metric_counters --fix`.
+    """
+    date = models.DateField()
+    campus = models.ForeignKey('org_structure.Campus', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    department = models.ForeignKey('org_structure.Department', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    batch = models.ForeignKey('academics.Batch', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    program = models.ForeignKey('academics.Program', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+
+    # Enrollments by enrollment_date
+    enrollments = models.IntegerField(default=0)
+
+    # Attendance by attendance date
+    attendance_total = models.IntegerField(default=0)
+    attendance_present = models.IntegerField(default=0)
+
+    # Paid invoices by payment date, unpaid invoices by due date
+    fees_collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fees_unpaid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    # Credit-weighted grade points of published results by exam date
+    grade_points = models.FloatField(default=0.0)
+    grade_credits = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Unassigned dimensions are NULL; count them as equal so concurrent first writes of a key collide
+            models.UniqueConstraint(
+                F('date'), Coalesce('campus', Value(0)), Coalesce('department', Value(0)),
+                Coalesce('batch', Value(0)), Coalesce('program', Value(0)),
+                name='live_metric_counter_key',
+            ),
+        ]
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Counters {self.date} (campus={self.campus_id}, dept={self.department_id}, batch={self.batch_id}, program={self.program_id})"
+
+
+class MetricSnapshot(models.Model):
+    """
+    Time-series fact table: one row per period and dimension value. DAY rows
+    are built from LiveMetricCounter; WEEK/MONTH/TERM rows are rolled up from
+    the DAY rows so range queries never touch the source tables.
+    """
+    PERIOD_CHOICES = [
+        ('DAY', 'Day'),
+        ('WEEK', 'Week'),
+        ('MONTH', 'Month'),
+        ('TERM', 'Term'),
+    ]
+    DIMENSION_CHOICES = [
+        ('ALL', 'All'),
+        ('CAMPUS', 'Campus'),
+        ('DEPARTMENT', 'Department'),
+        ('BATCH', 'Batch'),
+        ('PROGRAM', 'Program'),
+    ]
+
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES, default='DAY')
+    period_start = models.DateField()
+    period_end = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES, default='ALL')
+    dimension_id = models.PositiveBigIntegerField(default=0)  # 0 for ALL or an unassigned value
+
+    # Values as of period_end
+    total_students = models.PositiveIntegerField(default=0)
+    total_enrollments = models.PositiveIntegerField(default=0)
+    fees_collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fees_overdue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    # Activity within the period
+    attendance_total = models.PositiveIntegerField(default=0)
+    attendance_present = models.PositiveIntegerField(default=0)
+    attendance_avg_percent = models.FloatField(default=0.0)
+    grade_points = models.FloatField(default=0.0)
+    grade_credits = models.PositiveIntegerField(default=0)
+    avg_gpa = models.FloatField(default=0.0)
+
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('period', 'period_start', 'dimension', 'dimension_id')
+        indexes = [
+            models.Index(fields=['period', 'dimension', 'period_start']),
+        ]
+        ordering = ['period_start']
+
+    def __str__(self):
+        return f"{self.get_period_display()} {self.period_start} {self.dimension}={self.dimension_id}"
+
+
+class FacultyMetricSummary(models.Model):
+    """
+    Precomputed FacultyOverviewView metrics, one row per faculty member.
+    Marked stale when their courses' enrollments, attendance or grades change
+    and refreshed by analytics.tasks.refresh_faculty_metric_summaries.
+    """
+    faculty = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        limit_choices_to={'role': 'FACULTY'},
+        related_name='metric_summary'
+    )
+    my_students = models.PositiveIntegerField(default=0)
+    my_enrollments = models.PositiveIntegerField(default=0)
+    my_attendance_avg_percent = models.FloatField(default=0.0)
+    my_avg_grade = models.FloatField(default=0.0)
+    is_stale = models.BooleanField(default=False, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Faculty metrics for {self.faculty_id}"
+
+
+class SnapshotBackfill(models.Model):
+    """Progress of a `backfill_snapshots` run, used to resume after a failure."""
+    STATUS_CHOICES = [
+        ('RUNNING', 'Running'),
+        ('FAILED', 'Failed'),
+        ('COMPLETED', 'Completed'),
+    ]
+    date_from = models.DateField()
+    date_to = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='RUNNING')
+    days_done = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Backfill {self.date_from} → {self.date_to} ({self.status})"
@@ -0,0 +1,216 @@
+"""
+Declarative registry of the admin dashboard metrics.
+
+Each Metric names the Source (table) it is read from, the aggregates it needs
+and how its value is derived from them. Requested metrics that share a source
+are computed together in one aggregate query that contains only their
+aggregates. Source models are resolved once, when the app is ready.
+"""
+from decimal import Decimal
+from functools import partial
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+# Read enrollment, attendance, fee and grade metrics from the signal-maintained
+# LiveMetricCounter table instead of scanning the source tables.
+ANALYTICS_LIVE_COUNTERS = getattr(settings, 'ANALYTICS_LIVE_COUNTERS', True)
+
+
+class Source:
+    """
+    A table metrics are aggregated over. `queryset(models, ctx)` returns the
+    filtered queryset; sources that can't be expressed as one queryset give
+    `compute(models, ctx, metrics)` instead. `tables` are the cache tables
+    whose writes invalidate the source's results.
+    """
+
+    def __init__(self, name, models, queryset=None, compute=None, tables=None):
+        self.name = name
+        self.model_labels = models
+        self.queryset = queryset
+        self.compute = compute
+        self.tables = tables or (name,)
+        self.models = None
+
+    @property
+    def available(self):
+        return self.models is not None
+
+
+class Metric:
+    """`aggregates(ctx)` returns named aggregates; `value(agg)` derives the metric from their results."""
+
+    def __init__(self, key, source, aggregates=None, value=None, default=0):
+        self.key = key
+        self.source = source
+        self.aggregates = aggregates or (lambda ctx: {})
+        self.value = value or (lambda agg: agg[key] or default)
+        self.default = default
+
+
+def _percent(part, whole):
+    return (part / whole * 100) if whole else 0.0
+
+
+def _pooled_gpa(agg):
+    # avg_gpa is the credit-weighted GPA of all published grades in scope, whichever table it is read from
+    return round(agg['grade_points'] / agg['grade_credits'], 2) if agg['grade_credits'] else 0.0
+
+
+def _scoped(qs, prefix, ctx):
+    if ctx['batch_id']: qs = qs.filter(**{f'{prefix}batch_id': ctx['batch_id']})
+    if ctx['program_id']: qs = qs.filter(**{f'{prefix}program_id': ctx['program_id']})
+    return qs
+
+
+def _hostel_occupancy(models, ctx, metrics):
+    Room, RoomAllocation = models
+    total_beds = Room.objects.aggregate(s=Sum('capacity'))['s'] or 0
+    if not total_beds:
+        return {'hostel_occupancy_percent': 0.0}
+    return {'hostel_occupancy_percent': _percent(RoomAllocation.objects.filter(is_active=True).count(), total_beds)}
+
+
+USERS = Source('users', ('users.User',),
+               queryset=lambda models, ctx: models[0].objects.all())
+STUDENTS = Source('students', ('students.StudentProfile',),
+                  queryset=lambda models, ctx: _scoped(models[0].objects.all(), '', ctx))
+ENROLLMENTS = Source('enrollments', ('enrollments.Enrollment',),
+                     queryset=lambda models, ctx: _scoped(models[0].objects.all(), 'student__', ctx))
+FEES = Source('fees', ('fees.Invoice',),
+              queryset=lambda models, ctx: _scoped(models[0].objects.all(), 'student__', ctx))
+ATTENDANCE = Source('attendance', ('attendance.AttendanceSummary',),
+                    queryset=lambda models, ctx: _scoped(models[0].objects.all(), 'enrollment__student__', ctx))
+COUNTERS = Source('counters', ('analytics.LiveMetricCounter',),
+                  queryset=lambda models, ctx: _scoped(models[0].objects.all(), '', ctx),
+                  tables=('enrollments', 'attendance', 'fees', 'grades'))
+HOSTEL = Source('hostel', ('hostel.Room', 'hostel.RoomAllocation'), compute=_hostel_occupancy)
+CAFETERIA = Source('cafeteria', ('cafeteria.MessSubscription',),
+                   queryset=lambda models, ctx: models[0].objects.all())
+TRANSPORT = Source('transport', ('transport.TransportPass',),
+                   queryset=lambda models, ctx: models[0].objects.all())
+SPORTS = Source('sports', ('sports.GymMembership',),
+                queryset=lambda models, ctx: models[0].objects.all())
+
+
+def _date_range_q(ctx, field):
+    q = Q()
+    if ctx['date_from']: q &= Q(**{f'{field}__gte': ctx['date_from']})
+    if ctx['date_to']: q &= Q(**{f'{field}__lte': ctx['date_to']})
+    return q
+
+
+if ANALYTICS_LIVE_COUNTERS:
+    _enrollments = Metric(
+        'total_enrollments', COUNTERS,
+        lambda ctx: {'total_enrollments': Sum('enrollments', filter=_date_range_q(ctx, 'date'))})
+    _fees_collected = Metric(
+        'fees_collected', COUNTERS,
+        lambda ctx: {'fees_collected': Sum('fees_collected')}, default=Decimal('0.00'))
+    _fees_overdue = Metric(
+        'fees_overdue', COUNTERS,
+        lambda ctx: {'fees_overdue': Sum('fees_unpaid', filter=Q(date__lt=ctx['today']))}, default=Decimal('0.00'))
+    _attendance = Metric(
+        'attendance_avg_percent', COUNTERS,
+        lambda ctx: {'attendance_total': Sum('attendance_total'), 'attendance_present': Sum('attendance_present')},
+        lambda agg: _percent(agg['attendance_present'] or 0, agg['attendance_total'] or 0), default=0.0)
+    _avg_gpa = Metric(
+        'avg_gpa', COUNTERS,
+        lambda ctx: {'grade_points': Sum('grade_points'), 'grade_credits': Sum('grade_credits')},
+        _pooled_gpa, default=0.0)
+else:
+    _enrollments = Metric(
+        'total_enrollments', ENROLLMENTS,
+        lambda ctx: {'total_enrollments': Count('id', filter=_date_range_q(ctx, 'enrollment_date'))})
+    _fees_collected = Metric(
+        'fees_collected', FEES,
+        lambda ctx: {'fees_collected': Sum('amount', filter=Q(is_paid=True))}, default=Decimal('0.00'))
+    _fees_overdue = Metric(
+        'fees_overdue', FEES,
+        lambda ctx: {'fees_overdue': Sum('amount', filter=Q(is_paid=False, due_date__lt=ctx['today']))},
+        default=Decimal('0.00'))
+    _attendance = Metric(
+        'attendance_avg_percent', ATTENDANCE,
+        lambda ctx: {'attendance_total': Sum('total'), 'attendance_present': Sum('present')},
+        lambda agg: _percent(agg['attendance_present'] or 0, agg['attendance_total'] or 0), default=0.0)
+    # From the students' running totals of their published grades
+    _avg_gpa = Metric(
+        'avg_gpa', STUDENTS,
+        lambda ctx: {'grade_points': Sum('grade_points'), 'grade_credits': Sum('credits_completed')},
+        _pooled_gpa, default=0.0)
+
+
+METRICS = {metric.key: metric for metric in (
+    Metric('total_students', STUDENTS, lambda ctx: {'total_students': Count('id')}),
+    Metric('total_faculty', USERS, lambda ctx: {'total_faculty': Count('id', filter=Q(role='FACULTY'))}),
+    _enrollments,
+    _fees_collected,
+    _fees_overdue,
+    _attendance,
+    _avg_gpa,
+    Metric('hostel_occupancy_percent', HOSTEL, default=0.0),
+    Metric('cafeteria_active_subscriptions', CAFETERIA,
+           lambda ctx: {'cafeteria_active_subscriptions': Count('id', filter=Q(is_active=True))}),
+    Metric('transport_active_passes', TRANSPORT,
+           lambda ctx: {'transport_active_passes': Count('id', filter=Q(is_active=True))}),
+    Metric('sports_active_memberships', SPORTS,
+           lambda ctx: {'sports_active_memberships': Count('id', filter=Q(is_active=True))}),
+)}
+
+SOURCES = {metric.source.name: metric.source for metric in METRICS.values()}
+
+_resolved = False
+
+
+def resolve_models():
+    """Look up every source's models once; sources with a missing app or model stay unavailable."""
+    global _resolved
+    for source in SOURCES.values():
+        try:
+            source.models = tuple(apps.get_model(label) for label in source.model_labels)
+        except LookupError:
+            source.models = None
+    _resolved = True
+
+
+def _compute_source(source, metrics, ctx):
+    if source.compute:
+        return source.compute(source.models, ctx, metrics)
+    aggregates = {}
+    for metric in metrics:
+        aggregates.update(metric.aggregates(ctx))
+    agg = source.queryset(source.models, ctx).aggregate(**aggregates)
+    return {metric.key: metric.value(agg) for metric in metrics}
+
+
+def metric_jobs(metrics=None, filters=None, date_from=None, date_to=None):
+    """
+    (tables, job) pairs computing `metrics` (keys, default all): one job and
+    one aggregate query per source. Metrics of unavailable sources are skipped.
+    """
+    if not _resolved:
+        resolve_models()
+    filters = filters or {}
+    ctx = dict(
+        batch_id=filters.get('batch_id'),
+        program_id=filters.get('program_id'),
+        date_from=date_from,
+        date_to=date_to,
+        today=timezone.now().date(),
+    )
+
+    by_source = {}
+    for key in (metrics or METRICS):
+        metric = METRICS[key]
+        if metric.source.available:
+            by_source.setdefault(metric.source.name, []).append(metric)
+    return [
+        (SOURCES[name].tables, partial(_compute_source, SOURCES[name], source_metrics, ctx))
+        for name, source_metrics in by_source.items()
+    ]
+
+
+def metric_defaults(metrics=None):
+    return {key: METRICS[key].default for key in (metrics or METRICS)}
@@ -2,6 +2,13 @@ from rest_framework import serializers
 from .models import DailySnapshot
 
 class AdminOverviewSerializer(serializers.Serializer):
+    def __init__(self, *args, metrics=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only render the metrics that were requested
+        if metrics:
+            for name in set(self.fields) - set(metrics):
+                self.fields.pop(name)
+
     # Summary cards
     total_students = serializers.IntegerField()
     total_faculty = serializers.IntegerField()
@@ -0,0 +1,235 @@
+from collections import defaultdict
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import pre_save, post_save, post_delete
+from . import counters
+from django.db import transaction
+from .cache import FACULTY_TABLES, invalidate_on_commit
+from .models import FacultyMetricSummary
+from .utils import try_import
+
+# model path -> (contribution, select_related used to load the previous row)
+TRACKED_MODELS = {
+    'enrollments.models.Enrollment': (counters.enrollment_contribution, ('student',)),
+    'attendance.models.Attendance': (counters.attendance_contribution, ('enrollment__student',)),
+    'fees.models.Invoice': (counters.invoice_contribution, ('student',)),
+    'exams.models.Grade': (counters.grade_contribution, ('exam', 'enrollment__course', 'enrollment__student')),
+}
+
+
+def _connect(model, contribution, related):
+    def capture_previous(sender, instance, raw=False, **kwargs):
+        previous = None
+        if instance.pk and not raw:
+            previous = sender.objects.select_related(*related).filter(pk=instance.pk).first()
+        instance._counter_contribution = counters.safe_contribution(contribution, previous) if previous else {}
+
+    def apply_saved(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        before = getattr(instance, '_counter_contribution', {})
+        counters.apply_deltas(counters.diff_contributions(counters.safe_contribution(contribution, instance), before))
+        instance._counter_contribution = {}
+
+    def apply_deleted(sender, instance, **kwargs):
+        counters.apply_deltas(counters.diff_contributions({}, counters.safe_contribution(contribution, instance)))
+
+    uid = f'analytics-counters-{model._meta.label_lower}'
+    pre_save.connect(capture_previous, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(apply_saved, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(apply_deleted, sender=model, weak=False, dispatch_uid=uid)
+
+
+for path, (contribution, related) in TRACKED_MODELS.items():
+    model = try_import(path)
+    if model:
+        _connect(model, contribution, related)
+
+
+# Result cache invalidation: model path -> (table, scope of an instance)
+def _student_scope(student, faculty_id=None):
+    return dict(batch_id=student.batch_id, program_id=student.program_id, faculty_id=faculty_id)
+
+
+def _enrollment_scope(enrollment):
+    return _student_scope(enrollment.student, enrollment.course.faculty_id)
+
+
+CACHED_TABLES = {
+    'students.models.StudentProfile': ('students', _student_scope),
+    'enrollments.models.Enrollment': ('enrollments', _enrollment_scope),
+    'attendance.models.Attendance': ('attendance', lambda obj: _enrollment_scope(obj.enrollment)),
+    'exams.models.Grade': ('grades', lambda obj: _enrollment_scope(obj.enrollment)),
+    'fees.models.Invoice': ('fees', lambda obj: _student_scope(obj.student)),
+    'users.models.User': ('users', None),
+    'hostel.models.Room': ('hostel', None),
+    'hostel.models.RoomAllocation': ('hostel', None),
+    'cafeteria.models.MessSubscription': ('cafeteria', None),
+    'transport.models.TransportPass': ('transport', None),
+    'sports.models.GymMembership': ('sports', None),
+}
+
+
+def mark_faculty_stale(faculty_id):
+    """Flag a faculty member's precomputed summary for the next refresh."""
+    transaction.on_commit(
+        lambda: FacultyMetricSummary.objects.filter(faculty_id=faculty_id).update(is_stale=True)
+    )
+
+
+def _connect_invalidation(model, table, scope):
+    def invalidate(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        try:
+            instance_scope = scope(instance) if scope else {}
+        except ObjectDoesNotExist:
+            instance_scope = {}
+        invalidate_on_commit(table, **instance_scope)
+        if table in FACULTY_TABLES and instance_scope.get('faculty_id'):
+            mark_faculty_stale(instance_scope['faculty_id'])
+
+    def capture_previous_student_scope(sender, instance, raw=False, update_fields=None, **kwargs):
+        # A student moving batch/program also invalidates the old scope
+        if instance.pk and not raw and (update_fields is None or {'batch', 'program'} & set(update_fields)):
+            previous = sender.objects.filter(pk=instance.pk).values('batch_id', 'program_id').first()
+            if previous and (previous['batch_id'], previous['program_id']) != (instance.batch_id, instance.program_id):
+                invalidate_on_commit(table, **previous)
+
+    uid = f'analytics-cache-{model._meta.label_lower}'
+    if table == 'students':
+        pre_save.connect(capture_previous_student_scope, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(invalidate, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(invalidate, sender=model, weak=False, dispatch_uid=uid)
+
+
+for path, (table, scope) in CACHED_TABLES.items():
+    model = try_import(path)
+    if model:
+        _connect_invalidation(model, table, scope)
+
+
+def _course_faculty_changed(sender, instance, raw=False, **kwargs):
+    # Reassigned courses move their numbers to the new faculty member;
+    # the previous one is caught by the periodic full refresh.
+    if not raw and instance.faculty_id:
+        mark_faculty_stale(instance.faculty_id)
+
+
+Course = try_import('courses.models.Course')
+if Course:
+    post_save.connect(_course_faculty_changed, sender=Course, weak=False, dispatch_uid='analytics-faculty-course')
+
+
+# What a grade contributes depends on its exam: only published results count,
+# by exam date and out of its total marks. When any of these change, the
+# exam's grades are diffed as a bulk write, loaded before and after the save.
+EXAM_COUNTER_FIELDS = ('result_status', 'total_marks', 'date')
+
+
+def _exam_grades(exam):
+    return list(Grade.objects.filter(exam_id=exam.pk).select_related(*TRACKED_MODELS['exams.models.Grade'][1]))
+
+
+def _capture_exam_grades(sender, instance, raw=False, **kwargs):
+    instance._counter_grades = None
+    if instance.pk and not raw:
+        old = sender.objects.filter(pk=instance.pk).values_list(*EXAM_COUNTER_FIELDS).first()
+        if old is not None and old != tuple(getattr(instance, field) for field in EXAM_COUNTER_FIELDS):
+            instance._counter_grades = _exam_grades(instance)
+
+
+def _apply_exam_grades(sender, instance, raw=False, **kwargs):
+    before = getattr(instance, '_counter_grades', None)
+    if before is not None and not raw:
+        record_bulk_write(Grade, before, _exam_grades(instance))
+        instance._counter_grades = None
+
+
+Exam = try_import('exams.models.Exam')
+Grade = try_import('exams.models.Grade')
+if Exam and Grade:
+    pre_save.connect(_capture_exam_grades, sender=Exam, weak=False, dispatch_uid='analytics-counters-exam')
+    post_save.connect(_apply_exam_grades, sender=Exam, weak=False, dispatch_uid='analytics-counters-exam')
+
+
+# Counter rows are keyed by the student's campus, department, batch and
+# program at write time (and the grading scale follows program and batch), so
+# a student moving between them moves all their rows' contributions, diffed
+# as bulk writes of the rows loaded before and after the save.
+STUDENT_DIMENSIONS = ('campus_id', 'department_id', 'batch_id', 'program_id')
+STUDENT_ROWS = {
+    'enrollments.models.Enrollment': 'student',
+    'attendance.models.Attendance': 'enrollment__student',
+    'fees.models.Invoice': 'student',
+    'exams.models.Grade': 'enrollment__student',
+}
+
+
+def _student_rows(student):
+    rows = []
+    for path, lookup in STUDENT_ROWS.items():
+        model = try_import(path)
+        if model:
+            related = TRACKED_MODELS[path][1]
+            rows.append((model, list(model.objects.filter(**{lookup: student.pk}).select_related(*related))))
+    return rows
+
+
+def _capture_student_rows(sender, instance, raw=False, **kwargs):
+    instance._counter_rows = None
+    if instance.pk and not raw:
+        old = sender.objects.filter(pk=instance.pk).values_list(*STUDENT_DIMENSIONS).first()
+        if old is not None and old != tuple(getattr(instance, field) for field in STUDENT_DIMENSIONS):
+            instance._counter_rows = _student_rows(instance)
+
+
+def _apply_student_rows(sender, instance, raw=False, **kwargs):
+    before = getattr(instance, '_counter_rows', None)
+    if before is not None and not raw:
+        for (model, old_rows), (_, new_rows) in zip(before, _student_rows(instance)):
+            record_bulk_write(model, old_rows, new_rows)
+        instance._counter_rows = None
+
+
+StudentProfile = try_import('students.models.StudentProfile')
+if StudentProfile:
+    pre_save.connect(_capture_student_rows, sender=StudentProfile, weak=False, dispatch_uid='analytics-counters-student')
+    post_save.connect(_apply_student_rows, sender=StudentProfile, weak=False, dispatch_uid='analytics-counters-student')
+
+
+def _model_path(model):
+    return f'{model.__module__}.{model.__name__}'
+
+
+def record_bulk_write(model, before, after):
+    """
+    Do for a bulk write what the save/delete receivers above do per row:
+    adjust the live counters and invalidate cached metrics. `before` are the
+    affected rows as they were (empty for inserts) and `after` as they are
+    now (empty for deletes), with the related rows the contributions read.
+    """
+    if not before and not after:
+        return
+    path = _model_path(model)
+    if path in TRACKED_MODELS:
+        contribution, _ = TRACKED_MODELS[path]
+        deltas = defaultdict(dict)
+        for instances, sign in ((after, 1), (before, -1)):
+            for instance in instances:
+                for key, values in counters.safe_contribution(contribution, instance).items():
+                    for field, value in values.items():
+                        deltas[key][field] = deltas[key].get(field, 0) + sign * value
+        counters.apply_deltas(deltas)
+
+    if path in CACHED_TABLES:
+        table, scope = CACHED_TABLES[path]
+        scopes = set()
+        for instance in (*before, *after):
+            try:
+                scopes.add(tuple(sorted((scope(instance) if scope else {}).items())))
+            except ObjectDoesNotExist:
+                scopes.add(())
+        for instance_scope in map(dict, scopes):
+            invalidate_on_commit(table, **instance_scope)
+            if table in FACULTY_TABLES and instance_scope.get('faculty_id'):
+                mark_faculty_stale(instance_scope['faculty_id'])
@@ -0,0 +1,202 @@
+"""
+Dimensional snapshot store: daily MetricSnapshot rows built from the live
+counters, WEEK/MONTH/TERM rollups, retention, and range queries.
+"""
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from .models import LiveMetricCounter, MetricSnapshot
+from .utils import try_import
+
+# DAY rows older than this are dropped once their rollups exist (None keeps all).
+# Must stay longer than the longest term so open rollups can be recomputed.
+ANALYTICS_DAILY_SNAPSHOT_RETENTION_DAYS = getattr(settings, 'ANALYTICS_DAILY_SNAPSHOT_RETENTION_DAYS', 730)
+
+DIMENSION_COLUMNS = {
+    'CAMPUS': 'campus_id',
+    'DEPARTMENT': 'department_id',
+    'BATCH': 'batch_id',
+    'PROGRAM': 'program_id',
+}
+
+STOCK_METRICS = ('total_students', 'total_enrollments', 'fees_collected', 'fees_overdue')
+FLOW_METRICS = ('attendance_total', 'attendance_present', 'grade_points', 'grade_credits')
+SERIES_METRICS = STOCK_METRICS + FLOW_METRICS + ('attendance_avg_percent', 'avg_gpa')
+
+
+def _with_averages(values):
+    total = values.get('attendance_total') or 0
+    credits = values.get('grade_credits') or 0
+    values['attendance_avg_percent'] = (values.get('attendance_present', 0) / total * 100) if total else 0.0
+    values['avg_gpa'] = round(values.get('grade_points', 0) / credits, 2) if credits else 0.0
+    return values
+
+
+def invoices_as_of(day):
+    """Invoices issued by the end of `day`, annotated with the day each paid one was paid."""
+    Invoice = try_import('fees.models.Invoice')
+    if Invoice is None:
+        return None
+    return (Invoice.objects.filter(created_at__date__lte=day)
+            .annotate(paid_day=TruncDate(Coalesce('paid_at', 'created_at'))))
+
+
+def overdue_as_of(day):
+    """Invoices past due on `day` and not paid by then, whether or not they have been paid since."""
+    return Q(due_date__lt=day) & (Q(is_paid=False) | Q(paid_day__gt=day))
+
+
+def compute_daily_values(day):
+    """
+    {(dimension, dimension_id): metric values} as of `day`, one grouped query
+    per dimension. Overdue fees come from the invoices themselves: the
+    counters only know what is unpaid now, not what was unpaid on `day`.
+    """
+    from students.models import StudentProfile
+
+    counter_aggregates = dict(
+        total_enrollments=Sum('enrollments', filter=Q(date__lte=day)),
+        fees_collected=Sum('fees_collected', filter=Q(date__lte=day)),
+        attendance_total=Sum('attendance_total', filter=Q(date=day)),
+        attendance_present=Sum('attendance_present', filter=Q(date=day)),
+        grade_points=Sum('grade_points', filter=Q(date=day)),
+        grade_credits=Sum('grade_credits', filter=Q(date=day)),
+    )
+    counters = LiveMetricCounter.objects.filter(date__lte=day)
+    students = StudentProfile.objects.filter(admission_date__lte=day)
+    invoices = invoices_as_of(day)
+    overdue = invoices.filter(overdue_as_of(day)) if invoices is not None else None
+
+    rows = defaultdict(dict)
+    rows[('ALL', 0)].update(counters.aggregate(**counter_aggregates))
+    rows[('ALL', 0)]['total_students'] = students.count()
+    if overdue is not None:
+        rows[('ALL', 0)]['fees_overdue'] = overdue.aggregate(s=Sum('amount'))['s']
+    for dimension, column in DIMENSION_COLUMNS.items():
+        for dimension_id, *values in (counters.values_list(column)
+                                      .annotate(**counter_aggregates).order_by()):
+            rows[(dimension, dimension_id or 0)].update(zip(counter_aggregates, values))
+        for dimension_id, n in students.values_list(column).annotate(n=Count('id')).order_by():
+            rows[(dimension, dimension_id or 0)]['total_students'] = n
+        if overdue is not None:
+            for dimension_id, amount in (overdue.values_list(f'student__{column}')
+                                         .annotate(s=Sum('amount')).order_by()):
+                rows[(dimension, dimension_id or 0)]['fees_overdue'] = amount
+
+    return {
+        key: _with_averages({metric: values.get(metric) or 0 for metric in STOCK_METRICS + FLOW_METRICS})
+        for key, values in rows.items()
+    }
+
+
+def _replace_rows(period, start, end, values_by_key):
+    with transaction.atomic():
+        MetricSnapshot.objects.filter(period=period, period_start=start).delete()
+        MetricSnapshot.objects.bulk_create([
+            MetricSnapshot(period=period, period_start=start, period_end=end,
+                           dimension=dimension, dimension_id=dimension_id, **values)
+            for (dimension, dimension_id), values in values_by_key.items()
+        ], batch_size=1000)
+
+
+def rollup_periods(day):
+    """(period, start, end) of every rollup bucket that contains `day`."""
+    from academics.models import Batch
+
+    week_start = day - timedelta(days=day.weekday())
+    periods = {
+        ('WEEK', week_start, week_start + timedelta(days=6)),
+        ('MONTH', day.replace(day=1), day.replace(day=calendar.monthrange(day.year, day.month)[1])),
+    }
+    # Terms are the academic Batch date ranges
+    for start, end in Batch.objects.filter(start_date__lte=day, end_date__gte=day).values_list('start_date', 'end_date'):
+        periods.add(('TERM', start, end))
+    return periods
+
+
+def rollup(period, start, end):
+    """Downsample the DAY rows in [start, end]: flows are summed, stocks take the latest day."""
+    merged = {}
+    daily = (MetricSnapshot.objects
+             .filter(period='DAY', period_start__range=(start, end))
+             .order_by('period_start')
+             .values('dimension', 'dimension_id', *STOCK_METRICS, *FLOW_METRICS))
+    for row in daily:
+        key = (row['dimension'], row['dimension_id'])
+        values = merged.setdefault(key, {metric: 0 for metric in FLOW_METRICS})
+        for metric in FLOW_METRICS:
+            values[metric] += row[metric]
+        for metric in STOCK_METRICS:
+            values[metric] = row[metric]
+    _replace_rows(period, start, end, {key: _with_averages(values) for key, values in merged.items()})
+
+
+def record_daily_rows(day):
+    """Write the DAY rows for `day` without touching the rollups."""
+    _replace_rows('DAY', day, day, compute_daily_values(day))
+
+
+def record_metric_snapshots(day=None):
+    """Write the DAY rows for `day` and refresh every rollup containing it."""
+    day = day or timezone.now().date()
+    record_daily_rows(day)
+    for period, start, end in rollup_periods(day):
+        rollup(period, start, end)
+
+
+def prune_daily_snapshots(today=None):
+    if ANALYTICS_DAILY_SNAPSHOT_RETENTION_DAYS is None:
+        return 0
+    today = today or timezone.now().date()
+    cutoff = today - timedelta(days=ANALYTICS_DAILY_SNAPSHOT_RETENTION_DAYS)
+    deleted, _ = MetricSnapshot.objects.filter(period='DAY', period_start__lt=cutoff).delete()
+    return deleted
+
+
+def default_period(date_from, date_to):
+    span = (date_to - date_from).days
+    if span <= 92:
+        return 'DAY'
+    if span <= 366:
+        return 'WEEK'
+    return 'MONTH'
+
+
+def snapshot_series(metric, group_by='ALL', date_from=None, date_to=None, period=None):
+    """
+    Series of `metric` per dimension value from the precomputed rows.
+    Defaults to the last 90 days at a period picked from the range length.
+    """
+    date_to = date_to or timezone.now().date()
+    date_from = date_from or date_to - timedelta(days=90)
+    period = period or default_period(date_from, date_to)
+
+    rows = (MetricSnapshot.objects
+            .filter(period=period, dimension=group_by,
+                    period_end__gte=date_from, period_start__lte=date_to)
+            .order_by('dimension_id', 'period_start')
+            .values_list('dimension_id', 'period_start', 'period_end', metric))
+
+    series = {}
+    for dimension_id, start, end, value in rows:
+        points = series.setdefault(dimension_id, [])
+        points.append({
+            'period_start': start,
+            'period_end': end,
+            'value': float(value) if isinstance(value, Decimal) else value,
+        })
+
+    return {
+        'metric': metric,
+        'group_by': group_by,
+        'period': period,
+        'from': date_from,
+        'to': date_to,
+        'series': [{'dimension_id': key, 'points': points} for key, points in series.items()],
+    }
@@ -0,0 +1,291 @@
+"""
+Synthetic university generator for benchmarking. Rows are built lazily and
+written with bulk_create in chunks, so large campuses (100k students,
+millions of attendance rows) can be generated without holding them in memory.
+bulk_create skips model signals, so the derived analytics tables are rebuilt
+at the end.
+"""
+import math
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+SYNTHETIC_DEFAULTS = dict(
+    campuses=5,
+    departments_per_campus=4,
+    batches=4,
+    programs_per_batch=5,
+    courses_per_program=16,
+    faculty=800,
+    students=100000,
+    enrollments_per_student=5,
+    attendance=5000000,
+    grades=1000000,
+    invoices=500000,
+    parents=20000,
+)
+
+TERM_DAYS = 150
+
+
+def _bulk(model, objects, chunk_size, progress=None, keep=True):
+    """bulk_create `objects` chunk by chunk; returns the saved objects (or their count with keep=False)."""
+    saved = [] if keep else 0
+    objects = iter(objects)
+    while True:
+        chunk = list(islice(objects, chunk_size))
+        if not chunk:
+            break
+        with transaction.atomic():
+            model.objects.bulk_create(chunk, batch_size=chunk_size)
+        if keep:
+            saved.extend(chunk)
+        else:
+            saved += len(chunk)
+        if progress: progress(model.__name__, len(saved) if keep else saved)
+    return saved
+
+
+def _aware(day, rng):
+    return timezone.make_aware(datetime.combine(day, time(rng.randrange(8, 18), rng.randrange(60))))
+
+
+def generate_campus(prefix='syn', seed=0, chunk_size=5000, progress=None, **sizes):
+    """
+    Create a synthetic university. `sizes` override SYNTHETIC_DEFAULTS; every
+    unique name, code and email starts with `prefix`. Returns row counts.
+    """
+    from academics.models import Batch, Program
+    from attendance.models import Attendance
+    from cafeteria.models import MealPlan, MessSubscription
+    from courses.models import Course
+    from enrollments.models import Enrollment
+    from exams.models import Exam, Grade
+    from fees.models import FeeCategory, Invoice
+    from hostel.models import Hostel, Room, RoomAllocation
+    from org_structure.models import Campus, Department
+    from parents.models import ParentProfile, ParentStudentLink
+    from sports.models import Facility, GymMembership
+    from students.models import StudentProfile
+    from transport.models import TransportPass, TransportRoute, Vehicle
+    from users.models import User
+
+    size = dict(SYNTHETIC_DEFAULTS, **sizes)
+    rng = random.Random(seed)
+    password = make_password(None)
+    today = timezone.now().date()
+    counts = {}
+
+    campuses = _bulk(Campus, (
+        Campus(name=f'{prefix} Campus {i}', code=f'{prefix}-C{i}') for i in range(size['campuses'])
+    ), chunk_size, progress)
+    departments = _bulk(Department, (
+        Department(campus=campus, name=f'Department {j}', code=f'{prefix}-C{i}-D{j}')
+        for i, campus in enumerate(campuses) for j in range(size['departments_per_campus'])
+    ), chunk_size, progress)
+
+    # Consecutive terms, the last one running today
+    first_start = today - timedelta(days=TERM_DAYS * size['batches'] - TERM_DAYS // 2)
+    batches = _bulk(Batch, (
+        Batch(name=f'{prefix} Term {i}', start_date=first_start + timedelta(days=TERM_DAYS * i),
+              end_date=first_start + timedelta(days=TERM_DAYS * (i + 1) - 1),
+              is_active=i == size['batches'] - 1)
+        for i in range(size['batches'])
+    ), chunk_size, progress)
+    programs = _bulk(Program, (
+        Program(batch=batch, name=f'{prefix} Program {j}')
+        for batch in batches for j in range(size['programs_per_batch'])
+    ), chunk_size, progress)
+    program_department = {program.pk: departments[i % len(departments)] for i, program in enumerate(programs)}
+
+    faculty = _bulk(User, (
+        User(email=f'{prefix}-faculty-{i}@example.edu', first_name='Faculty', last_name=str(i),
+             role='FACULTY', password=password)
+        for i in range(size['faculty'])
+    ), chunk_size, progress)
+
+    courses = _bulk(Course, (
+        Course(program=program, batch=program.batch, department=program_department[program.pk],
+               campus_id=program_department[program.pk].campus_id,
+               code=f'{prefix}-P{program.pk}-{j}', name=f'Course {j}',
+               credits=rng.choice((2, 3, 3, 4)), semester=1 + j % program.total_semesters,
+               faculty=rng.choice(faculty) if faculty else None)
+        for program in programs for j in range(size['courses_per_program'])
+    ), chunk_size, progress)
+    program_courses = {}
+    for course in courses:
+        program_courses.setdefault(course.program_id, []).append(course)
+
+    # Students
+    student_users = _bulk(User, (
+        User(email=f'{prefix}-student-{i}@example.edu', first_name='Student', last_name=str(i),
+             role='STUDENT', password=password)
+        for i in range(size['students'])
+    ), chunk_size, progress)
+    students = _bulk(StudentProfile, (
+        StudentProfile(user=user, batch=program.batch, program=program,
+                       campus_id=program_department[program.pk].campus_id,
+                       department=program_department[program.pk],
+                       roll_no=f'{prefix}-{i:07d}', semester=rng.randint(1, program.total_semesters))
+        for i, (user, program) in enumerate((user, programs[i % len(programs)])
+                                            for i, user in enumerate(student_users))
+    ), chunk_size, progress)
+    del student_users
+
+    # Enrollments; keep (pk, course, batch) for the attendance and grade rows
+    def enrollment_rows():
+        for student in students:
+            offered = program_courses.get(student.program_id, [])
+            for course in rng.sample(offered, min(size['enrollments_per_student'], len(offered))):
+                yield Enrollment(student=student, course=course,
+                                 status='DROPPED' if rng.random() < 0.03 else 'ENROLLED')
+    enrollments = [(e.pk, e.course_id, e.student.batch) for e in _bulk(Enrollment, enrollment_rows(), chunk_size, progress)]
+    course_faculty = {course.pk: course.faculty_id for course in courses}
+
+    # Attendance: spread the requested rows over enrollments, distinct dates per enrollment
+    def attendance_rows():
+        if not enrollments:
+            return
+        per_enrollment, extra = divmod(size['attendance'], len(enrollments))
+        for i, (enrollment_id, course_id, batch) in enumerate(enrollments):
+            n = min(per_enrollment + (i < extra), TERM_DAYS)
+            presence = rng.uniform(0.55, 0.98)
+            for offset in rng.sample(range(TERM_DAYS), n):
+                day = batch.start_date + timedelta(days=offset)
+                roll = rng.random()
+                yield Attendance(enrollment_id=enrollment_id, date=day, marked_by_id=course_faculty[course_id],
+                                 status='PRESENT' if roll < presence else ('LATE' if roll < presence + 0.05 else 'ABSENT'))
+    counts['attendance'] = _bulk(Attendance, attendance_rows(), chunk_size, progress, keep=False)
+
+    # Exams per course, enough that every enrollment gets its share of grades
+    exams_per_course = min(max(math.ceil(size['grades'] / max(len(enrollments), 1)), 1), 6)
+    exam_types = ('MIDTERM', 'FINAL', 'QUIZ', 'ASSIGNMENT', 'QUIZ', 'ASSIGNMENT')
+    exams = _bulk(Exam, (
+        Exam(course=course, title=f'{exam_types[k].title()} {k + 1}', exam_type=exam_types[k],
+             total_marks=rng.choice((20, 50, 100)),
+             date=course.batch.start_date + timedelta(days=(k + 1) * TERM_DAYS // (exams_per_course + 1)),
+             created_by_id=course.faculty_id,
+             result_status='LOCKED' if course.batch.end_date < today else 'DRAFT')
+        for course in courses for k in range(exams_per_course)
+    ), chunk_size, progress)
+    course_exams = {}
+    for exam in exams:
+        course_exams.setdefault(exam.course_id, []).append(exam)
+
+    def grade_rows():
+        remaining = size['grades']
+        for enrollment_id, course_id, _ in enrollments:
+            ability = rng.gauss(70, 12)
+            for exam in course_exams.get(course_id, []):
+                if remaining <= 0:
+                    return
+                marks = min(max(rng.gauss(ability, 10), 0), 100) * exam.total_marks / 100
+                yield Grade(enrollment_id=enrollment_id, exam_id=exam.pk, marks_obtained=round(marks, 1))
+                remaining -= 1
+    counts['grades'] = _bulk(Grade, grade_rows(), chunk_size, progress, keep=False)
+
+    # Fees
+    categories = _bulk(FeeCategory, (
+        FeeCategory(name=f'{prefix} {name}', is_recurring=recurring)
+        for name, recurring in (('Tuition', True), ('Library', True), ('Fine', False))
+    ), chunk_size, progress)
+
+    def invoice_rows():
+        for i in range(size['invoices'] if students else 0):
+            student = students[i % len(students)]
+            due = student.batch.start_date + timedelta(days=rng.randrange(TERM_DAYS))
+            paid = due < today and rng.random() < 0.8
+            yield Invoice(student=student, category=rng.choice(categories),
+                          amount=Decimal(rng.randrange(5000, 150000)) / 100, due_date=due,
+                          is_paid=paid, paid_at=_aware(due + timedelta(days=rng.randint(-20, 40)), rng) if paid else None,
+                          reference_number=f'{prefix}-INV-{i}')
+    counts['invoices'] = _bulk(Invoice, invoice_rows(), chunk_size, progress, keep=False)
+
+    # Campus services
+    hostels = _bulk(Hostel, (Hostel(name=f'{prefix} Hostel {campus.code}') for campus in campuses), chunk_size, progress)
+    rooms = _bulk(Room, (
+        Room(hostel=hostel, number=f'R-{n}', room_type='DOUBLE', capacity=2)
+        for hostel in hostels for n in range(max(size['students'] // (10 * len(hostels) or 1), 1))
+    ), chunk_size, progress)
+    boarders = rng.sample(students, min(len(students), 2 * len(rooms) * 9 // 10))
+    counts['room_allocations'] = _bulk(RoomAllocation, (
+        RoomAllocation(student=student, room=rooms[i // 2], start_date=student.batch.start_date)
+        for i, student in enumerate(boarders)
+    ), chunk_size, progress, keep=False)
+
+    plans = _bulk(MealPlan, (
+        MealPlan(name=f'{prefix} {meal.title()}', meal_type=meal, menu='Standard', price_per_day=Decimal('4.50'))
+        for meal in ('BREAKFAST', 'LUNCH', 'DINNER')
+    ), chunk_size, progress)
+    counts['mess_subscriptions'] = _bulk(MessSubscription, (
+        MessSubscription(student=student, meal_plan=rng.choice(plans), start_date=student.batch.start_date,
+                         end_date=student.batch.end_date, is_active=student.batch.end_date >= today)
+        for student in students if rng.random() < 0.3
+    ), chunk_size, progress, keep=False)
+
+    routes = _bulk(TransportRoute, (
+        TransportRoute(name=f'{prefix} Route {i}', start_point='Campus', end_point=f'Stop {i}', stops='A,B,C')
+        for i in range(max(len(campuses) * 4, 1))
+    ), chunk_size, progress)
+    vehicles = _bulk(Vehicle, (
+        Vehicle(route=route, vehicle_number=f'{prefix}-V{route.pk}', driver_name='Driver',
+                driver_contact='000', capacity=50)
+        for route in routes
+    ), chunk_size, progress)
+    counts['transport_passes'] = _bulk(TransportPass, (
+        TransportPass(student=student, vehicle=rng.choice(vehicles), start_date=student.batch.start_date,
+                      end_date=student.batch.end_date, is_active=student.batch.end_date >= today)
+        for student in students if rng.random() < 0.25
+    ), chunk_size, progress, keep=False)
+
+    facilities = _bulk(Facility, (
+        Facility(name=f'{prefix} Gym {campus.code}', facility_type='GYM', capacity=100) for campus in campuses
+    ), chunk_size, progress)
+    counts['gym_memberships'] = _bulk(GymMembership, (
+        GymMembership(student=student, facility=rng.choice(facilities), start_date=student.batch.start_date,
+                      end_date=student.batch.end_date, is_active=student.batch.end_date >= today)
+        for student in students if rng.random() < 0.15
+    ), chunk_size, progress, keep=False)
+
+    # Parents, each linked to one student
+    parent_users = _bulk(User, (
+        User(email=f'{prefix}-parent-{i}@example.edu', first_name='Parent', last_name=str(i),
+             role='PARENT', password=password)
+        for i in range(min(size['parents'], len(students)))
+    ), chunk_size, progress)
+    parents = _bulk(ParentProfile, (ParentProfile(user=user) for user in parent_users), chunk_size, progress)
+    counts['parent_links'] = _bulk(ParentStudentLink, (
+        ParentStudentLink(parent=parent, student=student, relation='Guardian')
+        for parent, student in zip(parents, rng.sample(students, len(parents)))
+    ), chunk_size, progress, keep=False)
+
+    counts.update(
+        campuses=len(campuses), departments=len(departments), batches=len(batches), programs=len(programs),
+        faculty=len(faculty), courses=len(courses), students=len(students), enrollments=len(enrollments),
+        exams=len(exams), parents=len(parents),
+    )
+    rebuild_derived_tables()
+    return counts
+
+
+def rebuild_derived_tables():
+    """Rebuild what the model signals would have maintained during bulk inserts."""
+    from attendance.services import rebuild_attendance_summaries
+    from exams.rankings import refresh_rankings
+    from .cache import bump_generations
+    from .counters import reconcile_counters
+    from .signals import CACHED_TABLES
+    from .tasks import refresh_faculty_metric_summaries
+
+    rebuild_attendance_summaries()
+    refresh_rankings()
+    reconcile_counters(fix=True)
+    refresh_faculty_metric_summaries(full=True)
+    # New rows only belong to new batches, programs and faculty, so existing
+    # scoped entries stay valid; only the campus-wide ones need dropping.
+    for table in {table for table, _ in CACHED_TABLES.values()}:
+        bump_generations(table, ['all'])
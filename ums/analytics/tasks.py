@@ -1,6 +1,10 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
-from .models import DailySnapshot
-from .utils import admin_metrics
+from .models import DailySnapshot, FacultyMetricSummary
+from .utils import FACULTY_METRIC_DEFAULTS, admin_metrics, compute_faculty_metrics
+from .snapshots import record_metric_snapshots, prune_daily_snapshots
 
 def create_daily_snapshot():
     today = timezone.now().date()
@@ -21,3 +25,35 @@ def create_daily_snapshot():
             sports_active_memberships=data['sports_active_memberships'],
         )
     )
+
+    # Dimensional time series + rollups
+    record_metric_snapshots(today)
+    prune_daily_snapshots(today)
+
+
+def refresh_faculty_metric_summaries(full=False, faculty_ids=None, chunk_size=1000):
+    """
+    Recompute FacultyMetricSummary rows with grouped queries. By default only
+    stale rows and faculty without a row are refreshed; full=True refreshes
+    every faculty member. Returns the number of rows written.
+    """
+    if faculty_ids is None:
+        faculty = get_user_model().objects.filter(role='FACULTY')
+        if not full:
+            faculty = faculty.filter(Q(metric_summary__isnull=True) | Q(metric_summary__is_stale=True))
+        faculty_ids = list(faculty.values_list('id', flat=True))
+
+    fields = list(FACULTY_METRIC_DEFAULTS)
+    for i in range(0, len(faculty_ids), chunk_size):
+        chunk = faculty_ids[i:i + chunk_size]
+        # Clear the flag before computing, so writes during the refresh mark the row again
+        FacultyMetricSummary.objects.filter(faculty_id__in=chunk).update(is_stale=False)
+        metrics = compute_faculty_metrics(chunk)
+        with transaction.atomic():
+            FacultyMetricSummary.objects.bulk_create(
+                [FacultyMetricSummary(faculty_id=faculty_id, **metrics[faculty_id]) for faculty_id in chunk],
+                update_conflicts=True,
+                unique_fields=['faculty'],
+                update_fields=fields + ['updated_at'],
+            )
+    return len(faculty_ids)
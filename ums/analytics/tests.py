@@ -1,3 +1,190 @@
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
 from django.test import TestCase
+from django.utils import timezone
+from academics.models import Batch, Program
+from analytics import cache as result_cache
+from analytics.backfill import backfill_days
+from analytics.counters import reconcile_counters
+from analytics.models import DailySnapshot, MetricSnapshot
+from attendance.models import Attendance
+from courses.models import Course
+from enrollments.models import Enrollment
+from exams.models import Exam, Grade
+from fees.models import Invoice
+from users.models import User
 
-# Create your tests here.
+
+class LiveCounterTests(TestCase):
+    """LiveMetricCounter rows kept by signal deltas equal a rebuild from the source tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(name='Fall 2025', start_date=date(2025, 9, 1), end_date=date(2026, 1, 31))
+        cls.program = Program.objects.create(batch=cls.batch, name='BSCS')
+        cls.other_program = Program.objects.create(batch=cls.batch, name='BBA')
+        cls.faculty = User.objects.create_user(email='faculty@example.edu', password='x', first_name='F',
+                                               last_name='L', role='FACULTY')
+        cls.course = Course.objects.create(program=cls.program, batch=cls.batch, code='CS101', name='Intro',
+                                           semester=1, faculty=cls.faculty)
+
+    def student(self, i=0):
+        user = User.objects.create_user(email=f'student{i}@example.edu', password='x', first_name='S',
+                                        last_name=str(i), role='STUDENT')
+        student = user.student_profile
+        student.batch, student.program = self.batch, self.program
+        student.save()
+        enrollment = Enrollment.objects.create(student=student, course=self.course)
+        for day, status in ((1, 'PRESENT'), (2, 'ABSENT')):
+            Attendance.objects.create(enrollment=enrollment, date=date(2025, 9, day), status=status,
+                                      marked_by=self.faculty)
+        Invoice.objects.create(student=student, amount=Decimal('100'), due_date=date(2025, 10, 1),
+                               reference_number=f'INV-{i}')
+        exam = Exam.objects.create(course=self.course, title=f'Midterm {i}', date=date(2025, 10, 15),
+                                   result_status='PUBLISHED')
+        Grade.objects.create(exam=exam, enrollment=enrollment, marks_obtained=81)
+        return student
+
+    def test_rows_follow_the_source_tables(self):
+        self.student()
+        self.assertEqual(reconcile_counters(), [])
+
+    def test_student_moving_program_or_batch_moves_their_rows(self):
+        student, other = self.student(0), self.student(1)
+        student.program = self.other_program
+        student.save()
+        self.assertEqual(reconcile_counters(), [])
+
+        other.batch = None
+        other.section = 'B'
+        other.save()
+        self.assertEqual(reconcile_counters(), [])
+
+
+class SnapshotBackfillTests(TestCase):
+    """Backfilled DAY rows agree with the DailySnapshot written for the same day."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='student@example.edu', password='x', first_name='S', last_name='L',
+                                        role='STUDENT')
+        cls.invoice = Invoice.objects.create(student=user.student_profile, amount=Decimal('100'),
+                                             due_date=date(2025, 10, 1), reference_number='INV-1')
+        cls.invoice.created_at = timezone.make_aware(datetime(2025, 9, 1))
+        cls.invoice.save()
+
+    def test_fees_overdue_is_as_of_the_day(self):
+        self.invoice.is_paid = True
+        self.invoice.paid_at = timezone.make_aware(datetime(2025, 10, 10))
+        self.invoice.save()
+
+        for day, overdue in ((date(2025, 10, 5), Decimal('100')), (date(2025, 10, 12), Decimal('0'))):
+            backfill_days([day])
+            row = MetricSnapshot.objects.get(period='DAY', period_start=day, dimension='ALL')
+            self.assertEqual(DailySnapshot.objects.get(date=day).fees_overdue, overdue)
+            self.assertEqual(row.fees_overdue, overdue)
+
+
+class ResultCacheTests(TestCase):
+    """Entries keyed by generation tokens, computed once across concurrent misses."""
+
+    def setUp(self):
+        result_cache._cache().clear()
+        self.computed = 0
+
+    def job(self, value='v'):
+        def compute():
+            self.computed += 1
+            return {'value': value}
+        return compute
+
+    def cached(self, scope, tables=('enrollments',), value='v'):
+        return result_cache.cached_jobs('test', scope, 'params', [(tables, self.job(value))])
+
+    def write(self, table, **scope):
+        with self.captureOnCommitCallbacks(execute=True):
+            result_cache.invalidate_on_commit(table, **scope)
+
+    def test_writes_invalidate_only_their_table_and_scopes(self):
+        self.cached('batch:1')
+        self.cached('batch:1')
+        self.assertEqual(self.computed, 1)
+
+        self.write('enrollments', batch_id=2)
+        self.write('grades', batch_id=1)
+        self.cached('batch:1')
+        self.assertEqual(self.computed, 1)
+
+        self.write('enrollments', batch_id=1)
+        self.assertEqual(self.cached('batch:1', value='new'), {'value': 'new'})
+        self.assertEqual(self.computed, 2)
+
+        # Every scoped write also bumps 'all'; unscoped tables are only read at 'all'
+        self.cached('all', tables=('enrollments', 'hostel'))
+        self.write('enrollments', batch_id=3)
+        self.cached('all', tables=('enrollments', 'hostel'))
+        self.assertEqual(self.computed, 4)
+        self.cached('batch:1', tables=('hostel',))
+        self.write('hostel')
+        self.cached('batch:1', tables=('hostel',))
+        self.assertEqual(self.computed, 6)
+
+    def test_invalidation_waits_for_the_commit(self):
+        self.cached('all')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            result_cache.invalidate_on_commit('enrollments')
+        self.cached('all')
+        self.assertEqual(self.computed, 1)
+        for callback in callbacks:
+            callback()
+        self.cached('all')
+        self.assertEqual(self.computed, 2)
+
+    def test_concurrent_misses_compute_once(self):
+        started, release = threading.Event(), threading.Event()
+
+        def compute():
+            started.set()
+            release.wait(5)
+            self.computed += 1
+            return 'v'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(result_cache.get_or_compute('k', compute)))
+                   for _ in range(8)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual((self.computed, results), (1, ['v'] * 8))
+
+    def test_waiting_on_another_process_reads_its_result(self):
+        cache = result_cache._cache()
+        cache.add('k:lock', 1)
+        get, lock_reads = cache.get, []
+
+        def get_finishing_elsewhere(key, default=None):
+            # The other process stores its result and releases the lock just before the lock is polled again
+            if key == 'k:lock':
+                lock_reads.append(key)
+                if len(lock_reads) == 2:
+                    cache.set('k', 'theirs')
+                    cache.delete('k:lock')
+            return get(key, default)
+
+        with mock.patch.object(cache, 'get', side_effect=get_finishing_elsewhere), \
+                mock.patch.object(result_cache.time, 'sleep'):
+            self.assertEqual(result_cache.get_or_compute('k', self.job()), 'theirs')
+        self.assertEqual(self.computed, 0)
+
+    def test_computes_after_the_lock_timeout_without_releasing_the_other_lock(self):
+        cache = result_cache._cache()
+        cache.add('k:lock', 1)
+        with mock.patch.object(result_cache, 'ANALYTICS_CACHE_LOCK_TIMEOUT', 0):
+            self.assertEqual(result_cache.get_or_compute('k', self.job()), {'value': 'v'})
+        self.assertEqual(cache.get('k:lock'), 1)
@@ -5,5 +5,11 @@ urlpatterns = [
     path('admin/overview/', views.AdminOverviewView.as_view(), name='analytics-admin-overview'),
     path('faculty/overview/', views.FacultyOverviewView.as_view(), name='analytics-faculty-overview'),
     path('snapshots/', views.SnapshotListCreateView.as_view(), name='analytics-snapshots'),
+    path('snapshots/series/', views.SnapshotSeriesView.as_view(), name='analytics-snapshot-series'),
     path('export/csv/', views.ExportCSVView.as_view(), name='analytics-export-csv'),
+    path('export/', views.AnalyticsExportView.as_view(), name='analytics-export'),
+    path('cohorts/retention/', views.CohortRetentionView.as_view(), name='analytics-cohort-retention'),
+    path('cohorts/gpa-distribution/', views.CohortGPADistributionView.as_view(), name='analytics-cohort-gpa-distribution'),
+    path('cohorts/attendance-decay/', views.CohortAttendanceDecayView.as_view(), name='analytics-cohort-attendance-decay'),
+    path('cohorts/fee-collection/', views.CohortFeeCollectionView.as_view(), name='analytics-cohort-fee-collection'),
 ]
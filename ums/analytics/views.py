@@ -1,43 +1,108 @@
 from django.shortcuts import render
 
 # Create your views here.
-import csv
-from io import StringIO
-from datetime import datetime
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import views, generics, permissions, status
 from rest_framework.response import Response
 from django.utils.dateparse import parse_date
 from .permissions import IsAdmin, IsFaculty
 from .serializers import AdminOverviewSerializer, FacultyOverviewSerializer, SnapshotSerializer
-from .models import DailySnapshot
-from .utils import admin_metrics, faculty_metrics
+from academics.models import Batch
+from .models import DailySnapshot, MetricSnapshot, FacultyMetricSummary
+from .utils import admin_metrics
+from .registry import METRICS
+from .cache import cached_admin_metrics, cached_analysis, cached_faculty_metrics
+from .tasks import refresh_faculty_metric_summaries
+from .snapshots import SERIES_METRICS, DIMENSION_COLUMNS, snapshot_series
+from .exports import DATASET_METRICS, DATASETS, WRITERS
+from . import cohorts
+
+def _int_param(value, name):
+    """An optional integer request parameter (None when absent); raises ValueError naming it."""
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer.")
+
+def _date_param(value, name):
+    """An optional YYYY-MM-DD request parameter (None when absent); raises ValueError naming it."""
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:  # Well formed but impossible, e.g. 2024-02-30
+        parsed = None
+    if parsed is None:
+        raise ValueError(f"{name} must be a valid date (YYYY-MM-DD).")
+    return parsed
 
 def _parse_filters(request):
-    batch_id = request.query_params.get('batch_id')
-    program_id = request.query_params.get('program_id')
-    date_from = request.query_params.get('date_from')
-    date_to = request.query_params.get('date_to')
+    """(filters, date_from, date_to) of the request; raises ValueError on a malformed value."""
+    params = request.query_params
+    ids = {name: _int_param(params.get(name), name) for name in ('batch_id', 'program_id')}
     return (
-        {k:int(v) for k,v in {'batch_id':batch_id, 'program_id':program_id}.items() if v},
-        parse_date(date_from) if date_from else None,
-        parse_date(date_to) if date_to else None
+        {name: value for name, value in ids.items() if value},
+        _date_param(params.get('date_from'), 'date_from'),
+        _date_param(params.get('date_to'), 'date_to'),
     )
 
+def _parse_group_by(value):
+    group_by = (value or 'all').upper()
+    if group_by != 'ALL' and group_by not in DIMENSION_COLUMNS:
+        raise ValueError("group_by must be one of: campus, department, batch, program")
+    return group_by
+
+def _parse_period(value):
+    """The snapshot period of ?period= (None when absent); raises ValueError on an unknown one."""
+    if not value:
+        return None
+    period = value.upper()
+    if period not in dict(MetricSnapshot.PERIOD_CHOICES):
+        raise ValueError("period must be one of: day, week, month, term")
+    return period
+
+def _parse_metrics(request):
+    """Requested ?metrics= keys (None for all); raises ValueError on an unknown key."""
+    metrics = [m.strip() for m in request.query_params.get('metrics', '').split(',') if m.strip()]
+    unknown = [m for m in metrics if m not in METRICS]
+    if unknown:
+        raise ValueError(f"unknown metrics: {', '.join(unknown)}; choose from: {', '.join(METRICS)}")
+    return metrics or None
+
 class AdminOverviewView(views.APIView):
+    """GET ?metrics=fees_collected,avg_gpa computes only the listed metrics (default all)."""
     permission_classes = [IsAdmin]
 
     def get(self, request):
-        filters, dfrom, dto = _parse_filters(request)
-        data = admin_metrics(filters=filters, date_from=dfrom, date_to=dto)
-        return Response(AdminOverviewSerializer(data).data)
+        try:
+            metrics = _parse_metrics(request)
+            filters, dfrom, dto = _parse_filters(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        data = cached_admin_metrics(filters=filters, date_from=dfrom, date_to=dto, metrics=metrics)
+        return Response(AdminOverviewSerializer(data, metrics=metrics).data)
 
 class FacultyOverviewView(views.APIView):
     permission_classes = [IsFaculty]
 
     def get(self, request):
-        filters, dfrom, dto = _parse_filters(request)
-        data = faculty_metrics(request.user, filters=filters, date_from=dfrom, date_to=dto)
+        try:
+            filters, dfrom, dto = _parse_filters(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if dfrom or dto:
+            # Enrollment date ranges aren't precomputed
+            data = cached_faculty_metrics(request.user, filters=filters, date_from=dfrom, date_to=dto)
+            return Response(FacultyOverviewSerializer(data).data)
+
+        data = FacultyMetricSummary.objects.filter(faculty=request.user).first()
+        # A stale row is refreshed here rather than served until the next scheduled refresh
+        if data is None or data.is_stale:
+            refresh_faculty_metric_summaries(faculty_ids=[request.user.pk])
+            data = FacultyMetricSummary.objects.get(faculty=request.user)
         return Response(FacultyOverviewSerializer(data).data)
 
 class SnapshotListCreateView(generics.ListCreateAPIView):
@@ -63,21 +128,143 @@ class SnapshotListCreateView(generics.ListCreateAPIView):
             sports_active_memberships=data['sports_active_memberships'],
         )
 
-class ExportCSVView(views.APIView):
-    """Export admin overview to CSV with current filters."""
+class SnapshotSeriesView(views.APIView):
+    """
+    GET ?metric=&group_by=&from=&to=&period=
+    Time series of one metric per campus/department/batch/program, served from
+    the precomputed snapshot rollups.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        params = request.query_params
+        metric = params.get('metric')
+        if metric not in SERIES_METRICS:
+            return Response({"detail": f"metric must be one of: {', '.join(SERIES_METRICS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            group_by = _parse_group_by(params.get('group_by'))
+            period = _parse_period(params.get('period'))
+            dfrom = _date_param(params.get('from'), 'from')
+            dto = _date_param(params.get('to'), 'to')
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(snapshot_series(metric, group_by, dfrom, dto, period))
+
+class AnalyticsExportView(views.APIView):
+    """
+    Stream an analytics dataset as CSV or NDJSON.
+    ?dataset=overview|series|attendance|overdue_invoices&output=csv|ndjson
+    plus the usual batch_id/program_id/date_from/date_to filters, for
+    series: period and group_by, and for overview and series a
+    comma-separated metrics list (an unknown key is a 400).
+    """
     permission_classes = [IsAdmin]
+    default_output = 'csv'
 
     def get(self, request):
-        filters, dfrom, dto = _parse_filters(request)
-        data = admin_metrics(filters=filters, date_from=dfrom, date_to=dto)
-
-        buffer = StringIO()
-        writer = csv.writer(buffer)
-        writer.writerow(['Metric','Value'])
-        for k, v in data.items():
-            writer.writerow([k, v])
-
-        resp = HttpResponse(buffer.getvalue(), content_type='text/csv')
-        ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        resp['Content-Disposition'] = f'attachment; filename="ums_analytics_{ts}.csv"'
+        params = request.query_params
+        dataset = params.get('dataset', 'overview')
+        output = params.get('output', self.default_output)
+        if dataset not in DATASETS:
+            return Response({"detail": f"dataset must be one of: {', '.join(DATASETS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if output not in WRITERS:
+            return Response({"detail": f"output must be one of: {', '.join(WRITERS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        metrics = [m.strip() for m in params.get('metrics', '').split(',') if m.strip()]
+        unknown = [m for m in metrics if dataset in DATASET_METRICS and m not in DATASET_METRICS[dataset]]
+        if unknown:
+            return Response({"detail": f"unknown metrics for {dataset}: {', '.join(unknown)}; "
+                                       f"choose from: {', '.join(DATASET_METRICS[dataset])}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            filters, dfrom, dto = _parse_filters(request)
+            group_by = _parse_group_by(params.get('group_by'))
+            period = _parse_period(params.get('period')) or 'DAY'
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        export_params = dict(
+            filters=filters,
+            date_from=dfrom,
+            date_to=dto,
+            period=period,
+            group_by=group_by,
+            metrics=metrics,
+        )
+
+        writer, content_type = WRITERS[output]
+        resp = StreamingHttpResponse(writer(DATASETS[dataset](export_params)), content_type=content_type)
+        ts = timezone.now().strftime('%Y%m%d_%H%M%S')
+        resp['Content-Disposition'] = f'attachment; filename="ums_analytics_{dataset}_{ts}.{output}"'
         return resp
+
+class ExportCSVView(AnalyticsExportView):
+    """Export admin overview (or another ?dataset=) to CSV with current filters."""
+
+class CohortRetentionView(views.APIView):
+    """GET ?batch_id=&program_id= Retention curve per batch/program cohort by semester."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        try:
+            filters, _, _ = _parse_filters(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        data = cached_analysis('retention', ('students', 'enrollments'),
+                               lambda: cohorts.retention_curves(filters), filters=filters)
+        return Response(data)
+
+class CohortGPADistributionView(views.APIView):
+    """GET ?batch_id=&program_id= Semester GPA histogram and percentiles per semester."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        try:
+            filters, _, _ = _parse_filters(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        data = cached_analysis('gpa-distribution', ('grades',),
+                               lambda: cohorts.gpa_distribution(filters), filters=filters)
+        return Response(data)
+
+class CohortAttendanceDecayView(views.APIView):
+    """
+    GET ?batch_id= (term = the batch's dates) or ?date_from=&date_to=
+    Weekly attendance rate across the term and its trend.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        try:
+            filters, dfrom, dto = _parse_filters(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if filters.get('batch_id') and not (dfrom and dto):
+            batch = Batch.objects.filter(pk=filters['batch_id']).first()
+            if batch is None:
+                return Response({"detail": "Batch not found."}, status=status.HTTP_404_NOT_FOUND)
+            dfrom, dto = dfrom or batch.start_date, dto or batch.end_date
+        if not (dfrom and dto) or dfrom > dto:
+            return Response({"detail": "Provide batch_id or a valid date_from and date_to."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        data = cached_analysis('attendance-decay', ('attendance',),
+                               lambda: cohorts.attendance_decay(dfrom, dto, filters),
+                               filters=filters, date_from=dfrom, date_to=dto)
+        return Response(data)
+
+class CohortFeeCollectionView(views.APIView):
+    """GET ?batch_id=&program_id= Share of billed fees paid within N days of the due date, per batch."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        try:
+            filters, _, _ = _parse_filters(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        data = cached_analysis('fee-collection', ('fees',),
+                               lambda: cohorts.fee_collection_curves(filters), filters=filters)
+        return Response(data)
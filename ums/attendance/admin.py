@@ -1,8 +1,18 @@
 from django.contrib import admin
-from .models import Attendance
+from .models import Attendance, AttendanceAlert, AttendanceThreshold
 
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
     list_display = ("enrollment", "date", "status", "marked_by")
     list_filter = ("status", "date", "enrollment__course")
     search_fields = ("enrollment__student__roll_no", "enrollment__course__code")
+
+@admin.register(AttendanceThreshold)
+class AttendanceThresholdAdmin(admin.ModelAdmin):
+    list_display = ("program", "min_percentage", "min_sessions", "updated_at")
+
+@admin.register(AttendanceAlert)
+class AttendanceAlertAdmin(admin.ModelAdmin):
+    list_display = ("enrollment", "percentage", "threshold", "sessions", "absence_streak", "created_at", "resolved_at")
+    list_filter = ("resolved_at", "enrollment__course")
+    search_fields = ("enrollment__student__roll_no", "enrollment__course__code")
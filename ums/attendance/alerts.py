@@ -0,0 +1,148 @@
+"""
+Low-attendance early warnings.
+
+evaluate_attendance_alerts() reads attendance ratios from AttendanceSummary,
+never from the Attendance rows, and only for enrollments whose summary
+changed since the previous run started (plus those of programs whose
+threshold changed), so a run costs in proportion to the marking done since.
+Changes that move the verdict without touching attendance (an enrollment's
+status, a student's program, a deleted threshold) mark the affected
+summaries through mark_for_evaluation() (see attendance.signals).
+An ENROLLED enrollment with at least `min_sessions` sessions and a present
+percentage below its program's threshold gets an open AttendanceAlert; the
+alert is kept up to date while it stays below and resolved once it recovers.
+
+Only newly raised alerts notify anyone: the student, their linked parents
+and the course faculty, inserted in bulk.
+"""
+from datetime import timedelta
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.utils import timezone
+from enrollments.models import Enrollment
+from notifications.models import Notification
+from notifications.utils import _related, send_notifications
+from parents.models import ParentStudentLink
+from .models import AttendanceAlert, AttendanceAlertRun, AttendanceSummary, AttendanceThreshold
+
+ATTENDANCE_ALERT_THRESHOLD = getattr(settings, 'ATTENDANCE_ALERT_THRESHOLD', 75.0)
+ATTENDANCE_ALERT_MIN_SESSIONS = getattr(settings, 'ATTENDANCE_ALERT_MIN_SESSIONS', 5)
+ATTENDANCE_ALERT_CHUNK_SIZE = getattr(settings, 'ATTENDANCE_ALERT_CHUNK_SIZE', 2000)
+# Summaries are stamped with their transaction's start time, which can be
+# earlier than the previous run's start when that transaction commits after
+# it; runs look back this far to pick them up. Re-evaluating is idempotent.
+ATTENDANCE_ALERT_OVERLAP = getattr(settings, 'ATTENDANCE_ALERT_OVERLAP', timedelta(minutes=10))
+
+
+def mark_for_evaluation(summaries):
+    """Have the next incremental run re-evaluate these AttendanceSummary rows."""
+    summaries.update(updated_at=Now())
+
+
+def _notifications(alerts):
+    """Notifications of newly raised alerts to each student, their parents and the course faculty."""
+    enrollments = {
+        row[0]: row[1:] for row in Enrollment.objects.filter(pk__in=[a.enrollment_id for a in alerts]).values_list(
+            'pk', 'student_id', 'student__user_id', 'student__roll_no', 'course__code', 'course__faculty_id')
+    }
+    parents = {}
+    for student_id, user_id in ParentStudentLink.objects.filter(
+            student_id__in={row[0] for row in enrollments.values()}).values_list('student_id', 'parent__user_id'):
+        parents.setdefault(student_id, []).append(user_id)
+
+    notifications = []
+    for alert in alerts:
+        student_id, student_user_id, roll_no, course_code, faculty_id = enrollments[alert.enrollment_id]
+        figures = f"{alert.percentage:.1f}% over {alert.sessions} sessions (minimum {alert.threshold:g}%)"
+        messages = [(student_user_id, f"Low attendance in {course_code}",
+                     f"Your attendance in {course_code} is {figures}.")]
+        messages += [(user_id, f"Low attendance: {roll_no} in {course_code}",
+                      f"The attendance of {roll_no} in {course_code} is {figures}.")
+                     for user_id in parents.get(student_id, [])]
+        if faculty_id:
+            messages.append((faculty_id, f"Low attendance: {roll_no} in {course_code}",
+                             f"The attendance of {roll_no} in {course_code} is {figures}."))
+        notifications += [
+            Notification(user_id=user_id, title=title, message=message, notification_type='WARNING',
+                         **_related(alert))
+            for user_id, title, message in messages
+        ]
+    return notifications
+
+
+def _evaluate_chunk(rows, thresholds, now):
+    """Raise, refresh and resolve the alerts of one chunk of summary rows. Returns (raised, resolved)."""
+    open_alerts = {
+        alert.enrollment_id: alert
+        for alert in AttendanceAlert.objects.filter(enrollment_id__in=[row[0] for row in rows], resolved_at__isnull=True)
+    }
+    raised, refreshed, resolved = [], [], []
+    for enrollment_id, present, total, streak, status, program_id in rows:
+        threshold, min_sessions = thresholds.get(program_id, (ATTENDANCE_ALERT_THRESHOLD, ATTENDANCE_ALERT_MIN_SESSIONS))
+        percentage = present / total * 100 if total else 0.0
+        alert = open_alerts.get(enrollment_id)
+        if status == 'ENROLLED' and total >= min_sessions and percentage < threshold:
+            if alert is None:
+                raised.append(AttendanceAlert(enrollment_id=enrollment_id, percentage=percentage, threshold=threshold,
+                                              sessions=total, absence_streak=streak))
+            else:
+                alert.percentage, alert.threshold, alert.sessions, alert.absence_streak = (
+                    percentage, threshold, total, streak)
+                alert.updated_at = now
+                refreshed.append(alert)
+        elif alert is not None:
+            resolved.append(alert.pk)
+
+    with transaction.atomic():
+        raised = AttendanceAlert.objects.bulk_create(raised)
+        AttendanceAlert.objects.bulk_update(
+            refreshed, ['percentage', 'threshold', 'sessions', 'absence_streak', 'updated_at'])
+        AttendanceAlert.objects.filter(pk__in=resolved).update(resolved_at=now, updated_at=now)
+        if raised:
+            send_notifications(_notifications(raised))
+    return len(raised), len(resolved)
+
+
+def evaluate_attendance_alerts(full=False, chunk_size=None):
+    """
+    Re-evaluate the enrollments whose attendance changed since the last
+    finished run started, less ATTENDANCE_ALERT_OVERLAP (every enrollment
+    when full=True or on the first run).
+    Returns the AttendanceAlertRun recording the pass.
+    """
+    chunk_size = chunk_size or ATTENDANCE_ALERT_CHUNK_SIZE
+    now = timezone.now()
+    last = AttendanceAlertRun.objects.filter(finished_at__isnull=False).first()
+    since = None if full or last is None else last.started_at - ATTENDANCE_ALERT_OVERLAP
+    run = AttendanceAlertRun.objects.create(started_at=now, full=since is None)
+
+    thresholds = {}
+    changed_programs = []
+    for program_id, percentage, min_sessions, updated_at in AttendanceThreshold.objects.values_list(
+            'program_id', 'min_percentage', 'min_sessions', 'updated_at'):
+        thresholds[program_id] = (percentage, min_sessions)
+        if since is not None and updated_at >= since:
+            changed_programs.append(program_id)
+
+    summaries = AttendanceSummary.objects.all()
+    if since is not None:
+        summaries = summaries.filter(Q(updated_at__gte=since) | Q(enrollment__student__program_id__in=changed_programs))
+    rows = (summaries.order_by('enrollment_id')
+            .values_list('enrollment_id', 'present', 'total', 'absence_streak', 'enrollment__status',
+                         'enrollment__student__program_id')
+            .iterator(chunk_size=chunk_size))
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        raised, resolved = _evaluate_chunk(chunk, thresholds, now)
+        run.evaluated += len(chunk)
+        run.raised += raised
+        run.resolved += resolved
+
+    run.finished_at = timezone.now()
+    run.save()
+    return run
@@ -0,0 +1,186 @@
+"""
+Compact term attendance.
+
+An AttendanceBitmap holds one enrollment's term as 2-bit codes per day from
+the term start (0 no session, 1 present, 2 absent, 3 late), four days to a
+byte, so a 20-week term is 35 bytes instead of one Attendance row per
+session. Bitmaps are decoded with NumPy into an (enrollments x days) code
+matrix, and counts, percentages and absence streaks are computed for every
+enrollment at once.
+
+Bitmaps are built from the Attendance rows of a term and can be expanded
+back into rows; the rows stay the source of truth, so rebuild a term's
+bitmaps after late corrections.
+"""
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from ums.columns import load_columns
+from enrollments.models import Enrollment
+from .models import Attendance, AttendanceBitmap
+
+ATTENDANCE_BITMAP_CHUNK_SIZE = getattr(settings, 'ATTENDANCE_BITMAP_CHUNK_SIZE', 5000)
+
+NO_SESSION, PRESENT, ABSENT, LATE = 0, 1, 2, 3
+CODES = {'PRESENT': PRESENT, 'ABSENT': ABSENT, 'LATE': LATE}
+STATUSES = {code: status for status, code in CODES.items()}
+
+_SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+
+def packed_size(days):
+    return (days + 3) // 4
+
+
+def pack(codes):
+    """Bitmaps (bytes) of a (rows x days) code matrix, or of one row of codes."""
+    codes = np.asarray(codes, dtype=np.uint8)
+    single = codes.ndim == 1
+    codes = np.atleast_2d(codes)
+    rows, days = codes.shape
+    padded = np.zeros((rows, packed_size(days) * 4), dtype=np.uint8)
+    padded[:, :days] = codes
+    packed = np.bitwise_or.reduce(padded.reshape(rows, -1, 4) << _SHIFTS, axis=2).astype(np.uint8)
+    bitmaps = [row.tobytes() for row in packed]
+    return bitmaps[0] if single else bitmaps
+
+
+def unpack(bitmaps, days):
+    """(rows x days) code matrix of a list of bitmaps (shorter ones read as no session)."""
+    size = packed_size(days)
+    data = b''.join(bytes(bits)[:size].ljust(size, b'\0') for bits in bitmaps)
+    packed = np.frombuffer(data, dtype=np.uint8).reshape(len(bitmaps), size)
+    return ((packed[:, :, None] >> _SHIFTS) & 3).reshape(len(bitmaps), size * 4)[:, :days]
+
+
+def term_stats(codes):
+    """Per-row present, absent, late, sessions, percentage and trailing absence streak of a code matrix."""
+    codes = np.atleast_2d(codes)
+    present = (codes == PRESENT).sum(axis=1)
+    absent = (codes == ABSENT).sum(axis=1)
+    late = (codes == LATE).sum(axis=1)
+    sessions = present + absent + late
+    day = np.arange(codes.shape[1])
+    last_attended = np.where((codes == PRESENT) | (codes == LATE), day, -1).max(axis=1, initial=-1)
+    streak = ((codes == ABSENT) & (day > last_attended[:, None])).sum(axis=1)
+    return {
+        'present': present,
+        'absent': absent,
+        'late': late,
+        'sessions': sessions,
+        'percentage': np.divide(present * 100.0, sessions, out=np.zeros(len(codes)), where=sessions > 0),
+        'absence_streak': streak,
+    }
+
+
+def _term_enrollments(course_ids):
+    enrollments = Enrollment.objects.order_by('pk')
+    if course_ids is not None:
+        enrollments = enrollments.filter(course_id__in=course_ids)
+    return list(enrollments.values_list('pk', flat=True))
+
+
+def build_bitmaps(term_start, term_end, course_ids=None, chunk_size=None):
+    """
+    Create or replace the bitmaps of the term from its Attendance rows, for
+    every enrollment (or those of `course_ids`) with attendance in the term,
+    and delete the term's bitmaps of those enrollments that no longer have
+    any. Returns the number of bitmaps written.
+    """
+    chunk_size = chunk_size or ATTENDANCE_BITMAP_CHUNK_SIZE
+    days = (term_end - term_start).days + 1
+    enrollment_ids = _term_enrollments(course_ids)
+    code = Case(*[When(status=status, then=Value(value)) for status, value in CODES.items()],
+                default=Value(NO_SESSION), output_field=IntegerField())
+
+    written = 0
+    for i in range(0, len(enrollment_ids), chunk_size):
+        chunk = enrollment_ids[i:i + chunk_size]
+        rows = load_columns(
+            Attendance.objects.filter(enrollment_id__in=chunk, date__range=(term_start, term_end))
+            .annotate(code=code).order_by(),
+            {'enrollment_id': np.int64, 'date': 'datetime64[D]', 'code': np.uint8},
+        )
+        enrollments, row = np.unique(rows['enrollment_id'], return_inverse=True)
+        codes = np.zeros((len(enrollments), days), dtype=np.uint8)
+        codes[row, (rows['date'] - np.datetime64(term_start, 'D')).astype(np.int64)] = rows['code']
+        with transaction.atomic():
+            (AttendanceBitmap.objects.filter(term_start=term_start, enrollment_id__in=chunk)
+             .exclude(enrollment_id__in=enrollments.tolist()).delete())
+            AttendanceBitmap.objects.bulk_create(
+                [AttendanceBitmap(enrollment_id=enrollment_id, term_start=term_start, days=days, bits=bits)
+                 for enrollment_id, bits in zip(enrollments.tolist(), pack(codes))],
+                update_conflicts=True,
+                unique_fields=['enrollment', 'term_start'],
+                update_fields=['days', 'bits', 'updated_at'],
+            )
+        written += len(enrollments)
+    return written
+
+
+def expand(bitmap):
+    """Unsaved Attendance rows of one bitmap, in date order."""
+    codes = unpack([bitmap.bits], bitmap.days)[0]
+    return [
+        Attendance(enrollment_id=bitmap.enrollment_id, date=bitmap.term_start + timedelta(days=day),
+                   status=STATUSES[code])
+        for day, code in zip(np.flatnonzero(codes).tolist(), codes[codes > 0].tolist())
+    ]
+
+
+def restore_attendance(bitmaps, marked_by=None):
+    """
+    Recreate the Attendance rows of `bitmaps` (a queryset) that no longer
+    exist; existing rows are left as they are. Returns the number of rows
+    created.
+    """
+    from analytics.signals import record_bulk_write
+    from .services import record_attendance_changes
+
+    created = 0
+    for bitmap in bitmaps.iterator(chunk_size=ATTENDANCE_BITMAP_CHUNK_SIZE):
+        term_end = bitmap.term_start + timedelta(days=bitmap.days - 1)
+        existing = set(Attendance.objects.filter(enrollment_id=bitmap.enrollment_id,
+                                                 date__range=(bitmap.term_start, term_end))
+                       .values_list('date', flat=True))
+        missing = [record for record in expand(bitmap) if record.date not in existing]
+        if not missing:
+            continue
+        enrollment = Enrollment.objects.select_related('student', 'course').get(pk=bitmap.enrollment_id)
+        for record in missing:
+            record.enrollment = enrollment
+            record.marked_by = marked_by
+        with transaction.atomic():
+            Attendance.objects.bulk_create(missing)
+            record_attendance_changes([], missing)
+            record_bulk_write(Attendance, [], missing)
+        created += len(missing)
+    return created
+
+
+def course_term_attendance(course_id, term_start):
+    """Per-student term attendance of a course, read from one bitmap per student."""
+    bitmaps = list(AttendanceBitmap.objects.filter(enrollment__course_id=course_id, term_start=term_start)
+                   .values_list('enrollment_id', 'enrollment__student_id', 'enrollment__student__roll_no',
+                                'days', 'bits')
+                   .order_by('enrollment__student__roll_no'))
+    if not bitmaps:
+        return []
+    days = max(row[3] for row in bitmaps)
+    stats = term_stats(unpack([row[4] for row in bitmaps], days))
+    return [
+        {
+            "enrollment": enrollment_id,
+            "student": student_id,
+            "roll_no": roll_no,
+            "present": int(stats['present'][i]),
+            "absent": int(stats['absent'][i]),
+            "late": int(stats['late'][i]),
+            "sessions": int(stats['sessions'][i]),
+            "percentage": round(float(stats['percentage'][i]), 2),
+            "absence_streak": int(stats['absence_streak'][i]),
+        }
+        for i, (enrollment_id, student_id, roll_no, _, _) in enumerate(bitmaps)
+    ]
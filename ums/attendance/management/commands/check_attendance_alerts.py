@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from attendance.alerts import evaluate_attendance_alerts
+
+
+class Command(BaseCommand):
+    help = "Raise and resolve low-attendance alerts for enrollments whose attendance changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Re-evaluate every enrollment.")
+
+    def handle(self, *args, **options):
+        run = evaluate_attendance_alerts(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Evaluated {run.evaluated} enrollments: {run.raised} alerts raised, {run.resolved} resolved "
+            f"in {(run.finished_at - run.started_at).total_seconds():.1f}s."))
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from academics.models import Batch
+from attendance.bitmaps import build_bitmaps, restore_attendance
+from attendance.models import AttendanceBitmap
+
+
+class Command(BaseCommand):
+    help = "Pack a term's attendance into per-enrollment bitmaps, or expand bitmaps back into rows (--expand)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-id', type=int, help="Use this batch's start and end dates as the term.")
+        parser.add_argument('--term-start', help="First day of the term (YYYY-MM-DD).")
+        parser.add_argument('--term-end', help="Last day of the term (YYYY-MM-DD).")
+        parser.add_argument('--course-id', type=int, action='append', help="Only this course (repeatable).")
+        parser.add_argument('--expand', action='store_true', help="Recreate missing attendance rows from the bitmaps.")
+
+    def handle(self, *args, **options):
+        if options['batch_id']:
+            batch = Batch.objects.filter(pk=options['batch_id']).first()
+            if batch is None:
+                raise CommandError(f"No batch {options['batch_id']}.")
+            term_start, term_end = batch.start_date, batch.end_date
+        else:
+            term_start = parse_date(options['term_start'] or '')
+            term_end = parse_date(options['term_end'] or '')
+        if term_start is None or (term_end is None and not options['expand']):
+            raise CommandError("Give --batch-id, or --term-start and --term-end.")
+
+        start = time.perf_counter()
+        if options['expand']:
+            bitmaps = AttendanceBitmap.objects.filter(term_start=term_start)
+            if options['course_id']:
+                bitmaps = bitmaps.filter(enrollment__course_id__in=options['course_id'])
+            count = restore_attendance(bitmaps)
+            self.stdout.write(self.style.SUCCESS(
+                f"Restored {count} attendance rows in {time.perf_counter() - start:.1f}s."))
+            return
+
+        count = build_bitmaps(term_start, term_end, course_ids=options['course_id'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Packed {count} enrollments' attendance ({term_start} to {term_end}) "
+            f"in {time.perf_counter() - start:.1f}s."))
@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from attendance.services import rebuild_attendance_summaries
+
+
+class Command(BaseCommand):
+    help = "Regenerate every per-enrollment AttendanceSummary from the attendance records."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Summaries read and written at a time.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_attendance_summaries(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {count} attendance summaries in {time.perf_counter() - start:.1f}s."))
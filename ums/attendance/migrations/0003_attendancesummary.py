@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_summaries(apps, schema_editor):
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceSummary = apps.get_model('attendance', 'AttendanceSummary')
+    fields = {'PRESENT': 'present', 'ABSENT': 'absent', 'LATE': 'late'}
+
+    summaries = {}
+    records = Attendance.objects.values_list('enrollment_id', 'date', 'status').order_by('enrollment_id', 'date')
+    for enrollment_id, date, status in records.iterator(chunk_size=5000):
+        summary = summaries.get(enrollment_id)
+        if summary is None:
+            summary = summaries[enrollment_id] = AttendanceSummary(enrollment_id=enrollment_id)
+        setattr(summary, fields[status], getattr(summary, fields[status]) + 1)
+        summary.total += 1
+        summary.last_marked_date = date
+        summary.absence_streak = summary.absence_streak + 1 if status == 'ABSENT' else 0
+    AttendanceSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_initial'),
+        ('enrollments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('last_marked_date', models.DateField(blank=True, null=True)),
+                ('absence_streak', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('enrollment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summary', to='enrollments.enrollment')),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
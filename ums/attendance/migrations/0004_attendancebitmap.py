@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendancesummary'),
+        ('enrollments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term_start', models.DateField()),
+                ('days', models.PositiveSmallIntegerField()),
+                ('bits', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_bitmaps', to='enrollments.enrollment')),
+            ],
+            options={
+                'unique_together': {('enrollment', 'term_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0001_initial'),
+        ('attendance', '0004_attendancebitmap'),
+        ('enrollments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceAlertRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('full', models.BooleanField(default=False)),
+                ('evaluated', models.PositiveIntegerField(default=0)),
+                ('raised', models.PositiveIntegerField(default=0)),
+                ('resolved', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='attendancesummary',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='AttendanceThreshold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_percentage', models.FloatField(default=75.0)),
+                ('min_sessions', models.PositiveIntegerField(default=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('program', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_threshold', to='academics.program')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttendanceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('percentage', models.FloatField()),
+                ('threshold', models.FloatField()),
+                ('sessions', models.PositiveIntegerField()),
+                ('absence_streak', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_alerts', to='enrollments.enrollment')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('enrollment',), name='attendance_alert_one_open')],
+            },
+        ),
+    ]
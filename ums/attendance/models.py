@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from academics.models import Program
 from enrollments.models import Enrollment
 
 class Attendance(models.Model):
@@ -29,3 +30,103 @@ class Attendance(models.Model):
 
     def __str__(self):
         return f"{self.enrollment.student.roll_no} - {self.enrollment.course.code} - {self.date} ({self.status})"
+
+
+class AttendanceSummary(models.Model):
+    """
+    Running attendance totals of one enrollment, kept in step with its
+    Attendance rows by attendance.services.record_attendance_changes and
+    rebuilt by `python manage.py rebuild_attendance_summaries`.
+    `absence_streak` counts the ABSENT records since the latest non-absent one.
+    """
+    enrollment = models.OneToOneField(Enrollment, on_delete=models.CASCADE, related_name="attendance_summary")
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    last_marked_date = models.DateField(null=True, blank=True)
+    absence_streak = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # drives incremental alert runs
+
+    @property
+    def percentage(self):
+        return self.present / self.total * 100 if self.total else 0.0
+
+    def __str__(self):
+        return f"{self.enrollment} - {self.present}/{self.total} present"
+
+
+class AttendanceBitmap(models.Model):
+    """
+    One enrollment's attendance over a term packed 2 bits per day from
+    term_start (0 no session, 1 present, 2 absent, 3 late), four days to a
+    byte. Built from and expanded back to Attendance rows by attendance.bitmaps.
+    """
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name="attendance_bitmaps")
+    term_start = models.DateField()
+    days = models.PositiveSmallIntegerField()
+    bits = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("enrollment", "term_start")
+
+    def __str__(self):
+        return f"{self.enrollment} - term from {self.term_start} ({self.days} days)"
+
+
+class AttendanceThreshold(models.Model):
+    """
+    Minimum attendance percentage of a program's students. Programs without
+    one use settings.ATTENDANCE_ALERT_THRESHOLD; no alert is raised before
+    `min_sessions` sessions have been marked.
+    """
+    program = models.OneToOneField(Program, on_delete=models.CASCADE, related_name="attendance_threshold")
+    min_percentage = models.FloatField(default=75.0)
+    min_sessions = models.PositiveIntegerField(default=5)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.program}: {self.min_percentage}%"
+
+
+class AttendanceAlert(models.Model):
+    """
+    An enrollment below its program's attendance threshold, raised and
+    resolved by attendance.alerts.evaluate_attendance_alerts. An enrollment
+    has at most one open alert.
+    """
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name="attendance_alerts")
+    percentage = models.FloatField()
+    threshold = models.FloatField()
+    sessions = models.PositiveIntegerField()
+    absence_streak = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['enrollment'], condition=models.Q(resolved_at__isnull=True),
+                                    name='attendance_alert_one_open'),
+        ]
+
+    def __str__(self):
+        return f"{self.enrollment} - {self.percentage:.1f}% < {self.threshold}%"
+
+
+class AttendanceAlertRun(models.Model):
+    """One evaluation pass; the last run's start is where the next one picks up."""
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+    evaluated = models.PositiveIntegerField(default=0)
+    raised = models.PositiveIntegerField(default=0)
+    resolved = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Attendance alert run {self.started_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,182 @@
+import copy
+from collections import defaultdict
+from datetime import date as date_cls
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, OuterRef, PositiveIntegerField, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Now
+from enrollments.models import Enrollment
+from .models import Attendance, AttendanceSummary
+
+STATUSES = {status for status, _ in Attendance.STATUS_CHOICES}
+SUMMARY_FIELDS = {'PRESENT': 'present', 'ABSENT': 'absent', 'LATE': 'late'}
+
+
+# Attendance summaries. Counts move by F() deltas in UPDATEs grouped by equal
+# deltas, so concurrent markings never overwrite each other. A record newer
+# than the enrollment's last one extends or resets the absence streak in the
+# same UPDATE; edits, deletions and backdated records recompute the streak
+# and last date from the enrollment's rows with a set-based UPDATE.
+
+def _streak_updates():
+    """Column values of last_marked_date and absence_streak recomputed from Attendance."""
+    records = Attendance.objects.filter(enrollment_id=OuterRef('enrollment_id')).order_by().values('enrollment_id')
+    last_attended = records.exclude(status='ABSENT').annotate(last=Max('date')).values('last')
+    streak = (records.filter(status='ABSENT', date__gt=Coalesce(Subquery(last_attended), Value(date_cls.min)))
+              .annotate(n=Count('id')).values('n'))
+    return {
+        'last_marked_date': Subquery(records.annotate(last=Max('date')).values('last')),
+        'absence_streak': Coalesce(Subquery(streak), 0, output_field=PositiveIntegerField()),
+    }
+
+
+def refresh_streaks(enrollment_ids):
+    AttendanceSummary.objects.filter(enrollment_id__in=enrollment_ids).update(**_streak_updates(), updated_at=Now())
+
+
+def record_attendance_changes(before, after):
+    """
+    Adjust the AttendanceSummary rows for changed Attendance records.
+    `before` are the records as they were (empty for inserts) and `after` as
+    they are now (empty for deletes); both only need enrollment_id, date and
+    status.
+    """
+    if not before and not after:
+        return
+    old = {(r.enrollment_id, r.date): r.status for r in before}
+    appended = defaultdict(list)  # (date, status) -> enrollment ids of new records
+    deltas = defaultdict(lambda: defaultdict(int))
+    recompute = set()
+    for record in after:
+        status = old.pop((record.enrollment_id, record.date), None)
+        if status is None:
+            appended[record.date, record.status].append(record.enrollment_id)
+        elif status != record.status:
+            deltas[record.enrollment_id][SUMMARY_FIELDS[record.status]] += 1
+            deltas[record.enrollment_id][SUMMARY_FIELDS[status]] -= 1
+            recompute.add(record.enrollment_id)
+    for (enrollment_id, _), status in old.items():  # deleted, or moved to another enrollment or date
+        deltas[enrollment_id][SUMMARY_FIELDS[status]] -= 1
+        deltas[enrollment_id]['total'] -= 1
+        recompute.add(enrollment_id)
+
+    with transaction.atomic():
+        # Only new records need a row; deletes may be cascading from the enrollment
+        AttendanceSummary.objects.bulk_create(
+            [AttendanceSummary(enrollment_id=enrollment_id) for enrollment_id in {r.enrollment_id for r in after}],
+            ignore_conflicts=True,
+        )
+        for (on_date, status), ids in appended.items():
+            newer = Q(last_marked_date__isnull=True) | Q(last_marked_date__lt=on_date)
+            AttendanceSummary.objects.filter(enrollment_id__in=ids).update(
+                **{SUMMARY_FIELDS[status]: F(SUMMARY_FIELDS[status]) + 1},
+                total=F('total') + 1,
+                absence_streak=Case(
+                    When(newer, then=F('absence_streak') + 1 if status == 'ABSENT' else Value(0)),
+                    default=F('absence_streak'),
+                    output_field=PositiveIntegerField(),
+                ),
+                last_marked_date=Case(When(newer, then=Value(on_date)), default=F('last_marked_date')),
+                updated_at=Now(),
+            )
+            # Backdated records may fall inside the current streak
+            recompute.update(AttendanceSummary.objects.filter(enrollment_id__in=ids, last_marked_date__gt=on_date)
+                             .values_list('enrollment_id', flat=True))
+
+        by_delta = defaultdict(list)
+        for enrollment_id, fields in deltas.items():
+            changed = tuple(sorted((field, n) for field, n in fields.items() if n))
+            if changed:
+                by_delta[changed].append(enrollment_id)
+        for changed, ids in by_delta.items():
+            AttendanceSummary.objects.filter(enrollment_id__in=ids).update(
+                **{field: F(field) + n for field, n in changed}, updated_at=Now())
+
+        if recompute:
+            refresh_streaks(recompute)
+
+
+def rebuild_attendance_summaries(chunk_size=1000):
+    """Recreate every AttendanceSummary from the Attendance table. Returns the number of rows."""
+    rows = (Attendance.objects.values_list('enrollment_id').order_by('enrollment_id')
+            .annotate(present=Count('id', filter=Q(status='PRESENT')), absent=Count('id', filter=Q(status='ABSENT')),
+                      late=Count('id', filter=Q(status='LATE')), total=Count('id'), last=Max('date')))
+    with transaction.atomic():
+        AttendanceSummary.objects.all().delete()
+        summaries = [
+            AttendanceSummary(enrollment_id=enrollment_id, present=present, absent=absent, late=late, total=total,
+                              last_marked_date=last)
+            for enrollment_id, present, absent, late, total, last in rows.iterator(chunk_size=chunk_size)
+        ]
+        AttendanceSummary.objects.bulk_create(summaries, batch_size=chunk_size)
+        AttendanceSummary.objects.update(**_streak_updates())
+    return len(summaries)
+
+
+def _parse_attendance_row(row, enrollments):
+    """(enrollment_id, status, remarks) of a session row, or raise ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object with enrollment and status.")
+    enrollment = row.get('enrollment', row.get('enrollment_id'))
+    try:
+        enrollment_id = int(enrollment)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid enrollment '{enrollment}'.")
+    if enrollment_id not in enrollments:
+        raise ValueError(f"Enrollment {enrollment_id} is not an active enrollment in this course.")
+    status = str(row.get('status') or '').strip().upper()
+    if status not in STATUSES:
+        raise ValueError(f"Invalid status '{row.get('status')}'; choose from {', '.join(sorted(STATUSES))}.")
+    return enrollment_id, status, (row.get('remarks') or None)
+
+
+def mark_session(course, date, rows, marked_by):
+    """
+    Create or update the attendance of one class session of `course` on
+    `date` from rows ({enrollment, status, remarks}). Valid rows are written
+    with one bulk upsert on (enrollment, date) in one transaction. Returns
+    (created, updated, counts by status, errors) where errors is a list of
+    {"row": n, "error": message} (rows numbered from 1).
+    """
+    enrollments = {
+        e.pk: e for e in Enrollment.objects.filter(course=course).exclude(status='DROPPED')
+        .select_related('student', 'course')
+    }
+
+    parsed, errors, seen = {}, [], {}
+    for number, row in enumerate(rows, start=1):
+        try:
+            enrollment_id, status, remarks = _parse_attendance_row(row, enrollments)
+            if enrollment_id in seen:
+                raise ValueError(f"Duplicate of row {seen[enrollment_id]}.")
+        except ValueError as exc:
+            errors.append({"row": number, "error": str(exc)})
+            continue
+        seen[enrollment_id] = number
+        parsed[enrollment_id] = (status, remarks)
+
+    counts = dict.fromkeys(sorted(STATUSES), 0)
+    if not parsed:
+        return 0, 0, counts, errors
+
+    with transaction.atomic():
+        before = []
+        for record in Attendance.objects.select_for_update().filter(date=date, enrollment_id__in=parsed):
+            record.enrollment = enrollments[record.enrollment_id]
+            before.append(copy.copy(record))
+
+        records = [
+            Attendance(enrollment=enrollments[enrollment_id], date=date, status=status, remarks=remarks,
+                       marked_by=marked_by)
+            for enrollment_id, (status, remarks) in parsed.items()
+        ]
+        Attendance.objects.bulk_create(records, update_conflicts=True, unique_fields=['enrollment', 'date'],
+                                       update_fields=['status', 'remarks', 'marked_by'])
+
+        # Signals don't fire for bulk writes
+        record_attendance_changes(before, records)
+        from analytics.signals import record_bulk_write
+        record_bulk_write(Attendance, before, records)
+
+    for status, _ in parsed.values():
+        counts[status] += 1
+    return len(parsed) - len(before), len(before), counts, errors
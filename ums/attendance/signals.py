@@ -0,0 +1,63 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from enrollments.models import Enrollment
+from students.models import StudentProfile
+from .alerts import mark_for_evaluation
+from .models import Attendance, AttendanceSummary, AttendanceThreshold
+from .services import record_attendance_changes
+
+# AttendanceSummary follows every single-row write here; bulk writes call
+# record_attendance_changes themselves (see services.mark_session).
+
+@receiver(pre_save, sender=Attendance)
+def capture_previous_attendance(sender, instance, raw=False, **kwargs):
+    instance._previous_attendance = None
+    if instance.pk and not raw:
+        previous = (Attendance.objects.filter(pk=instance.pk)
+                    .values_list('enrollment_id', 'date', 'status').first())
+        if previous:
+            enrollment_id, date, status = previous
+            instance._previous_attendance = Attendance(enrollment_id=enrollment_id, date=date, status=status)
+
+@receiver(post_save, sender=Attendance)
+def update_attendance_summary(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_attendance', None)
+    record_attendance_changes([previous] if previous else [], [instance])
+    instance._previous_attendance = None
+
+@receiver(post_delete, sender=Attendance)
+def remove_from_attendance_summary(sender, instance, **kwargs):
+    record_attendance_changes([instance], [])
+
+# A status or program change, or a deleted threshold, can raise or resolve an
+# alert without any attendance being marked: mark the summaries involved so
+# the next incremental alert run re-evaluates them.
+@receiver(pre_save, sender=Enrollment)
+def capture_previous_enrollment_status(sender, instance, raw=False, **kwargs):
+    instance._previous_status = None
+    if instance.pk and not raw:
+        instance._previous_status = Enrollment.objects.filter(pk=instance.pk).values_list('status').first()
+
+@receiver(post_save, sender=Enrollment)
+def reevaluate_enrollment_alerts(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if previous and previous[0] != instance.status:
+        mark_for_evaluation(AttendanceSummary.objects.filter(enrollment=instance))
+
+@receiver(pre_save, sender=StudentProfile)
+def capture_previous_program(sender, instance, raw=False, **kwargs):
+    instance._previous_program = None
+    if instance.pk and not raw:
+        instance._previous_program = StudentProfile.objects.filter(pk=instance.pk).values_list('program_id').first()
+
+@receiver(post_save, sender=StudentProfile)
+def reevaluate_student_alerts(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_program', None)
+    if previous and previous[0] != instance.program_id:
+        mark_for_evaluation(AttendanceSummary.objects.filter(enrollment__student=instance))
+
+@receiver(post_delete, sender=AttendanceThreshold)
+def reevaluate_program_alerts(sender, instance, **kwargs):
+    mark_for_evaluation(AttendanceSummary.objects.filter(enrollment__student__program_id=instance.program_id))
@@ -1,3 +1,373 @@
+from datetime import date, timedelta
+import numpy as np
 from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+from academics.models import Batch, Program
+from attendance.alerts import evaluate_attendance_alerts
+from attendance.bitmaps import (
+    ABSENT, LATE, NO_SESSION, PRESENT, build_bitmaps, pack, restore_attendance, term_stats, unpack,
+)
+from attendance.models import (
+    Attendance, AttendanceAlert, AttendanceAlertRun, AttendanceBitmap, AttendanceSummary, AttendanceThreshold,
+)
+from attendance.services import mark_session, rebuild_attendance_summaries
+from courses.models import Course
+from enrollments.models import Enrollment
+from notifications.models import Notification
+from users.models import User
 
-# Create your tests here.
+START = date(2025, 9, 1)
+
+
+class AttendanceSummaryTests(TestCase):
+    """The incrementally maintained AttendanceSummary rows equal a rebuild from the Attendance table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(name='Fall 2025', start_date=START, end_date=date(2026, 1, 31))
+        program = Program.objects.create(batch=batch, name='BSCS')
+        cls.faculty = User.objects.create_user(email='faculty@example.edu', password='x', first_name='F',
+                                               last_name='L', role='FACULTY')
+        cls.course = Course.objects.create(program=program, batch=batch, code='CS101', name='Intro', semester=1,
+                                           faculty=cls.faculty)
+        cls.enrollments = []
+        for i in range(4):
+            user = User.objects.create_user(email=f'student{i}@example.edu', password='x', first_name='S',
+                                            last_name=str(i), role='STUDENT')
+            cls.enrollments.append(Enrollment.objects.create(student=user.student_profile, course=cls.course))
+
+    def session(self, day, statuses):
+        created, updated, counts, errors = mark_session(
+            self.course, START + timedelta(days=day),
+            [{'enrollment': e.pk, 'status': s} for e, s in zip(self.enrollments, statuses)], self.faculty)
+        self.assertEqual(errors, [])
+
+    def record(self, enrollment, day, status):
+        return Attendance.objects.create(enrollment=enrollment, date=START + timedelta(days=day), status=status,
+                                         marked_by=self.faculty)
+
+    @staticmethod
+    def summaries():
+        # Deleting every record of an enrollment leaves a zeroed row that a rebuild doesn't create
+        return {
+            row[0]: row[1:] for row in AttendanceSummary.objects.filter(total__gt=0).values_list(
+                'enrollment_id', 'present', 'absent', 'late', 'total', 'last_marked_date', 'absence_streak')
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.summaries()
+        rebuild_attendance_summaries()
+        self.assertEqual(incremental, self.summaries())
+
+    def test_sessions_and_remarking(self):
+        self.session(0, ['PRESENT', 'ABSENT', 'LATE', 'ABSENT'])
+        self.session(1, ['ABSENT', 'ABSENT', 'PRESENT', 'ABSENT'])
+        self.session(2, ['ABSENT', 'ABSENT', 'ABSENT', 'LATE'])
+        self.assertMatchesRebuild()
+        # Marking a session again updates its records
+        self.session(2, ['PRESENT', 'ABSENT', 'LATE', 'ABSENT'])
+        self.assertMatchesRebuild()
+
+    def test_single_row_edits_backdated_inserts_and_deletes(self):
+        first, second, third, _ = self.enrollments
+        self.session(3, ['ABSENT', 'PRESENT', 'ABSENT', 'PRESENT'])
+        self.session(4, ['ABSENT', 'ABSENT', 'ABSENT', 'PRESENT'])
+        self.assertMatchesRebuild()
+
+        # Backdated records, inside and before the current absence streak
+        self.record(first, 1, 'PRESENT')
+        self.record(second, 0, 'ABSENT')
+        self.record(third, 2, 'ABSENT')
+        self.assertMatchesRebuild()
+
+        edited = Attendance.objects.get(enrollment=first, date=START + timedelta(days=4))
+        edited.status = 'LATE'
+        edited.save()
+        moved = Attendance.objects.get(enrollment=second, date=START + timedelta(days=3))
+        moved.date = START + timedelta(days=9)
+        moved.save()
+        self.assertMatchesRebuild()
+
+        Attendance.objects.get(enrollment=first, date=START + timedelta(days=4)).delete()
+        Attendance.objects.filter(enrollment=third).get(date=START + timedelta(days=3)).delete()
+        self.assertMatchesRebuild()
+        for record in Attendance.objects.filter(enrollment=third):
+            record.delete()
+        self.session(5, ['PRESENT', 'ABSENT', 'ABSENT', 'ABSENT'])
+        self.assertMatchesRebuild()
+
+
+class AttendanceBitmapTests(TestCase):
+    """Bitmaps round-trip the Attendance rows of a term."""
+
+    END = START + timedelta(days=29)
+
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(name='Fall 2025', start_date=START, end_date=date(2026, 1, 31))
+        program = Program.objects.create(batch=batch, name='BSCS')
+        cls.faculty = User.objects.create_user(email='faculty@example.edu', password='x', first_name='F',
+                                               last_name='L', role='FACULTY')
+        cls.course = Course.objects.create(program=program, batch=batch, code='CS101', name='Intro', semester=1,
+                                           faculty=cls.faculty)
+        cls.enrollments = []
+        for i in range(2):
+            user = User.objects.create_user(email=f'student{i}@example.edu', password='x', first_name='S',
+                                            last_name=str(i), role='STUDENT')
+            cls.enrollments.append(Enrollment.objects.create(student=user.student_profile, course=cls.course))
+
+    def record(self, enrollment, day, status):
+        return Attendance.objects.create(enrollment=enrollment, date=START + timedelta(days=day), status=status,
+                                         marked_by=self.faculty)
+
+    @staticmethod
+    def rows():
+        return set(Attendance.objects.values_list('enrollment_id', 'date', 'status'))
+
+    def test_pack_unpack_round_trip(self):
+        rng = np.random.default_rng(0)
+        for days in (1, 3, 4, 5, 140):
+            with self.subTest(days=days):
+                codes = rng.integers(0, 4, size=(3, days), dtype=np.uint8)
+                bitmaps = pack(codes)
+                self.assertEqual([len(bits) for bits in bitmaps], [(days + 3) // 4] * 3)
+                np.testing.assert_array_equal(unpack(bitmaps, days), codes)
+                self.assertEqual(pack(codes[0]), bitmaps[0])
+        # A bitmap shorter than the days asked for reads as no session after its end
+        np.testing.assert_array_equal(unpack([pack([PRESENT] * 4)], 6), [[PRESENT] * 4 + [NO_SESSION] * 2])
+
+    def test_term_stats(self):
+        codes = np.array([
+            [PRESENT, ABSENT, NO_SESSION, LATE, ABSENT, ABSENT],
+            [ABSENT, ABSENT, NO_SESSION, NO_SESSION, NO_SESSION, NO_SESSION],
+            [NO_SESSION] * 6,
+        ], dtype=np.uint8)
+        stats = term_stats(codes)
+        self.assertEqual(stats['present'].tolist(), [1, 0, 0])
+        self.assertEqual(stats['absent'].tolist(), [3, 2, 0])
+        self.assertEqual(stats['late'].tolist(), [1, 0, 0])
+        self.assertEqual(stats['sessions'].tolist(), [5, 2, 0])
+        self.assertEqual(stats['percentage'].tolist(), [20.0, 0.0, 0.0])
+        self.assertEqual(stats['absence_streak'].tolist(), [2, 2, 0])
+
+    def test_build_and_restore(self):
+        first, second = self.enrollments
+        for day, status in ((0, 'PRESENT'), (2, 'ABSENT'), (29, 'LATE')):
+            self.record(first, day, status)
+        self.record(second, 5, 'ABSENT')
+        self.record(second, 30, 'PRESENT')  # after the term
+        before = self.rows()
+        self.assertEqual(build_bitmaps(START, self.END), 2)
+
+        Attendance.objects.filter(date__lte=self.END).delete()
+        self.assertEqual(restore_attendance(AttendanceBitmap.objects.all(), marked_by=self.faculty), 4)
+        self.assertEqual(self.rows(), before)
+        self.assertEqual(restore_attendance(AttendanceBitmap.objects.all()), 0)
+
+    def test_rebuild_drops_bitmaps_without_attendance(self):
+        first, second = self.enrollments
+        self.record(first, 0, 'PRESENT')
+        self.record(second, 1, 'ABSENT')
+        build_bitmaps(START, self.END)
+
+        Attendance.objects.filter(enrollment=second).delete()
+        self.assertEqual(build_bitmaps(START, self.END, course_ids=[self.course.pk]), 1)
+        self.assertEqual(list(AttendanceBitmap.objects.values_list('enrollment_id', flat=True)), [first.pk])
+
+
+class AttendanceSessionTests(TestCase):
+    """POST /api/attendance/sessions/ marks or re-marks a whole class session."""
+
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(name='Fall 2025', start_date=START, end_date=date(2026, 1, 31))
+        program = Program.objects.create(batch=batch, name='BSCS')
+        cls.faculty = User.objects.create_user(email='faculty@example.edu', password='x', first_name='F',
+                                               last_name='L', role='FACULTY')
+        cls.course, cls.other_course = (
+            Course.objects.create(program=program, batch=batch, code=code, name=code, semester=1, faculty=cls.faculty)
+            for code in ('CS101', 'MA101'))
+        cls.enrollments = []
+        for i in range(3):
+            user = User.objects.create_user(email=f'student{i}@example.edu', password='x', first_name='S',
+                                            last_name=str(i), role='STUDENT')
+            cls.enrollments.append(Enrollment.objects.create(student=user.student_profile, course=cls.course))
+        cls.dropped = Enrollment.objects.create(student=cls.enrollments[0].student, course=cls.other_course,
+                                                status='DROPPED')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.faculty)
+
+    def post(self, records, day=START, course=None):
+        return self.client.post(reverse('attendance-sessions'), {
+            'course': (course or self.course).pk, 'date': str(day), 'records': records,
+        }, format='json')
+
+    @staticmethod
+    def statuses():
+        return dict(Attendance.objects.values_list('enrollment_id', 'status'))
+
+    def test_marks_the_session(self):
+        first, second, third = self.enrollments
+        response = self.post([{'enrollment': first.pk, 'status': 'present'},
+                              {'enrollment': second.pk, 'status': 'ABSENT', 'remarks': 'Sick'},
+                              {'enrollment': third.pk, 'status': 'LATE'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['errors']), (3, 0, []))
+        self.assertEqual(response.data['counts'], {'ABSENT': 1, 'LATE': 1, 'PRESENT': 1})
+        self.assertEqual(self.statuses(), {first.pk: 'PRESENT', second.pk: 'ABSENT', third.pk: 'LATE'})
+        self.assertEqual(AttendanceSummary.objects.get(enrollment=second).absent, 1)
+
+    def test_marking_again_updates_the_records(self):
+        first, second, _ = self.enrollments
+        self.post([{'enrollment': first.pk, 'status': 'ABSENT'}, {'enrollment': second.pk, 'status': 'ABSENT'}])
+        response = self.post([{'enrollment': first.pk, 'status': 'PRESENT'},
+                              {'enrollment': second.pk, 'status': 'ABSENT'}])
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 2))
+        self.assertEqual(Attendance.objects.count(), 2)
+        self.assertEqual(self.statuses(), {first.pk: 'PRESENT', second.pk: 'ABSENT'})
+        summary = AttendanceSummary.objects.get(enrollment=first)
+        self.assertEqual((summary.present, summary.absent, summary.total), (1, 0, 1))
+
+    def test_invalid_rows_are_reported_and_the_rest_saved(self):
+        first, second, _ = self.enrollments
+        response = self.post([
+            {'enrollment': first.pk, 'status': 'PRESENT'},
+            {'enrollment': second.pk, 'status': 'EXCUSED'},
+            {'enrollment': self.dropped.pk, 'status': 'PRESENT'},
+            {'enrollment': 'abc', 'status': 'PRESENT'},
+            {'enrollment': first.pk, 'status': 'ABSENT'},
+            'PRESENT',
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4, 5, 6])
+        self.assertEqual(self.statuses(), {first.pk: 'PRESENT'})
+
+        response = self.post([{'enrollment': self.dropped.pk, 'status': 'PRESENT'}], course=self.other_course)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['errors']), 1)
+
+    def test_malformed_requests(self):
+        records = [{'enrollment': self.enrollments[0].pk, 'status': 'PRESENT'}]
+        url = reverse('attendance-sessions')
+        for body in ({'course': 'abc', 'date': '2025-09-01', 'records': records},
+                     {'course': self.course.pk, 'date': '2025-02-30', 'records': records},
+                     {'course': self.course.pk, 'date': '01/09/2025', 'records': records},
+                     {'course': self.course.pk, 'date': '2025-09-01', 'records': 'PRESENT'}):
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post(url, body, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'course': 0, 'date': '2025-09-01', 'records': records},
+                                          format='json').status_code, 404)
+        self.assertFalse(Attendance.objects.exists())
+
+
+class AttendanceAlertTests(TestCase):
+    """Alerts raised, refreshed and resolved from the summaries, re-evaluating only what changed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(name='Fall 2025', start_date=START, end_date=date(2026, 1, 31))
+        cls.program = Program.objects.create(batch=batch, name='BSCS')
+        cls.faculty = User.objects.create_user(email='faculty@example.edu', password='x', first_name='F',
+                                               last_name='L', role='FACULTY')
+        cls.course = Course.objects.create(program=cls.program, batch=batch, code='CS101', name='Intro', semester=1,
+                                           faculty=cls.faculty)
+        cls.enrollments = []
+        for i in range(3):
+            user = User.objects.create_user(email=f'student{i}@example.edu', password='x', first_name='S',
+                                            last_name=str(i), role='STUDENT')
+            student = user.student_profile
+            student.program = cls.program
+            student.save()
+            cls.enrollments.append(Enrollment.objects.create(student=student, course=cls.course))
+        cls.threshold = AttendanceThreshold.objects.create(program=cls.program, min_percentage=50, min_sessions=3)
+
+    def session(self, day, statuses):
+        created, updated, counts, errors = mark_session(
+            self.course, START + timedelta(days=day),
+            [{'enrollment': e.pk, 'status': s} for e, s in zip(self.enrollments, statuses) if s], self.faculty)
+        self.assertEqual(errors, [])
+
+    @staticmethod
+    def age():
+        """Push every change so far before the last run's lookback, as if it were made long ago."""
+        AttendanceSummary.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        AttendanceThreshold.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        AttendanceAlertRun.objects.update(started_at=timezone.now() - timedelta(hours=1))
+
+    @staticmethod
+    def open_alerts():
+        return dict(AttendanceAlert.objects.filter(resolved_at__isnull=True).values_list('enrollment_id', 'sessions'))
+
+    def test_raise_refresh_and_resolve(self):
+        first, second, third = self.enrollments
+        self.session(0, ['ABSENT', 'PRESENT', 'ABSENT'])
+        self.session(1, ['ABSENT', 'PRESENT', 'ABSENT'])
+        self.session(2, ['PRESENT', 'ABSENT', None])  # third has too few sessions to judge
+        run = evaluate_attendance_alerts()
+        self.assertEqual((run.full, run.evaluated, run.raised, run.resolved), (True, 3, 1, 0))
+        alert = AttendanceAlert.objects.get()
+        self.assertEqual((alert.enrollment_id, alert.sessions, round(alert.percentage, 1)), (first.pk, 3, 33.3))
+        # The student and the course faculty are told once
+        self.assertEqual(sorted(Notification.objects.values_list('user_id', flat=True)),
+                         sorted([first.student.user_id, self.faculty.pk]))
+
+        self.session(3, ['ABSENT', 'PRESENT', 'ABSENT'])
+        run = evaluate_attendance_alerts()
+        self.assertEqual((run.raised, run.resolved), (1, 0))
+        self.assertEqual(self.open_alerts(), {first.pk: 4, third.pk: 3})
+        self.assertEqual(Notification.objects.count(), 4)
+
+        self.session(4, ['PRESENT', None, 'PRESENT'])
+        self.session(5, ['PRESENT', None, 'PRESENT'])
+        self.session(6, ['PRESENT', None, 'PRESENT'])
+        run = evaluate_attendance_alerts()
+        self.assertEqual((run.raised, run.resolved), (0, 2))
+        self.assertEqual(self.open_alerts(), {})
+        self.assertEqual(Notification.objects.count(), 4)
+
+    def test_incremental_runs_only_evaluate_what_changed(self):
+        first, second, third = self.enrollments
+        for day in range(3):
+            self.session(day, ['ABSENT', 'PRESENT', 'PRESENT'])
+        self.assertEqual(evaluate_attendance_alerts().raised, 1)
+        self.age()
+
+        self.session(3, [None, 'ABSENT', None])
+        run = evaluate_attendance_alerts()
+        self.assertEqual((run.full, run.evaluated, run.raised), (False, 1, 0))
+        self.age()
+        self.assertEqual(evaluate_attendance_alerts().evaluated, 0)
+
+        # A stricter threshold re-evaluates the whole program
+        self.age()
+        self.threshold.min_percentage = 80
+        self.threshold.save()
+        run = evaluate_attendance_alerts()
+        self.assertEqual((run.evaluated, run.raised), (3, 1))
+        self.assertEqual(set(self.open_alerts()), {first.pk, second.pk})
+
+        # Dropping the course resolves the alert without any attendance marked
+        self.age()
+        first.status = 'DROPPED'
+        first.save()
+        run = evaluate_attendance_alerts()
+        self.assertEqual((run.evaluated, run.resolved), (1, 1))
+        self.assertEqual(set(self.open_alerts()), {second.pk})
+
+        # Without the program's threshold the default applies again
+        self.age()
+        self.threshold.delete()
+        run = evaluate_attendance_alerts()
+        self.assertEqual((run.evaluated, run.resolved), (3, 1))
+        self.assertEqual(self.open_alerts(), {})
+
+    def test_full_run_evaluates_everything(self):
+        self.session(0, ['PRESENT', 'PRESENT', 'PRESENT'])
+        evaluate_attendance_alerts()
+        self.age()
+        self.assertEqual(evaluate_attendance_alerts().evaluated, 0)
+        self.assertEqual(evaluate_attendance_alerts(full=True).evaluated, 3)
@@ -2,7 +2,9 @@ from django.urls import path
 from .views import (
     FacultyAttendanceCreateView,
     AttendanceFacultyListView,
-    FacultyAttendanceUpdateView
+    FacultyAttendanceUpdateView,
+    AttendanceSessionView,
+    CourseTermAttendanceView
 )
 from .views import StudentAttendanceListView
 
@@ -11,6 +13,8 @@ urlpatterns = [
     path('faculty/mark/', FacultyAttendanceCreateView.as_view(), name='faculty-attendance-mark'),
     path('faculty/list/', AttendanceFacultyListView.as_view(), name='faculty-attendance-list'),
     path('faculty/update/<int:pk>/', FacultyAttendanceUpdateView.as_view(), name='faculty-attendance-update'),
+    path('sessions/', AttendanceSessionView.as_view(), name='attendance-sessions'),
+    path('courses/<int:course_id>/term/', CourseTermAttendanceView.as_view(), name='course-term-attendance'),
 
     # Student APIs
     path('student/list/', StudentAttendanceListView.as_view(), name='student-attendance-list'),
@@ -1,7 +1,14 @@
-from rest_framework import generics, permissions
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import Attendance
 from .serializers import AttendanceSerializer
+from .bitmaps import course_term_attendance
+from .services import mark_session
 from attendance.permissions import IsFaculty, IsAdmin
+from courses.models import Course
 from org_structure.models import DepartmentMember
 
 
@@ -14,6 +21,61 @@ class FacultyAttendanceCreateView(generics.CreateAPIView):
         serializer.save(marked_by=self.request.user)
 
 
+class AttendanceSessionView(APIView):
+    """
+    Faculty/Admin: Mark a whole class session at once.
+    POST {"course": id, "date": "YYYY-MM-DD",
+          "records": [{"enrollment": id, "status": "PRESENT|ABSENT|LATE", "remarks": ""}]}
+    Existing records of that date are updated. Valid rows are saved; invalid
+    ones are reported per row.
+    """
+    permission_classes = [IsFaculty | IsAdmin]
+
+    def post(self, request):
+        try:
+            course_id = int(request.data.get('course'))
+            # parse_date returns None when malformed and raises on impossible dates (2024-02-30)
+            date = parse_date(str(request.data.get('date') or ''))
+        except (TypeError, ValueError):
+            course_id = date = None
+        records = request.data.get('records')
+        if course_id is None or date is None or not isinstance(records, list):
+            return Response({"detail": "course, date (YYYY-MM-DD) and a list of records are required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        course = get_object_or_404(Course, pk=course_id)
+
+        created, updated, counts, errors = mark_session(course, date, records, request.user)
+        return Response(
+            {"course": course.pk, "date": date, "created": created, "updated": updated,
+             "counts": counts, "errors": errors},
+            status=status.HTTP_400_BAD_REQUEST if errors and not (created or updated) else status.HTTP_200_OK
+        )
+
+
+class CourseTermAttendanceView(APIView):
+    """
+    Faculty/Admin: Attendance of every student of a course over a term, read
+    from the packed term bitmaps (see attendance.bitmaps). ?term_start=
+    defaults to the start date of the course's batch.
+    """
+    permission_classes = [IsFaculty | IsAdmin]
+
+    def get(self, request, course_id):
+        course = get_object_or_404(Course.objects.select_related('batch'), pk=course_id)
+        try:
+            term_start = parse_date(request.query_params.get('term_start') or '')
+        except ValueError:
+            return Response({"detail": "term_start must be a valid date (YYYY-MM-DD)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if term_start is None:
+            if course.batch is None:
+                return Response({"detail": "term_start (YYYY-MM-DD) is required."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            term_start = course.batch.start_date
+        return Response({"course": course.pk, "term_start": term_start,
+                         "students": course_term_attendance(course.pk, term_start)})
+
+
 # Faculty: View and mark attendance
 class AttendanceFacultyListView(generics.ListAPIView):
     serializer_class = AttendanceSerializer
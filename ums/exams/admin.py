@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Exam, Grade
+from .models import Exam, Grade, GradingScale, GradingScaleBand, Ranking
 
 @admin.register(Exam)
 class ExamAdmin(admin.ModelAdmin):
@@ -12,3 +12,19 @@ class GradeAdmin(admin.ModelAdmin):
     list_display = ("enrollment", "exam", "marks_obtained")
     list_filter = ("exam__course",)
     search_fields = ("enrollment__student__roll_no", "exam__title")
+
+class GradingScaleBandInline(admin.TabularInline):
+    model = GradingScaleBand
+    extra = 0
+
+@admin.register(GradingScale)
+class GradingScaleAdmin(admin.ModelAdmin):
+    list_display = ("name", "program", "batch", "effective_from")
+    list_filter = ("program", "batch")
+    inlines = [GradingScaleBandInline]
+
+@admin.register(Ranking)
+class RankingAdmin(admin.ModelAdmin):
+    list_display = ("student", "scope", "scope_id", "rank", "size", "score", "percentile", "computed_at")
+    list_filter = ("scope",)
+    search_fields = ("student__roll_no",)
@@ -0,0 +1,139 @@
+"""
+Exam clash detection.
+
+A ClashIndex reads the exams of a date range and the enrollments of their
+courses in two queries and expands them into one sorted (day, student, exam)
+row per sitting. Checking a proposed exam is then a binary search for its
+day plus a membership test against its course's students, and the full
+timetable report is a single pass over adjacent rows.
+
+Two exams clash when a student who is not DROPPED from either course has
+both on the same date; exams carry a date but no time.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from itertools import combinations, groupby
+from operator import itemgetter
+import numpy as np
+from django.conf import settings
+from ums.columns import load_columns
+from enrollments.models import Enrollment
+from .models import Exam
+
+EXAM_CLASH_WINDOW_DAYS = getattr(settings, 'EXAM_CLASH_WINDOW_DAYS', 120)
+EXAM_CLASH_SAMPLE_SIZE = getattr(settings, 'EXAM_CLASH_SAMPLE_SIZE', 20)
+
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+
+def _day(value):
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+def term_bounds(course, on_date):
+    """Dates of the term `on_date` falls in: the course batch's dates, else a window around it."""
+    batch = course.batch
+    if batch and batch.start_date <= on_date <= batch.end_date:
+        return batch.start_date, batch.end_date
+    window = timedelta(days=EXAM_CLASH_WINDOW_DAYS // 2)
+    return on_date - window, on_date + window
+
+
+class ClashIndex:
+    """Student sittings of every exam between date_from and date_to (inclusive)."""
+
+    def __init__(self, date_from, date_to, course_ids=()):
+        """`course_ids` are courses whose students are also loaded, e.g. that of a proposed exam."""
+        self.date_from, self.date_to = date_from, date_to
+        self.exams = {
+            pk: {"id": pk, "title": title, "course": course_id, "course_code": code, "date": on_date}
+            for pk, title, course_id, code, on_date in Exam.objects.filter(date__range=(date_from, date_to))
+            .values_list('id', 'title', 'course_id', 'course__code', 'date')
+        }
+        exam_ids = np.fromiter(self.exams, np.int64, len(self.exams))
+        exam_courses = np.fromiter((e["course"] for e in self.exams.values()), np.int64, len(self.exams))
+        exam_days = np.fromiter((_day(e["date"]) for e in self.exams.values()), np.int64, len(self.exams))
+
+        # Students of each course, contiguous per course
+        cols = load_columns(
+            Enrollment.objects.filter(course_id__in=set(exam_courses.tolist()) | set(course_ids))
+            .exclude(status='DROPPED'),
+            {'course_id': np.int64, 'student_id': np.int64},
+        )
+        order = np.lexsort((cols['student_id'], cols['course_id']))
+        self._students = cols['student_id'][order]
+        self._courses, self._starts, self._counts = np.unique(
+            cols['course_id'][order], return_index=True, return_counts=True)
+
+        # One row per (exam, enrolled student), sorted by day, student, exam
+        starts, counts = self._slices(exam_courses)
+        exam_row = np.repeat(np.arange(len(exam_ids)), counts)
+        offsets = np.arange(len(exam_row)) - np.repeat(np.cumsum(counts) - counts, counts)
+        student = self._students[np.repeat(starts, counts) + offsets]
+        day, exam = exam_days[exam_row], exam_ids[exam_row]
+        order = np.lexsort((exam, student, day))
+        self.day, self.student, self.exam = day[order], student[order], exam[order]
+
+    def _slices(self, course_ids):
+        """(start, count) of each course's students in self._students; count 0 for unknown courses."""
+        if not len(self._courses):
+            zeros = np.zeros(len(course_ids), dtype=np.int64)
+            return zeros, zeros
+        pos = np.minimum(np.searchsorted(self._courses, course_ids), len(self._courses) - 1)
+        return self._starts[pos], np.where(self._courses[pos] == course_ids, self._counts[pos], 0)
+
+    def course_students(self, course_id):
+        (start,), (count,) = self._slices(np.array([course_id], dtype=np.int64))
+        return self._students[start:start + count]
+
+    def clashes_for(self, course_id, on_date, exclude_exam_id=None):
+        """
+        Exams already on `on_date` that students of `course_id` also sit,
+        most affected first. `course_id` must have been passed to the index
+        unless it already has an exam in the range.
+        """
+        lo, hi = np.searchsorted(self.day, [_day(on_date), _day(on_date) + 1])
+        students, exams = self.student[lo:hi], self.exam[lo:hi]
+        mask = np.isin(students, self.course_students(course_id))
+        if exclude_exam_id is not None:
+            mask &= exams != exclude_exam_id
+        by_exam = defaultdict(list)
+        for exam, student in zip(exams[mask].tolist(), students[mask].tolist()):
+            by_exam[exam].append(student)
+        return sorted(
+            ({"exam": self.exams[exam], "students": len(ids), "student_ids": ids[:EXAM_CLASH_SAMPLE_SIZE]}
+             for exam, ids in by_exam.items()),
+            key=lambda clash: (-clash["students"], clash["exam"]["id"]),
+        )
+
+    def report(self):
+        """Every pair of exams sharing students on the same date, by date then most affected."""
+        same = (self.day[1:] == self.day[:-1]) & (self.student[1:] == self.student[:-1])
+        group = np.concatenate(([0], np.cumsum(~same)))[:len(self.day)]
+        clashing = np.bincount(group)[group] > 1
+
+        pairs = defaultdict(list)
+        rows = zip(group[clashing].tolist(), self.student[clashing].tolist(), self.exam[clashing].tolist())
+        for _, sittings in groupby(rows, key=itemgetter(0)):
+            sittings = list(sittings)
+            for a, b in combinations([exam for _, _, exam in sittings], 2):
+                pairs[a, b].append(sittings[0][1])
+
+        clashes = [
+            {"date": self.exams[a]["date"], "exams": [self.exams[a], self.exams[b]], "students": len(ids),
+             "student_ids": ids[:EXAM_CLASH_SAMPLE_SIZE]}
+            for (a, b), ids in pairs.items()
+        ]
+        clashes.sort(key=lambda clash: (clash["date"], -clash["students"], clash["exams"][0]["id"]))
+        return {
+            "date_from": self.date_from,
+            "date_to": self.date_to,
+            "exams": len(self.exams),
+            "students_with_clashes": len(np.unique(self.student[clashing])),
+            "clashes": clashes,
+        }
+
+
+def proposed_exam_clashes(course, on_date, exclude_exam_id=None):
+    """Clashes of an exam of `course` on `on_date`; only that day's exams are indexed."""
+    return ClashIndex(on_date, on_date, course_ids=(course.pk,)).clashes_for(course.pk, on_date, exclude_exam_id)
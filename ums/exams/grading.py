@@ -0,0 +1,181 @@
+"""
+Grading scales.
+
+A GradingScale maps percentages to grade points for a program, a batch or
+everyone, from its effective date on. The scales are compiled into sorted
+threshold lists, looked up with bisect (one mark), searchsorted (arrays) or
+a SQL CASE (aggregates), so every GPA path grades a mark the same way.
+
+The compiled scales are cached in each process under a version that is a
+hash of the scale rows. The rows are re-read from the database (one small
+query) at most every GRADING_SCALES_RECHECK_SECONDS and recompiled when the
+hash changed, so a scale edited through any process reaches every other one
+within that interval, whatever the cache backend.
+
+A mark is graded by the first scale, in order of program-specific, then
+batch-specific, then campus-wide scales (newest effective date first), whose
+scope matches the student and that was in effect on the exam date. Without
+one, DEFAULT_GRADE_SCALE applies.
+"""
+import hashlib
+import time
+from bisect import bisect_right
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
+
+EXAMS_CACHE_ALIAS = getattr(settings, 'EXAMS_CACHE_ALIAS', 'default')
+GRADING_SCALES_RECHECK_SECONDS = getattr(settings, 'GRADING_SCALES_RECHECK_SECONDS', 1)
+
+# (minimum percentage, grade point), highest first
+DEFAULT_GRADE_SCALE = [
+    (85, 4.0),
+    (80, 3.7),
+    (75, 3.3),
+    (70, 3.0),
+    (65, 2.7),
+    (60, 2.3),
+    (55, 2.0),
+    (50, 1.7),
+]
+
+
+def percentage(marks, total_marks):
+    """Marks as a percentage of total_marks (0 when total_marks is 0), computed like the SQL expression."""
+    return marks * 100.0 / total_marks if total_marks else 0.0
+
+
+class CompiledScale:
+    """One scale's bands as ascending thresholds; below the lowest threshold scores 0."""
+
+    def __init__(self, bands, pk=None, program_id=None, batch_id=None, effective_from=None):
+        bands = sorted((float(threshold), float(point)) for threshold, point in bands)
+        self.thresholds = [threshold for threshold, _ in bands]
+        self.points = [0.0] + [point for _, point in bands]
+        self.pk = pk
+        self.program_id = program_id
+        self.batch_id = batch_id
+        self.effective_from = effective_from
+        self._thresholds = np.array(self.thresholds, dtype=np.float64)
+        self._points = np.array(self.points, dtype=np.float64)
+
+    def grade_point(self, percent):
+        return self.points[bisect_right(self.thresholds, percent)]
+
+    def grade_points(self, percents):
+        return self._points[np.searchsorted(self._thresholds, percents, side='right')]
+
+    def expression(self, percent):
+        return Case(
+            *[When(GreaterThanOrEqual(percent, threshold), then=Value(point))
+              for threshold, point in zip(reversed(self.thresholds), reversed(self.points[1:]))],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+
+    def applies(self, program_id, batch_id, on_date):
+        return ((self.program_id is None or self.program_id == program_id)
+                and (self.batch_id is None or self.batch_id == batch_id)
+                and (self.effective_from is None or on_date is None or self.effective_from <= on_date))
+
+
+class GradingScales:
+    """The compiled scales in lookup order, plus the default they fall back to."""
+
+    def __init__(self, scales, version=None):
+        self.scales = sorted(scales, key=lambda s: (s.program_id is None, s.batch_id is None,
+                                                     -s.effective_from.toordinal()))
+        self.default = CompiledScale(DEFAULT_GRADE_SCALE)
+        self.version = version
+
+    def scale_for(self, program_id=None, batch_id=None, on_date=None):
+        for scale in self.scales:
+            if scale.applies(program_id, batch_id, on_date):
+                return scale
+        return self.default
+
+    def grade_point(self, percent, program_id=None, batch_id=None, on_date=None):
+        return self.scale_for(program_id, batch_id, on_date).grade_point(percent)
+
+    def grade_points(self, percents, program_ids=None, batch_ids=None, dates=None):
+        """Vectorized grade_point over arrays (dates as datetime64[D])."""
+        percents = np.asarray(percents, dtype=np.float64)
+        if not self.scales:
+            return self.default.grade_points(percents)
+        result = self.default.grade_points(percents)
+        unassigned = np.ones(len(percents), dtype=bool)
+        for scale in self.scales:
+            mask = unassigned.copy()
+            if scale.program_id is not None: mask &= program_ids == scale.program_id
+            if scale.batch_id is not None: mask &= batch_ids == scale.batch_id
+            if dates is not None: mask &= dates >= np.datetime64(scale.effective_from, 'D')
+            result[mask] = scale.grade_points(percents[mask])
+            unassigned &= ~mask
+        return result
+
+    def expression(self, percent, program='enrollment__student__program_id', batch='enrollment__student__batch_id',
+                   on_date='exam__date'):
+        """SQL expression of the grade point of `percent`, choosing the scale per row like scale_for."""
+        if not self.scales:
+            return self.default.expression(percent)
+        whens = []
+        for scale in self.scales:
+            condition = Q(**{f'{on_date}__gte': scale.effective_from})
+            if scale.program_id is not None: condition &= Q(**{program: scale.program_id})
+            if scale.batch_id is not None: condition &= Q(**{batch: scale.batch_id})
+            whens.append(When(condition, then=scale.expression(percent)))
+        return Case(*whens, default=self.default.expression(percent), output_field=FloatField())
+
+
+_compiled = None
+_checked_at = None
+
+
+def _scale_rows():
+    from .models import GradingScaleBand
+
+    return list(GradingScaleBand.objects.order_by('scale_id', 'min_percentage').values_list(
+        'scale_id', 'scale__program_id', 'scale__batch_id', 'scale__effective_from', 'min_percentage', 'grade_point'))
+
+
+def get_grading_scales():
+    """The compiled GradingScales, recompiled when the scales changed since they were last read."""
+    global _compiled, _checked_at
+    now = time.monotonic()
+    if _compiled is not None and _checked_at is not None and now - _checked_at < GRADING_SCALES_RECHECK_SECONDS:
+        return _compiled
+    rows = _scale_rows()
+    version = hashlib.sha1(repr(rows).encode()).hexdigest()[:16]
+    _checked_at = now
+    if _compiled is None or _compiled.version != version:
+        bands = {}
+        for scale_id, program_id, batch_id, effective_from, min_percentage, point in rows:
+            bands.setdefault((scale_id, program_id, batch_id, effective_from), []).append((min_percentage, point))
+        _compiled = GradingScales([CompiledScale(scale_bands, *scale) for scale, scale_bands in bands.items()],
+                                  version)
+    return _compiled
+
+
+def _recheck():
+    global _checked_at
+    _checked_at = None
+
+
+def invalidate_grading_scales():
+    """
+    Make this process recheck the scales version now and again once the
+    current transaction commits (the version follows the rows, so a rollback
+    is picked up too); other processes recheck on their own schedule.
+    """
+    _recheck()
+    transaction.on_commit(_recheck)
+
+
+def grade_point(grade):
+    """Grade point (unweighted) of a Grade, with its exam and enrollment's student loaded."""
+    student = grade.enrollment.student
+    exam = grade.exam
+    return get_grading_scales().grade_point(percentage(grade.marks_obtained, exam.total_marks),
+                                            student.program_id, student.batch_id, exam.date)
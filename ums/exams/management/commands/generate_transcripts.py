@@ -0,0 +1,40 @@
+import time
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from exams.transcripts import (
+    TRANSCRIPT_CHUNK_SIZE, TRANSCRIPT_WORKERS, TRANSCRIPTS_DIR, generate_transcripts, stream_bundle,
+)
+
+
+class Command(BaseCommand):
+    help = "Generate the official transcripts of a batch and/or program, with a manifest and optionally a zip."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-id', type=int, help="Only students of this batch.")
+        parser.add_argument('--program-id', type=int, help="Only students of this program.")
+        parser.add_argument('--all', action='store_true', help="Every student (when no batch or program is given).")
+        parser.add_argument('--workers', type=int, default=TRANSCRIPT_WORKERS, help="Rendering processes.")
+        parser.add_argument('--chunk-size', type=int, default=TRANSCRIPT_CHUNK_SIZE,
+                            help="Students loaded and rendered at a time.")
+        parser.add_argument('--zip', action='store_true', help="Also write the run as a zip bundle to storage.")
+
+    def handle(self, *args, **options):
+        if not (options['batch_id'] or options['program_id'] or options['all']):
+            raise CommandError("Give --batch-id and/or --program-id, or --all.")
+
+        start = time.perf_counter()
+        run_id, rows = generate_transcripts(
+            batch_id=options['batch_id'], program_id=options['program_id'], workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            progress=lambda done, total: self.stdout.write(f"{done}/{total} transcripts"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Run {run_id}: {len(rows)} transcripts in {time.perf_counter() - start:.1f}s "
+            f"({TRANSCRIPTS_DIR}/{run_id}/)."))
+
+        if options['zip']:
+            name = f'{TRANSCRIPTS_DIR}/{run_id}.zip'
+            with default_storage.open(name, 'wb') as fh:
+                for chunk in stream_bundle(run_id):
+                    fh.write(chunk)
+            self.stdout.write(self.style.SUCCESS(f"Bundle written to {name}."))
@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from exams.services import recompute_all_cgpa
+
+
+class Command(BaseCommand):
+    help = "Recompute every student's CGPA, credits and latest semester GPA from their grades."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000, help="Rows read per database round trip.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Students written per UPDATE.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many students would change.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = recompute_all_cgpa(chunk_size=options['chunk_size'], batch_size=options['batch_size'],
+                                    dry_run=options['dry_run'])
+        verb = "would change" if options['dry_run'] else "updated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['students']} students, {result['grades']} grades: {result['changed']} {verb} "
+            f"in {time.perf_counter() - start:.1f}s."))
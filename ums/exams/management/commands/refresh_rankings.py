@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from exams.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized course and batch rankings from published results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course-id', type=int, action='append', help="Only this course (repeatable).")
+        parser.add_argument('--batch-id', type=int, action='append', help="Only this batch (repeatable).")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = refresh_rankings(course_ids=options['course_id'], batch_ids=options['batch_id'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} rankings in {time.perf_counter() - start:.1f}s."))
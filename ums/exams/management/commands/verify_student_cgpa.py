@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from exams.services import verify_student_cgpa
+
+
+class Command(BaseCommand):
+    help = "Check every student's running CGPA totals against a full recompute from their grades."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Overwrite drifted totals with the recomputed ones.")
+        parser.add_argument('--show', type=int, default=20, help="How many drifted students to list.")
+
+    def handle(self, *args, **options):
+        drift = verify_student_cgpa(fix=options['fix'])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Student CGPA totals match the grades."))
+            return
+
+        for student_id, (points, credits, cgpa), (want_points, want_credits, want_cgpa) in drift[:options['show']]:
+            self.stdout.write(f"student {student_id}: stored {points:.2f} pts / {credits} cr = {cgpa}, "
+                              f"expected {want_points:.2f} pts / {want_credits} cr = {want_cgpa}")
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} students."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} students drifted; rerun with --fix to correct them."))
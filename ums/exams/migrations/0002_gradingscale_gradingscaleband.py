@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:02
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0001_initial'),
+        ('exams', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingScale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('effective_from', models.DateField()),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='grading_scales', to='academics.batch')),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='grading_scales', to='academics.program')),
+            ],
+            options={
+                'ordering': ['-effective_from'],
+                'constraints': [models.UniqueConstraint(
+                    django.db.models.functions.comparison.Coalesce('program', models.Value(0)),
+                    django.db.models.functions.comparison.Coalesce('batch', models.Value(0)),
+                    models.F('effective_from'),
+                    name='grading_scale_scope_date',
+                    violation_error_message='A scale for this program and batch already takes effect on this date.',
+                )],
+            },
+        ),
+        migrations.CreateModel(
+            name='GradingScaleBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_percentage', models.FloatField()),
+                ('grade_point', models.FloatField()),
+                ('letter', models.CharField(blank=True, max_length=5)),
+                ('scale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='exams.gradingscale')),
+            ],
+            options={
+                'ordering': ['-min_percentage'],
+                'unique_together': {('scale', 'min_percentage')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_course_campus_course_department'),
+        ('exams', '0002_gradingscale_gradingscaleband'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['date', 'course'], name='exam_date_course_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:20
+
+from django.db import migrations, models
+import exams.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_exam_date_course_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='grading_due_date',
+            field=models.GeneratedField(db_persist=True,
+                                        expression=exams.models.AddDays('date', 'grading_deadline_days'),
+                                        output_field=models.DateField()),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(condition=models.Q(('result_status', 'DRAFT')), fields=['grading_due_date'],
+                               name='exam_draft_due_date_idx'),
+        ),
+    ]
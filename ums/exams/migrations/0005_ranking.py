@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_exam_grading_due_date'),
+        ('students', '0003_studentprofile_grade_points'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ranking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('COURSE', 'Course'), ('BATCH', 'Batch')], max_length=10)),
+                ('scope_id', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveIntegerField()),
+                ('percentile', models.FloatField()),
+                ('size', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='students.studentprofile')),
+            ],
+            options={
+                'ordering': ['scope', 'scope_id', 'rank'],
+                'indexes': [models.Index(fields=['scope', 'scope_id', 'rank'], name='ranking_leaderboard_idx')],
+                'unique_together': {('student', 'scope', 'scope_id')},
+            },
+        ),
+    ]
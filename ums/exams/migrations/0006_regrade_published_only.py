@@ -0,0 +1,97 @@
+from collections import defaultdict
+from django.db import migrations
+
+
+# The default grade scale at the time of this migration, frozen here with the
+# scale lookup below so later changes to exams.grading can't change what it
+# computes: (minimum percentage, grade point)
+GRADE_SCALE = [
+    (85, 4.0),
+    (80, 3.7),
+    (75, 3.3),
+    (70, 3.0),
+    (65, 2.7),
+    (60, 2.3),
+    (55, 2.0),
+    (50, 1.7),
+]
+
+
+def load_scales(apps):
+    """[(program_id, batch_id, effective_from, bands highest first)] in lookup order."""
+    GradingScaleBand = apps.get_model('exams', 'GradingScaleBand')
+    scales = defaultdict(list)
+    for scale_id, program_id, batch_id, effective_from, min_percentage, point in GradingScaleBand.objects.values_list(
+            'scale_id', 'scale__program_id', 'scale__batch_id', 'scale__effective_from', 'min_percentage',
+            'grade_point'):
+        scales[scale_id, program_id, batch_id, effective_from].append((min_percentage, point))
+    ordered = sorted(scales.items(), key=lambda item: (item[0][1] is None, item[0][2] is None,
+                                                       -item[0][3].toordinal()))
+    return [(program_id, batch_id, effective_from, sorted(bands, reverse=True))
+            for (_, program_id, batch_id, effective_from), bands in ordered]
+
+
+def grade_point(scales, marks, total_marks, program_id, batch_id, on_date):
+    percentage = marks * 100.0 / total_marks if total_marks else 0.0
+    bands = GRADE_SCALE
+    for scale_program, scale_batch, effective_from, scale_bands in scales:
+        if scale_program in (None, program_id) and scale_batch in (None, batch_id) and effective_from <= on_date:
+            bands = scale_bands
+            break
+    for threshold, point in bands:
+        if percentage >= threshold:
+            return point
+    return 0.0
+
+
+def _ratio(points, credits):
+    return round(points / credits, 2) if credits > 0 else 0.0
+
+
+def regrade_published_only(apps, schema_editor):
+    """
+    Stored CGPAs used to include DRAFT marks; rebuild every student's totals,
+    CGPA and latest semester GPA from published results only.
+    """
+    Grade = apps.get_model('exams', 'Grade')
+    StudentProfile = apps.get_model('students', 'StudentProfile')
+    if not Grade.objects.exists():
+        return
+
+    scales = load_scales(apps)
+    totals = defaultdict(lambda: [0.0, 0])
+    semesters = defaultdict(lambda: defaultdict(lambda: [0.0, 0]))
+    grades = (Grade.objects.filter(exam__result_status__in=['PUBLISHED', 'LOCKED'])
+              .values_list('enrollment__student_id', 'enrollment__student__program_id',
+                           'enrollment__student__batch_id', 'marks_obtained', 'exam__total_marks', 'exam__date',
+                           'enrollment__course__credits', 'enrollment__course__semester')
+              .iterator(chunk_size=5000))
+    for student_id, program_id, batch_id, marks, total_marks, on_date, credits, semester in grades:
+        points = grade_point(scales, marks, total_marks, program_id, batch_id, on_date) * credits
+        for bucket in (totals[student_id], semesters[student_id][semester]):
+            bucket[0] += points
+            bucket[1] += credits
+
+    students = []
+    for student in StudentProfile.objects.only('id').iterator(chunk_size=2000):
+        points, credits = totals.get(student.id, (0.0, 0))
+        graded = [semester for semester, (_, n) in semesters.get(student.id, {}).items() if n > 0]
+        student.grade_points = points
+        student.credits_completed = credits
+        student.cgpa = _ratio(points, credits)
+        student.gpa = _ratio(*semesters[student.id][max(graded)]) if graded else 0.0
+        students.append(student)
+    StudentProfile.objects.bulk_update(students, ['grade_points', 'credits_completed', 'cgpa', 'gpa'],
+                                       batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_ranking'),
+        ('students', '0003_studentprofile_grade_points'),
+    ]
+
+    operations = [
+        migrations.RunPython(regrade_published_only, migrations.RunPython.noop),
+    ]
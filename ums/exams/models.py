@@ -1,32 +1,25 @@
 from django.db import models
 from django.conf import settings
+from django.db.models import F, Func, Value
+from django.db.models.functions import Coalesce
 from datetime import timedelta, date
 from courses.models import Course
 from enrollments.models import Enrollment
+from academics.models import Batch, Program
+from students.models import StudentProfile
 
-def percentage_to_grade_point(percentage: float) -> float:
-    """
-    Converts percentage to grade point based on a standard 4.0 scale.
-    Adjust scale according to university policy if needed.
-    """
-    if percentage >= 85:
-        return 4.0
-    elif percentage >= 80:
-        return 3.7
-    elif percentage >= 75:
-        return 3.3
-    elif percentage >= 70:
-        return 3.0
-    elif percentage >= 65:
-        return 2.7
-    elif percentage >= 60:
-        return 2.3
-    elif percentage >= 55:
-        return 2.0
-    elif percentage >= 50:
-        return 1.7
-    else:
-        return 0.0
+class AddDays(Func):
+    """A date plus a whole number of days, as a date (usable in generated columns)."""
+    arity = 2
+    output_field = models.DateField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' + ',
+                              **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template="date(%(expressions)s || ' days')",
+                              arg_joiner=", '+' || ", **extra_context)
 
 
 class Exam(models.Model):
@@ -41,6 +34,9 @@ class Exam(models.Model):
         ('PUBLISHED', 'Published'),  # Students can view grades
         ('LOCKED', 'Locked'),     # No further edits allowed
     ]
+    # Only grades of these exams count anywhere a student's results are shown
+    # or aggregated: CGPAs, transcripts, rankings and the GPA metrics
+    VISIBLE_RESULT_STATUSES = ['PUBLISHED', 'LOCKED']
     result_status = models.CharField(
         max_length=10,
         choices=RESULT_STATUS,
@@ -53,6 +49,12 @@ class Exam(models.Model):
     total_marks = models.PositiveIntegerField(default=100)
     date = models.DateField()
     grading_deadline_days = models.PositiveIntegerField(default=30)  # e.g., 15–30 days
+    # Computed by the database, so bulk inserts and queryset updates keep it in step
+    grading_due_date = models.GeneratedField(
+        expression=AddDays('date', 'grading_deadline_days'),
+        output_field=models.DateField(),
+        db_persist=True,
+    )
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -61,15 +63,22 @@ class Exam(models.Model):
         related_name="created_exams"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'course'], name='exam_date_course_idx'),  # clash detection
+            # Grading reminders only ever look for DRAFT exams due on one date
+            models.Index(fields=['grading_due_date'], condition=models.Q(result_status='DRAFT'),
+                         name='exam_draft_due_date_idx'),
+        ]
+
     def grading_deadline(self):
         return self.date + timedelta(days=self.grading_deadline_days)
 
-    def grade_point(self):
-        """Returns the grade points earned for this exam based on marks percentage."""
-        percentage = (self.marks_obtained / self.exam.total_marks) * 100
-        return percentage_to_grade_point(percentage) * self.enrollment.course.credit_hours
+    def can_accept_grades(self):
+        """Grades can be entered from the exam date until the grading deadline."""
         today = date.today()
         return self.date <= today <= self.grading_deadline()
+
     def can_edit_grades(self):
         """
         Grades can be added/updated only if the result is in DRAFT
@@ -81,7 +90,7 @@ class Exam(models.Model):
         """
         Students can only view grades if results are published or locked.
         """
-        return self.result_status in ['PUBLISHED', 'LOCKED']
+        return self.result_status in self.VISIBLE_RESULT_STATUSES
 
     def __str__(self):
         return f"{self.title} - {self.course.code}"
@@ -93,12 +102,84 @@ class Grade(models.Model):
     remarks = models.TextField(blank=True, null=True)
     
     def grade_point(self):
-        """Returns the grade points earned for this exam based on marks percentage."""
-        percentage = (self.marks_obtained / self.exam.total_marks) * 100
-        return percentage_to_grade_point(percentage) * self.enrollment.course.credit_hours
+        """Returns the credit-weighted grade points earned for this exam (see exams.grading)."""
+        from .grading import grade_point
+        return grade_point(self) * self.enrollment.course.credits
 
     class Meta:
         unique_together = ("enrollment", "exam")
 
     def __str__(self):
         return f"{self.enrollment.student.roll_no} - {self.exam.title} ({self.marks_obtained})"
+
+
+class GradingScale(models.Model):
+    """
+    Percentage to grade point policy for a program, a batch or (neither set)
+    every student, in effect from `effective_from` for exams on or after it.
+    Compiled and cached by exams.grading. Saving or deleting a scale or one of
+    its bands regrades the stored CGPAs and analytics counters once the change
+    commits (see exams.signals).
+    """
+    name = models.CharField(max_length=100)
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, null=True, blank=True, related_name="grading_scales")
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, null=True, blank=True, related_name="grading_scales")
+    effective_from = models.DateField()
+
+    class Meta:
+        ordering = ['-effective_from']
+        constraints = [
+            # Campus-wide and batch- or program-only scales have NULL scopes; count them as equal
+            models.UniqueConstraint(
+                Coalesce('program', Value(0)), Coalesce('batch', Value(0)), F('effective_from'),
+                name='grading_scale_scope_date',
+                violation_error_message="A scale for this program and batch already takes effect on this date.",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} (from {self.effective_from})"
+
+class GradingScaleBand(models.Model):
+    """Marks at or above `min_percentage` (up to the next band) earn `grade_point`."""
+    scale = models.ForeignKey(GradingScale, on_delete=models.CASCADE, related_name="bands")
+    min_percentage = models.FloatField()
+    grade_point = models.FloatField()
+    letter = models.CharField(max_length=5, blank=True)
+
+    class Meta:
+        ordering = ['-min_percentage']
+        unique_together = ("scale", "min_percentage")
+
+    def __str__(self):
+        return f"{self.letter or self.grade_point} >= {self.min_percentage}%"
+
+
+class Ranking(models.Model):
+    """
+    A student's standing in a course or batch, materialized from published
+    results by exams.rankings.refresh_rankings. `score` is the marks obtained
+    as a percentage of the total marks of the graded exams, so each exam
+    weighs by its total marks; `percentile` is the share of the class scoring
+    at or below the student.
+    """
+    SCOPES = [
+        ('COURSE', 'Course'),
+        ('BATCH', 'Batch'),
+    ]
+    scope = models.CharField(max_length=10, choices=SCOPES)
+    scope_id = models.PositiveIntegerField()  # Course or Batch id
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name="rankings")
+    score = models.FloatField()
+    rank = models.PositiveIntegerField()
+    percentile = models.FloatField()
+    size = models.PositiveIntegerField()  # students ranked in the scope
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['scope', 'scope_id', 'rank']
+        unique_together = ("student", "scope", "scope_id")
+        indexes = [models.Index(fields=['scope', 'scope_id', 'rank'], name='ranking_leaderboard_idx')]
+
+    def __str__(self):
+        return f"{self.student.roll_no} - {self.scope} {self.scope_id}: #{self.rank}/{self.size}"
@@ -0,0 +1,114 @@
+"""
+Class rank and percentile per course and per batch.
+
+Scores and standings are computed by the database in one grouped query per
+scope: the marks a student obtained as a percentage of the exams' total
+marks, RANK() OVER the course (or batch) by that score and CUME_DIST() for
+the percentile. The rows are materialized into Ranking, replacing the
+refreshed scopes in one transaction, so reading a student's rank is a single
+unique-index lookup.
+
+Only PUBLISHED and LOCKED results count. Rankings are refreshed when an exam
+is published, locked or reopened, when grades of a published exam or its
+total marks change, and when a student moves batch (see signals); and in
+full by the refresh_rankings command.
+"""
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Sum, Window
+from django.db.models.functions import Cast, CumeDist, NullIf, Rank
+from enrollments.models import Enrollment
+from .models import Exam, Grade, Ranking
+
+RANKING_BATCH_SIZE = getattr(settings, 'RANKING_BATCH_SIZE', 1000)
+
+_SCOPE_FIELDS = {
+    'COURSE': 'enrollment__course_id',
+    'BATCH': 'enrollment__student__batch_id',
+}
+
+
+def ranking_rows(scope, scope_ids=None):
+    """(scope_id, student_id, score, rank, percentile) of every ranked student, by scope then rank."""
+    field = _SCOPE_FIELDS[scope]
+    grades = Grade.objects.filter(exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES, **{f'{field}__isnull': False})
+    if scope_ids is not None:
+        grades = grades.filter(**{f'{field}__in': scope_ids})
+    score = Cast(Sum('marks_obtained'), FloatField()) * 100.0 / NullIf(Sum('exam__total_marks'), 0)
+    return (
+        grades.values_list(field, 'enrollment__student_id')
+        .annotate(score=score)
+        .filter(score__isnull=False)
+        .annotate(
+            rank=Window(Rank(), partition_by=F(field), order_by=F('score').desc()),
+            percentile=Window(CumeDist(), partition_by=F(field), order_by=F('score').asc()),
+        )
+        .order_by(field, 'rank', 'enrollment__student_id')
+    )
+
+
+def refresh_rankings(course_ids=None, batch_ids=None, batch_size=None):
+    """
+    Rebuild the Ranking rows of `course_ids` and `batch_ids`; with neither,
+    every course and batch. Returns the number of rows written.
+    """
+    scopes = {'COURSE': course_ids, 'BATCH': batch_ids}
+    if course_ids is None and batch_ids is None:
+        scopes = dict.fromkeys(scopes)
+    elif course_ids is None or batch_ids is None:
+        scopes = {scope: ids for scope, ids in scopes.items() if ids is not None}
+
+    written = 0
+    with transaction.atomic():
+        for scope, ids in scopes.items():
+            ids = None if ids is None else list(ids)
+            stale = Ranking.objects.filter(scope=scope)
+            if ids is not None:
+                stale = stale.filter(scope_id__in=ids)
+            stale.delete()
+
+            rows = list(ranking_rows(scope, ids))
+            sizes = {}
+            for scope_id, *_ in rows:
+                sizes[scope_id] = sizes.get(scope_id, 0) + 1
+            Ranking.objects.bulk_create(
+                [Ranking(scope=scope, scope_id=scope_id, student_id=student_id, score=round(score, 2), rank=rank,
+                         percentile=round(percentile * 100, 2), size=sizes[scope_id])
+                 for scope_id, student_id, score, rank, percentile in rows],
+                batch_size=batch_size or RANKING_BATCH_SIZE,
+            )
+            written += len(rows)
+    return written
+
+
+def refresh_course_rankings(course_id):
+    """Rebuild the rankings of a course and of every batch with students in it."""
+    batch_ids = set(Enrollment.objects.filter(course_id=course_id, student__batch_id__isnull=False)
+                    .values_list('student__batch_id', flat=True).distinct())
+    return refresh_rankings(course_ids=[course_id], batch_ids=batch_ids)
+
+
+# Scopes waiting for a refresh in this thread. Every schedule registers a
+# flush on commit; the first flush refreshes all pending scopes at once and
+# later ones find nothing left, so many writes in one transaction refresh once.
+_pending = threading.local()
+
+
+def schedule_ranking_refresh(course_ids=(), batch_ids=()):
+    """Refresh the rankings of `course_ids` (and their students' batches) and `batch_ids` on commit."""
+    if not hasattr(_pending, 'courses'):
+        _pending.courses, _pending.batches = set(), set()
+    _pending.courses.update(course_ids)
+    _pending.batches.update(batch_id for batch_id in batch_ids if batch_id)
+    transaction.on_commit(_flush_ranking_refresh)
+
+
+def _flush_ranking_refresh():
+    course_ids, batch_ids = getattr(_pending, 'courses', set()), getattr(_pending, 'batches', set())
+    if not course_ids and not batch_ids:
+        return
+    _pending.courses, _pending.batches = set(), set()
+    batch_ids |= set(Enrollment.objects.filter(course_id__in=course_ids, student__batch_id__isnull=False)
+                     .values_list('student__batch_id', flat=True).distinct())
+    refresh_rankings(course_ids=course_ids, batch_ids=batch_ids)
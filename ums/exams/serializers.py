@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Exam, Grade
+from .models import Exam, Grade, Ranking
 from courses.serializers import CourseSerializer
 
 class ExamSerializer(serializers.ModelSerializer):
@@ -11,7 +11,7 @@ class ExamSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'course', 'course_details',
             'title', 'exam_type', 'total_marks',
-            'date', 'grading_deadline_days',
+            'date', 'grading_deadline_days', 'grading_due_date',
             'faculty_name'
         ]
 
@@ -34,3 +34,13 @@ class GradeSerializer(serializers.ModelSerializer):
                 "Cannot add/update grades. Either grading period expired or exam is locked/published."
             )
         return data
+
+class RankingSerializer(serializers.ModelSerializer):
+    student_roll = serializers.CharField(source='student.roll_no', read_only=True)
+
+    class Meta:
+        model = Ranking
+        fields = [
+            'scope', 'scope_id', 'student', 'student_roll',
+            'score', 'rank', 'percentile', 'size', 'computed_at'
+        ]
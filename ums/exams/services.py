@@ -1,43 +1,466 @@
-from .models import Grade
-
-def percentage_to_grade_point(percentage: float) -> float:
-    """
-    Converts percentage to grade point based on a standard 4.0 scale.
-    Adjust scale according to university policy if needed.
-    """
-    if percentage >= 85:
-        return 4.0
-    elif percentage >= 80:
-        return 3.7
-    elif percentage >= 75:
-        return 3.3
-    elif percentage >= 70:
-        return 3.0
-    elif percentage >= 65:
-        return 2.7
-    elif percentage >= 60:
-        return 2.3
-    elif percentage >= 55:
-        return 2.0
-    elif percentage >= 50:
-        return 1.7
-    else:
-        return 0.0
+import copy
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Max, Min, OuterRef, StdDev, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+from django.db.models.lookups import GreaterThan
+from enrollments.models import Enrollment
+from students.models import StudentProfile
+from ums.columns import load_columns
+from .models import Exam, Grade
+from .grading import EXAMS_CACHE_ALIAS, get_grading_scales, grade_point
+from .rankings import schedule_ranking_refresh
+from .utils import grade_point_expression
+
+EXAMS_TRANSCRIPT_CACHE_TTL = getattr(settings, 'EXAMS_TRANSCRIPT_CACHE_TTL', 3600)
+EXAMS_STATS_CACHE_TTL = getattr(settings, 'EXAMS_STATS_CACHE_TTL', 3600)
+STATS_PERCENTILES = (10, 25, 50, 75, 90)
+
+def grade_cgpa_contribution(grade):
+    """
+    (student_id, weighted grade points, credits) a grade adds to its student's
+    running CGPA totals, or None while its exam's results are unpublished.
+    """
+    if not grade.exam.can_students_view():
+        return None
+    credits = grade.enrollment.course.credits
+    return grade.enrollment.student_id, grade_point(grade) * credits, credits
+
+def apply_cgpa_delta(student_id, points, credits):
+    """
+    Add a delta to a student's running totals and derive the CGPA from the
+    new totals, all in one UPDATE so concurrent grade saves don't lose writes.
+    """
+    if not points and not credits:
+        return
+    new_points = F('grade_points') + points
+    new_credits = F('credits_completed') + credits
+    StudentProfile.objects.filter(pk=student_id).update(
+        grade_points=new_points,
+        credits_completed=new_credits,
+        cgpa=Case(
+            When(credits_completed=-credits, then=Value(0.0)),
+            default=Round(new_points / new_credits, 2),
+            output_field=FloatField(),
+        ),
+    )
+
+def student_grade_totals(grades=None):
+    """{student_id: (weighted grade points, credits)} of the published grades among `grades` (default every Grade)."""
+    grades = (Grade.objects.all() if grades is None else grades).filter(
+        exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES)
+    rows = (grades.values_list('enrollment__student_id')
+            .annotate(points=Sum(grade_point_expression() * F('enrollment__course__credits'), output_field=FloatField()),
+                      credits=Sum('enrollment__course__credits'))
+            .order_by())
+    return {student_id: (points or 0.0, credits or 0) for student_id, points, credits in rows}
 
 def calculate_student_cgpa(student):
     """
     Calculates and returns the CGPA and total credits for a given student.
     """
-    grades = Grade.objects.filter(enrollment__student=student)
-    total_points = 0
-    total_credits = 0
+    points, total_credits = student_grade_totals(Grade.objects.filter(enrollment__student=student)).get(student.pk, (0.0, 0))
+    cgpa = round(points / total_credits, 2) if total_credits > 0 else 0
+    return cgpa, total_credits
 
-    for grade in grades:
-        percentage = (grade.marks_obtained / grade.exam.total_marks) * 100
-        grade_points = percentage_to_grade_point(percentage)
-        credit_hours = grade.enrollment.course.credit_hours
-        total_points += grade_points * credit_hours
-        total_credits += credit_hours
+def apply_cgpa_totals_change(before, after):
+    """Apply the difference between two student_grade_totals() results to the running totals."""
+    for student_id in before.keys() | after.keys():
+        points, credits = after.get(student_id, (0.0, 0))
+        old_points, old_credits = before.get(student_id, (0.0, 0))
+        apply_cgpa_delta(student_id, points - old_points, credits - old_credits)
 
-    cgpa = round(total_points / total_credits, 2) if total_credits > 0 else 0
-    return cgpa, total_credits
+def refresh_student_cgpa(student_ids, chunk_size=1000):
+    """
+    Recompute the running totals and CGPA of `student_ids` from their grades,
+    with two UPDATEs per chunk of students whatever the number of grades.
+    """
+    student_ids = list(student_ids)
+    for i in range(0, len(student_ids), chunk_size):
+        students = StudentProfile.objects.filter(pk__in=student_ids[i:i + chunk_size])
+        totals = (Grade.objects.filter(enrollment__student=OuterRef('pk'),
+                                       exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES)
+                  .values('enrollment__student')
+                  .annotate(points=Sum(grade_point_expression() * F('enrollment__course__credits'),
+                                       output_field=FloatField()),
+                            credits=Sum('enrollment__course__credits')))
+        students.update(
+            grade_points=Coalesce(Subquery(totals.values('points')), Value(0.0)),
+            credits_completed=Coalesce(Subquery(totals.values('credits')), Value(0)),
+        )
+        students.update(cgpa=Case(
+            When(credits_completed__gt=0, then=Round(F('grade_points') / F('credits_completed'), 2)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
+
+def verify_student_cgpa(fix=False, chunk_size=1000):
+    """
+    Compare every student's running totals with a full recompute from grades.
+    Returns [(student_id, stored (points, credits, cgpa), expected)]; with
+    fix=True the drifted students are corrected.
+    """
+    expected = student_grade_totals()
+    drift = []
+    stored = StudentProfile.objects.values_list('id', 'grade_points', 'credits_completed', 'cgpa')
+    for student_id, points, credits, cgpa in stored.iterator(chunk_size=chunk_size):
+        want_points, want_credits = expected.get(student_id, (0.0, 0))
+        want_cgpa = round(want_points / want_credits, 2) if want_credits else 0
+        if abs(points - want_points) > 1e-6 or credits != want_credits or abs(cgpa - want_cgpa) > 0.005:
+            drift.append((student_id, (points, credits, cgpa), (want_points, want_credits, want_cgpa)))
+
+    if fix:
+        for i in range(0, len(drift), chunk_size):
+            StudentProfile.objects.bulk_update([
+                StudentProfile(pk=student_id, grade_points=points, credits_completed=credits, cgpa=cgpa)
+                for student_id, _, (points, credits, cgpa) in drift[i:i + chunk_size]
+            ], ['grade_points', 'credits_completed', 'cgpa'])
+    return drift
+
+def student_transcript(student_id):
+    """
+    Per-semester GPA and credits plus CGPA of a student's published grades,
+    from one aggregate query grouped by course semester.
+    """
+    rows = (Grade.objects.filter(enrollment__student_id=student_id,
+                                exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES)
+            .values_list('enrollment__course__semester')
+            .annotate(points=Sum(grade_point_expression() * F('enrollment__course__credits'), output_field=FloatField()),
+                      credits=Sum('enrollment__course__credits'))
+            .order_by('enrollment__course__semester'))
+    semesters, total_points, total_credits = [], 0.0, 0
+    for semester, points, credits in rows:
+        points, credits = points or 0.0, credits or 0
+        semesters.append({
+            "semester": semester,
+            "gpa": round(points / credits, 2) if credits > 0 else 0,
+            "credits": credits,
+        })
+        total_points += points
+        total_credits += credits
+    return {
+        "semesters": semesters,
+        "cgpa": round(total_points / total_credits, 2) if total_credits > 0 else 0,
+        "credits_completed": total_credits,
+    }
+
+def _transcript_key(student_id):
+    # Versioned with the grading scales, so a scale change regrades every transcript
+    return f'exams:transcript:{get_grading_scales().version}:{student_id}'
+
+def cached_student_transcript(student_id):
+    cache = caches[EXAMS_CACHE_ALIAS]
+    transcript = cache.get(_transcript_key(student_id))
+    if transcript is None:
+        transcript = student_transcript(student_id)
+        cache.set(_transcript_key(student_id), transcript, EXAMS_TRANSCRIPT_CACHE_TTL)
+    return transcript
+
+def invalidate_transcripts(student_ids):
+    """Drop the cached transcripts of `student_ids` once the current transaction commits."""
+    keys = [_transcript_key(student_id) for student_id in set(student_ids)]
+    if keys:
+        transaction.on_commit(lambda: caches[EXAMS_CACHE_ALIAS].delete_many(keys))
+
+def exam_statistics(exam):
+    """
+    Marks distribution of an exam: count, mean, std, min/max and pass count
+    from one aggregate query, median, percentiles and a 10-bin histogram from
+    one NumPy pass over the marks. A pass is a non-zero grade point.
+    """
+    total_marks = exam.total_marks or 0
+    grades = Grade.objects.filter(exam_id=exam.pk)
+    agg = grades.aggregate(count=Count('id'), mean=Avg('marks_obtained'), std=StdDev('marks_obtained'),
+                           min=Min('marks_obtained'), max=Max('marks_obtained'),
+                           passed=Count('id', filter=GreaterThan(grade_point_expression(), 0)))
+    marks = np.fromiter(grades.values_list('marks_obtained', flat=True).order_by(), np.float64)
+    edges = np.linspace(0, total_marks, 11)
+    histogram, _ = np.histogram(np.clip(marks, 0, total_marks), bins=edges)
+    percent = 100 / total_marks if total_marks else 0.0
+    percentiles = np.percentile(marks, STATS_PERCENTILES) if len(marks) else [None] * len(STATS_PERCENTILES)
+
+    rounded = lambda value: round(float(value), 2) if value is not None else None
+    return {
+        "exam": exam.pk,
+        "title": exam.title,
+        "course": exam.course_id,
+        "result_status": exam.result_status,
+        "total_marks": total_marks,
+        "count": agg['count'],
+        "mean": rounded(agg['mean']),
+        "median": rounded(np.median(marks)) if len(marks) else None,
+        "std": rounded(agg['std']),
+        "min": rounded(agg['min']),
+        "max": rounded(agg['max']),
+        "percentiles": {f"p{p}": rounded(value) for p, value in zip(STATS_PERCENTILES, percentiles)},
+        "mean_percent": rounded(agg['mean'] * percent) if agg['mean'] is not None else None,
+        "std_percent": rounded(agg['std'] * percent) if agg['std'] is not None else None,
+        "passed": agg['passed'],
+        "pass_rate": round(agg['passed'] / agg['count'], 4) if agg['count'] else None,
+        "histogram": [
+            {"from": rounded(lo), "to": rounded(hi), "count": int(n)}
+            for lo, hi, n in zip(edges[:-1], edges[1:], histogram)
+        ],
+    }
+
+def _stats_key(exam_id):
+    return f'exams:stats:{get_grading_scales().version}:{exam_id}'
+
+def cached_exam_statistics(exams):
+    """{exam_id: exam_statistics(exam)} for `exams`, computing only those missing from the cache."""
+    cache = caches[EXAMS_CACHE_ALIAS]
+    exams = {exam.pk: exam for exam in exams}
+    found = cache.get_many([_stats_key(exam_id) for exam_id in exams])
+    stats = {exam_id: found[_stats_key(exam_id)] for exam_id in exams if _stats_key(exam_id) in found}
+    missing = {exam_id: exam_statistics(exam) for exam_id, exam in exams.items() if exam_id not in stats}
+    if missing:
+        cache.set_many({_stats_key(exam_id): value for exam_id, value in missing.items()}, EXAMS_STATS_CACHE_TTL)
+    stats.update(missing)
+    return stats
+
+def invalidate_exam_statistics(exam_ids):
+    """Drop the cached statistics of `exam_ids` once the current transaction commits."""
+    keys = [_stats_key(exam_id) for exam_id in set(exam_ids)]
+    if keys:
+        transaction.on_commit(lambda: caches[EXAMS_CACHE_ALIAS].delete_many(keys))
+
+def rollup_exam_statistics(stats):
+    """
+    Combine per-exam statistics into one summary, in percent of total marks
+    so exams out of different totals can be pooled.
+    """
+    stats = [s for s in stats if s["count"] and s["mean_percent"] is not None]
+    count = sum(s["count"] for s in stats)
+    if not count:
+        return {"exams": 0, "count": 0, "mean_percent": None, "std_percent": None, "passed": 0, "pass_rate": None}
+    mean = sum(s["count"] * s["mean_percent"] for s in stats) / count
+    # Pooled population variance: within-exam spread plus spread of the exam means
+    variance = sum(s["count"] * ((s["std_percent"] or 0) ** 2 + (s["mean_percent"] - mean) ** 2) for s in stats) / count
+    passed = sum(s["passed"] for s in stats)
+    return {
+        "exams": len(stats),
+        "count": count,
+        "mean_percent": round(mean, 2),
+        "std_percent": round(variance ** 0.5, 2),
+        "passed": passed,
+        "pass_rate": round(passed / count, 4),
+    }
+
+def _update_columns(model, ids, columns, chunk_size):
+    """
+    Write `columns` ({field: values aligned with ids}) to the rows `ids`, one
+    UPDATE with a CASE per column for each chunk. bulk_update builds a Q
+    object per row and field, which dominates at campus scale.
+    """
+    qn = connection.ops.quote_name
+    table, pk = qn(model._meta.db_table), qn(model._meta.pk.column)
+    fields = [(qn(model._meta.get_field(name).column), values) for name, values in columns.items()]
+    if connection.features.max_query_params:
+        chunk_size = min(chunk_size, connection.features.max_query_params // (2 * len(fields) + 1))
+    with connection.cursor() as cursor:
+        for i in range(0, len(ids), chunk_size):
+            chunk = ids[i:i + chunk_size]
+            assignments, params = [], []
+            for column, values in fields:
+                assignments.append(f"{column} = CASE {pk} {'WHEN %s THEN %s ' * len(chunk)}END")
+                for row_id, value in zip(chunk, values[i:i + chunk_size]):
+                    params += [row_id, value]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"UPDATE {table} SET {', '.join(assignments)} WHERE {pk} IN ({placeholders})",
+                           params + chunk)
+
+def _rounded_ratio(points, credits):
+    # round() rather than np.round, which scales by 100 first and can land on
+    # the other side of a .xx5 tie than the per-grade code paths do
+    return np.array([round(p / c, 2) if c > 0 else 0.0 for p, c in zip(points.tolist(), credits.tolist())])
+
+def recompute_all_cgpa(chunk_size=50000, batch_size=1000, dry_run=False):
+    """
+    Recompute every student's CGPA totals and latest semester GPA from their
+    published grades in one vectorized pass (for grading scale changes and data fixes).
+    Grades are streamed as columns, converted to grade points with the
+    grading scales' searchsorted lookup and summed per student and per (student, semester); only
+    students whose stored values differ are written. Returns
+    {"students", "grades", "changed"}.
+    """
+    students = load_columns(
+        StudentProfile.objects.order_by('id'),
+        {'id': np.int64, 'grade_points': np.float64, 'credits_completed': np.int64,
+         'cgpa': np.float64, 'gpa': np.float64},
+        chunk_size,
+    )
+    grades = load_columns(
+        Grade.objects.filter(exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES)
+        .annotate(scale_program=Coalesce('enrollment__student__program_id', 0),
+                  scale_batch=Coalesce('enrollment__student__batch_id', 0)),
+        {'enrollment__student_id': np.int64, 'marks_obtained': np.float64, 'exam__total_marks': np.float64,
+         'enrollment__course__credits': np.int64, 'enrollment__course__semester': np.int64,
+         'scale_program': np.int64, 'scale_batch': np.int64, 'exam__date': 'datetime64[D]'},
+        chunk_size,
+    )
+    n = len(students['id'])
+    student = np.searchsorted(students['id'], grades['enrollment__student_id'])
+    total_marks = grades['exam__total_marks']
+    percentages = np.divide(grades['marks_obtained'] * 100.0, total_marks, out=np.zeros(len(total_marks)),
+                            where=total_marks > 0)
+    credits = grades['enrollment__course__credits']
+    points = get_grading_scales().grade_points(percentages, grades['scale_program'], grades['scale_batch'],
+                                               grades['exam__date']) * credits
+
+    total_points = np.bincount(student, weights=points, minlength=n)
+    total_credits = np.bincount(student, weights=credits, minlength=n).astype(np.int64)
+    cgpa = _rounded_ratio(total_points, total_credits)
+
+    # GPA of the latest semester each student has grades in
+    semester = grades['enrollment__course__semester']
+    width = int(semester.max()) + 1 if len(semester) else 1
+    cell = student * width + semester
+    semester_points = np.bincount(cell, weights=points, minlength=n * width).reshape(n, width)
+    semester_credits = np.bincount(cell, weights=credits, minlength=n * width).reshape(n, width)
+    graded = semester_credits > 0
+    latest = width - 1 - np.argmax(graded[:, ::-1], axis=1)
+    rows = np.arange(n)
+    latest_credits = semester_credits[rows, latest]
+    gpa = _rounded_ratio(semester_points[rows, latest], latest_credits)
+
+    changed = ((np.abs(students['grade_points'] - total_points) > 1e-6)
+               | (students['credits_completed'] != total_credits)
+               | (np.abs(students['cgpa'] - cgpa) > 0.005)
+               | (np.abs(students['gpa'] - gpa) > 0.005))
+    if not dry_run and changed.any():
+        with transaction.atomic():
+            _update_columns(StudentProfile, students['id'][changed].tolist(), {
+                'grade_points': total_points[changed].tolist(),
+                'credits_completed': total_credits[changed].tolist(),
+                'cgpa': cgpa[changed].tolist(),
+                'gpa': gpa[changed].tolist(),
+            }, batch_size)
+
+            from analytics.cache import bump_generations
+            scopes = _student_scopes()
+            transaction.on_commit(lambda: bump_generations('students', scopes))
+    return {"students": n, "grades": len(student), "changed": int(changed.sum())}
+
+def _student_scopes():
+    """Every analytics cache scope students fall in."""
+    scopes = {'all'}
+    for batch_id, program_id in StudentProfile.objects.values_list('batch_id', 'program_id').distinct():
+        if batch_id: scopes.add(f'batch:{batch_id}')
+        if program_id: scopes.add(f'program:{program_id}')
+    return scopes
+
+_regraded_version = None
+
+def regrade_stored_results():
+    """
+    Bring everything stored under the grading scales in line with them: CGPA
+    totals and GPAs, the live grade counters, the faculty summaries and the
+    cached grade metrics. Scheduled on commit by scale and band changes; runs
+    once per scales version in a process, so saving a scale with its bands
+    regrades once.
+    """
+    global _regraded_version
+    version = get_grading_scales().version
+    if version == _regraded_version:
+        return
+    _regraded_version = version
+
+    from analytics.cache import bump_generations
+    from analytics.counters import reconcile_counters
+    from analytics.models import FacultyMetricSummary
+
+    recompute_all_cgpa()
+    with transaction.atomic():
+        reconcile_counters(fix=True)
+        FacultyMetricSummary.objects.update(is_stale=True)
+        scopes = _student_scopes() | {f'faculty:{faculty_id}' for faculty_id in
+                                      FacultyMetricSummary.objects.values_list('faculty_id', flat=True)}
+        transaction.on_commit(lambda: bump_generations('grades', scopes))
+
+def _parse_grade_row(row, total_marks, by_roll_no, by_id):
+    """(enrollment_id, marks, remarks) of an uploaded row, or raise ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object with enrollment or roll_no and marks_obtained.")
+    enrollment = row.get('enrollment') or row.get('enrollment_id')
+    roll_no = str(row.get('roll_no') or '').strip()
+    if enrollment not in (None, ''):
+        try:
+            enrollment_id = int(enrollment)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid enrollment '{enrollment}'.")
+        if enrollment_id not in by_id:
+            raise ValueError(f"Enrollment {enrollment_id} is not in this exam's course.")
+    elif roll_no:
+        enrollment_id = by_roll_no.get(roll_no)
+        if enrollment_id is None:
+            raise ValueError(f"No student with roll number '{roll_no}' is enrolled in this exam's course.")
+    else:
+        raise ValueError("Either enrollment or roll_no is required.")
+
+    marks = row.get('marks_obtained', row.get('marks'))
+    try:
+        marks = float(marks)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid marks '{marks}'.")
+    if not 0 <= marks <= total_marks:
+        raise ValueError(f"Marks must be between 0 and {total_marks}.")
+    return enrollment_id, marks, (row.get('remarks') or None)
+
+def bulk_upsert_grades(exam, rows):
+    """
+    Create or update the grades of `exam` from uploaded rows
+    ({enrollment | roll_no, marks_obtained, remarks}). Valid rows are written
+    with one bulk upsert in one transaction and each affected student's CGPA
+    totals are adjusted once. Returns (created, updated, errors) where errors
+    is a list of {"row": n, "error": message} (rows numbered from 1).
+    """
+    enrollments = {e.pk: e for e in Enrollment.objects.filter(course=exam.course).select_related('student', 'course')}
+    by_roll_no = {e.student.roll_no: e.pk for e in enrollments.values()}
+
+    parsed, errors, seen = {}, [], {}
+    for number, row in enumerate(rows, start=1):
+        try:
+            enrollment_id, marks, remarks = _parse_grade_row(row, exam.total_marks, by_roll_no, enrollments)
+            if enrollment_id in seen:
+                raise ValueError(f"Duplicate of row {seen[enrollment_id]}.")
+        except ValueError as exc:
+            errors.append({"row": number, "error": str(exc)})
+            continue
+        seen[enrollment_id] = number
+        parsed[enrollment_id] = (marks, remarks)
+
+    if not parsed:
+        return 0, 0, errors
+
+    with transaction.atomic():
+        existing = {
+            grade.enrollment_id: grade
+            for grade in Grade.objects.select_for_update().filter(exam=exam, enrollment_id__in=parsed)
+        }
+        before = []
+        for grade in existing.values():
+            grade.exam = exam
+            grade.enrollment = enrollments[grade.enrollment_id]
+            before.append(copy.copy(grade))
+
+        grades = [
+            Grade(exam=exam, enrollment=enrollments[enrollment_id], marks_obtained=marks, remarks=remarks)
+            for enrollment_id, (marks, remarks) in parsed.items()
+        ]
+        Grade.objects.bulk_create(grades, update_conflicts=True, unique_fields=['enrollment', 'exam'],
+                                  update_fields=['marks_obtained', 'remarks'])
+
+        # Signals don't fire for bulk writes: recompute each affected student's CGPA once
+        student_ids = {enrollments[enrollment_id].student_id for enrollment_id in parsed}
+        refresh_student_cgpa(student_ids)
+        invalidate_transcripts(student_ids)
+        invalidate_exam_statistics([exam.pk])
+        if exam.can_students_view():
+            schedule_ranking_refresh(course_ids=[exam.course_id])
+
+        from analytics.signals import record_bulk_write
+        record_bulk_write(Grade, before, grades)
+
+    return len(parsed) - len(existing), len(existing), errors
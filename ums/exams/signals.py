@@ -1,12 +1,159 @@
-from django.db.models.signals import post_save, post_delete
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Grade
-from .services import calculate_student_cgpa
-
-@receiver([post_save, post_delete], sender=Grade)
-def update_student_cgpa(sender, instance, **kwargs):
-    student = instance.enrollment.student
-    cgpa, credits = calculate_student_cgpa(student)
-    student.cgpa = cgpa
-    student.credits_completed = credits
-    student.save(update_fields=['cgpa', 'credits_completed'])
+from courses.models import Course
+from students.models import StudentProfile
+from .grading import invalidate_grading_scales
+from .rankings import schedule_ranking_refresh
+from .models import Exam, Grade, GradingScale, GradingScaleBand
+from enrollments.models import Enrollment
+from .services import (
+    apply_cgpa_delta, apply_cgpa_totals_change, grade_cgpa_contribution, invalidate_exam_statistics,
+    invalidate_transcripts, regrade_stored_results, student_grade_totals,
+)
+
+# Student CGPAs are kept as running totals (StudentProfile.grade_points and
+# credits_completed) of their published grades, adjusted by each grade's
+# change instead of being recomputed from all of the student's grades on
+# every save.
+# `python manage.py verify_student_cgpa` checks them against a full recompute.
+
+def _contribution(grade):
+    try:
+        return grade_cgpa_contribution(grade)
+    except ObjectDoesNotExist:
+        # Related rows already gone (cascading delete)
+        return None
+
+@receiver(pre_save, sender=Grade)
+def capture_previous_grade(sender, instance, raw=False, **kwargs):
+    previous = None
+    if instance.pk and not raw:
+        previous = (Grade.objects.select_related('exam', 'enrollment__course', 'enrollment__student')
+                    .filter(pk=instance.pk).first())
+    instance._cgpa_contribution = _contribution(previous) if previous else None
+
+@receiver(post_save, sender=Grade)
+def update_student_cgpa(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, '_cgpa_contribution', None)
+    after = _contribution(instance)
+    if before:
+        apply_cgpa_delta(before[0], -before[1], -before[2])
+    if after:
+        apply_cgpa_delta(*after)
+    invalidate_transcripts(contribution[0] for contribution in (before, after) if contribution)
+    invalidate_exam_statistics([instance.exam_id])
+    instance._cgpa_contribution = None
+
+@receiver(post_delete, sender=Grade)
+def remove_grade_from_cgpa(sender, instance, **kwargs):
+    invalidate_exam_statistics([instance.exam_id])
+    contribution = _contribution(instance)
+    if contribution:
+        student_id, points, credits = contribution
+        apply_cgpa_delta(student_id, -points, -credits)
+        invalidate_transcripts([student_id])
+
+# Exam total marks, dates and result status (publishing or reopening), course
+# credits and a student's program or batch (which pick the grading scale)
+# change the value of every grade under them:
+# recompute just those grades' totals, one grouped query before and after.
+def _capture_totals(model, fields, grades):
+    def capture(sender, instance, raw=False, **kwargs):
+        instance._cgpa_totals = None
+        if instance.pk and not raw:
+            old = model.objects.filter(pk=instance.pk).values_list(*fields).first()
+            if old is not None and old != tuple(getattr(instance, field) for field in fields):
+                instance._cgpa_totals = student_grade_totals(grades(instance))
+    return capture
+
+def _apply_totals(grades):
+    def apply(sender, instance, raw=False, **kwargs):
+        before = getattr(instance, '_cgpa_totals', None)
+        if before is not None and not raw:
+            after = student_grade_totals(grades(instance))
+            apply_cgpa_totals_change(before, after)
+            invalidate_transcripts(before.keys() | after.keys())
+            instance._cgpa_totals = None
+    return apply
+
+_exam_grades = lambda exam: Grade.objects.filter(exam=exam)
+_course_grades = lambda course: Grade.objects.filter(enrollment__course=course)
+_student_grades = lambda student: Grade.objects.filter(enrollment__student=student)
+
+pre_save.connect(_capture_totals(Exam, ('total_marks', 'date', 'result_status'), _exam_grades), sender=Exam, weak=False,
+                 dispatch_uid='exams-cgpa-exam-total-marks')
+post_save.connect(_apply_totals(_exam_grades), sender=Exam, weak=False, dispatch_uid='exams-cgpa-exam-total-marks')
+pre_save.connect(_capture_totals(Course, ('credits',), _course_grades), sender=Course, weak=False,
+                 dispatch_uid='exams-cgpa-course-credits')
+post_save.connect(_apply_totals(_course_grades), sender=Course, weak=False, dispatch_uid='exams-cgpa-course-credits')
+pre_save.connect(_capture_totals(StudentProfile, ('program_id', 'batch_id'), _student_grades), sender=StudentProfile,
+                 weak=False, dispatch_uid='exams-cgpa-student-scale')
+post_save.connect(_apply_totals(_student_grades), sender=StudentProfile, weak=False,
+                  dispatch_uid='exams-cgpa-student-scale')
+
+# Cached transcripts and rankings only count published results, so publishing,
+# locking or reopening an exam changes them for every student in its course,
+# as does a published exam's total marks or course changing for rankings.
+# Cached exam statistics carry the exam's details and are dropped on any save.
+@receiver(pre_save, sender=Exam)
+def capture_previous_result_status(sender, instance, raw=False, **kwargs):
+    instance._previous_exam = None
+    if instance.pk and not raw:
+        instance._previous_exam = (Exam.objects.filter(pk=instance.pk)
+                                   .values_list('result_status', 'total_marks', 'course_id').first())
+
+@receiver(post_save, sender=Exam)
+def invalidate_exam_caches(sender, instance, raw=False, **kwargs):
+    invalidate_exam_statistics([instance.pk])
+    if not getattr(instance, '_previous_exam', None):
+        return
+    previous, total_marks, course_id = instance._previous_exam
+    if previous != instance.result_status:
+        invalidate_transcripts(Enrollment.objects.filter(course_id=instance.course_id)
+                               .values_list('student_id', flat=True))
+    visible = Exam.VISIBLE_RESULT_STATUSES
+    if (previous in visible) != (instance.result_status in visible):
+        schedule_ranking_refresh(course_ids=[instance.course_id])
+    elif instance.result_status in visible and (total_marks, course_id) != (instance.total_marks, instance.course_id):
+        schedule_ranking_refresh(course_ids={course_id, instance.course_id})
+
+# Grades of a published exam move its course's rankings; a student moving
+# batch moves both batches' rankings.
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def refresh_grade_rankings(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        exam = instance.exam
+    except ObjectDoesNotExist:
+        return  # Related rows already gone (cascading delete)
+    if exam.can_students_view():
+        schedule_ranking_refresh(course_ids=[exam.course_id])
+
+@receiver(pre_save, sender=StudentProfile)
+def capture_previous_batch(sender, instance, raw=False, **kwargs):
+    instance._previous_batch = None
+    if instance.pk and not raw:
+        instance._previous_batch = (StudentProfile.objects.filter(pk=instance.pk)
+                                    .values_list('batch_id').first())
+
+@receiver(post_save, sender=StudentProfile)
+def refresh_batch_rankings(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_batch', None)
+    if previous and previous[0] != instance.batch_id:
+        schedule_ranking_refresh(batch_ids=[previous[0], instance.batch_id])
+
+# A scale change regrades every stored CGPA and counter once it commits
+def _grading_scale_changed(sender, instance, raw=False, **kwargs):
+    invalidate_grading_scales()
+    if not raw:
+        transaction.on_commit(regrade_stored_results)
+
+for model in (GradingScale, GradingScaleBand):
+    post_save.connect(_grading_scale_changed, sender=model, weak=False, dispatch_uid=f'exams-grading-{model.__name__}')
+    post_delete.connect(_grading_scale_changed, sender=model, weak=False, dispatch_uid=f'exams-grading-{model.__name__}')
@@ -1,3 +1,378 @@
+from datetime import date
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.db.models import FloatField, Value
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from academics.models import Batch, Program
+from courses.models import Course
+from enrollments.models import Enrollment
+from exams.grading import DEFAULT_GRADE_SCALE, get_grading_scales, grade_point, invalidate_grading_scales, percentage
+from exams.models import Exam, Grade, GradingScale, GradingScaleBand, Ranking
+from exams.services import calculate_student_cgpa, student_grade_totals
+from exams.utils import grade_point_expression
+from students.models import StudentProfile
+from users.models import User
 
-# Create your tests here.
+
+class RunningCGPATests(TestCase):
+    """StudentProfile's running CGPA totals stay equal to a full recompute through every kind of change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(name='Fall 2025', start_date=date(2025, 9, 1), end_date=date(2026, 1, 31))
+        program = Program.objects.create(batch=batch, name='BSCS')
+        cls.courses = [
+            Course.objects.create(program=program, batch=batch, code=code, name=code, semester=1, credits=credits)
+            for code, credits in (('CS101', 3), ('MA101', 4))
+        ]
+        cls.students = []
+        for i in range(2):
+            user = User.objects.create_user(email=f'student{i}@example.edu', password='x', first_name='S',
+                                            last_name=str(i), role='STUDENT')
+            student = user.student_profile
+            student.batch, student.program = batch, program
+            student.save()
+            cls.students.append(student)
+        cls.enrollments = {
+            (student.pk, course.pk): Enrollment.objects.create(student=student, course=course)
+            for student in cls.students for course in cls.courses
+        }
+
+    def exam(self, course, title='Midterm', total_marks=100, result_status='PUBLISHED'):
+        return Exam.objects.create(course=course, title=title, date=date(2025, 10, 15), total_marks=total_marks,
+                                   result_status=result_status)
+
+    def grade(self, exam, student, marks):
+        return Grade.objects.create(exam=exam, enrollment=self.enrollments[student.pk, exam.course_id],
+                                    marks_obtained=marks)
+
+    def assertTotalsMatchRecompute(self):
+        for student in StudentProfile.objects.filter(pk__in=[s.pk for s in self.students]):
+            points, credits = student_grade_totals(Grade.objects.filter(enrollment__student=student)).get(
+                student.pk, (0.0, 0))
+            self.assertAlmostEqual(student.grade_points, points, places=6)
+            self.assertEqual(student.credits_completed, credits)
+            self.assertEqual((student.cgpa, student.credits_completed), calculate_student_cgpa(student))
+
+    def test_grade_save_edit_and_delete(self):
+        cs, math = self.courses
+        first, second = self.students
+        midterm, quiz = self.exam(cs), self.exam(math, title='Quiz', total_marks=20)
+        grade = self.grade(midterm, first, 91)
+        self.grade(midterm, second, 58)
+        self.grade(quiz, first, 13)
+        self.assertTotalsMatchRecompute()
+        self.assertGreater(StudentProfile.objects.get(pk=first.pk).credits_completed, 0)
+
+        grade.marks_obtained = 64
+        grade.save()
+        self.assertTotalsMatchRecompute()
+        grade.delete()
+        self.assertTotalsMatchRecompute()
+
+    def test_exam_total_marks_and_course_credits_changes(self):
+        cs, math = self.courses
+        midterm, quiz = self.exam(cs), self.exam(math, title='Quiz', total_marks=20)
+        for student, marks in zip(self.students, (72, 45)):
+            self.grade(midterm, student, marks)
+            self.grade(quiz, student, marks / 5)
+
+        midterm.total_marks = 80
+        midterm.save()
+        self.assertTotalsMatchRecompute()
+        math.credits = 2
+        math.save()
+        self.assertTotalsMatchRecompute()
+
+    def test_only_published_results_count(self):
+        cs, math = self.courses
+        first, second = self.students
+        draft = self.exam(cs, result_status='DRAFT')
+        self.grade(draft, first, 88)
+        self.grade(self.exam(math), second, 70)
+        self.assertTotalsMatchRecompute()
+        self.assertEqual(StudentProfile.objects.get(pk=first.pk).credits_completed, 0)
+
+        draft.result_status = 'PUBLISHED'
+        draft.save()
+        self.assertTotalsMatchRecompute()
+        self.assertEqual(StudentProfile.objects.get(pk=first.pk).credits_completed, cs.credits)
+
+        draft.result_status = 'DRAFT'
+        draft.save()
+        self.assertTotalsMatchRecompute()
+        self.assertEqual(StudentProfile.objects.get(pk=first.pk).credits_completed, 0)
+
+    def test_saving_a_stale_profile_keeps_the_totals(self):
+        cs, _ = self.courses
+        first, _ = self.students
+        stale = StudentProfile.objects.get(pk=first.pk)
+        self.grade(self.exam(cs), first, 91)
+
+        stale.section = 'B'
+        stale.save()
+        self.assertTotalsMatchRecompute()
+        student = StudentProfile.objects.get(pk=first.pk)
+        self.assertEqual((student.section, student.credits_completed), ('B', cs.credits))
+
+
+class GradingScaleTests(TestCase):
+    """Scale selection, and bisect, searchsorted and the SQL CASE grading every mark alike."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(name='Fall 2025', start_date=date(2025, 9, 1), end_date=date(2026, 1, 31))
+        cls.program, cls.other_program = (Program.objects.create(batch=cls.batch, name=name)
+                                          for name in ('BSCS', 'BBA'))
+        cls.course = Course.objects.create(program=cls.program, batch=cls.batch, code='CS101', name='Intro',
+                                           semester=1)
+        cls.campus = cls.scale('Campus', date(2025, 1, 1), [(90, 4.0), (50, 2.0)])
+        cls.for_batch = cls.scale('Batch', date(2025, 10, 1), [(60, 3.0)], batch=cls.batch)
+        cls.for_program = cls.scale('Program', date(2025, 9, 1), [(70, 4.0), (40, 1.0)], program=cls.program)
+
+    @classmethod
+    def scale(cls, name, effective_from, bands, **scope):
+        scale = GradingScale.objects.create(name=name, effective_from=effective_from, **scope)
+        GradingScaleBand.objects.bulk_create(
+            GradingScaleBand(scale=scale, min_percentage=threshold, grade_point=point) for threshold, point in bands)
+        return scale
+
+    def setUp(self):
+        invalidate_grading_scales()
+        # Later tests must not see this test's scales from the process cache
+        self.addCleanup(invalidate_grading_scales)
+
+    def test_scale_selection(self):
+        scales = get_grading_scales()
+        cases = [
+            # program, batch, exam date: the scale that applies
+            (self.program.pk, self.batch.pk, date(2025, 10, 15), self.for_program),  # program before batch
+            (self.other_program.pk, self.batch.pk, date(2025, 10, 15), self.for_batch),
+            (self.other_program.pk, self.batch.pk, date(2025, 9, 15), self.campus),  # batch scale not yet in effect
+            (None, None, date(2025, 10, 15), self.campus),
+            (None, None, date(2024, 12, 1), None),  # before every scale
+        ]
+        for program_id, batch_id, on_date, expected in cases:
+            with self.subTest(program_id=program_id, batch_id=batch_id, on_date=on_date):
+                self.assertEqual(scales.scale_for(program_id, batch_id, on_date).pk, expected and expected.pk)
+        self.assertEqual(scales.scale_for(on_date=date(2024, 12, 1)).grade_point(85), dict(DEFAULT_GRADE_SCALE)[85])
+
+    def test_compiled_forms_agree_at_band_edges(self):
+        thresholds = sorted({threshold for threshold, _ in DEFAULT_GRADE_SCALE} | {40, 50, 60, 70, 90})
+        percents = [0.0, 100.0] + [p + d for p in thresholds for d in (-1e-9, 0.0, 1e-9)]
+        scales = get_grading_scales()
+        for scale in [*scales.scales, scales.default]:
+            with self.subTest(scale=scale.pk):
+                by_bisect = [scale.grade_point(p) for p in percents]
+                by_searchsorted = scale.grade_points(np.array(percents)).tolist()
+                row = GradingScale.objects.values_list(*(
+                    scale.expression(Value(p, output_field=FloatField())) for p in percents)).first()
+                self.assertEqual(by_bisect, by_searchsorted)
+                self.assertEqual(by_bisect, list(row))
+
+    def test_grades_are_graded_alike_in_python_numpy_and_sql(self):
+        students = []
+        for i, (program, batch) in enumerate(((self.program, self.batch), (self.other_program, self.batch),
+                                              (None, None))):
+            user = User.objects.create_user(email=f'student{i}@example.edu', password='x', first_name='S',
+                                            last_name=str(i), role='STUDENT')
+            student = user.student_profile
+            student.program, student.batch = program, batch
+            student.save()
+            students.append(Enrollment.objects.create(student=student, course=self.course))
+        for day in (date(2024, 12, 1), date(2025, 9, 15), date(2025, 10, 15)):
+            exam = Exam.objects.create(course=self.course, title=str(day), date=day, total_marks=80)
+            for enrollment, marks in zip(students, (32, 48, 56)):
+                Grade.objects.create(exam=exam, enrollment=enrollment, marks_obtained=marks)
+
+        grades = list(Grade.objects.select_related('exam', 'enrollment__student')
+                      .annotate(sql_point=grade_point_expression()).order_by('pk'))
+        by_bisect = [grade_point(grade) for grade in grades]
+        by_searchsorted = get_grading_scales().grade_points(
+            [percentage(grade.marks_obtained, grade.exam.total_marks) for grade in grades],
+            np.array([grade.enrollment.student.program_id or 0 for grade in grades]),
+            np.array([grade.enrollment.student.batch_id or 0 for grade in grades]),
+            np.array([grade.exam.date for grade in grades], dtype='datetime64[D]'),
+        ).tolist()
+        self.assertEqual(by_bisect, by_searchsorted)
+        self.assertEqual(by_bisect, [grade.sql_point for grade in grades])
+        self.assertEqual(len(set(by_bisect)), 5)
+
+    def test_scopes_are_unique_per_date_even_when_unset(self):
+        with self.assertRaises(IntegrityError):
+            GradingScale.objects.create(name='Campus again', effective_from=self.campus.effective_from)
+
+
+class BulkGradeUploadTests(TestCase):
+    """POST /api/exams/<id>/grades/bulk/ with JSON and CSV bodies."""
+
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(name='Fall 2025', start_date=date(2025, 9, 1), end_date=date(2026, 1, 31))
+        program = Program.objects.create(batch=batch, name='BSCS')
+        cls.faculty = User.objects.create_user(email='faculty@example.edu', password='x', first_name='F',
+                                               last_name='L', role='FACULTY')
+        course = Course.objects.create(program=program, batch=batch, code='CS101', name='Intro', semester=1,
+                                       credits=3, faculty=cls.faculty)
+        cls.exam = Exam.objects.create(course=course, title='Midterm', date=date.today(), total_marks=50)
+        cls.enrollments = []
+        for i in range(3):
+            user = User.objects.create_user(email=f'student{i}@example.edu', password='x', first_name='S',
+                                            last_name=str(i), role='STUDENT')
+            cls.enrollments.append(Enrollment.objects.create(student=user.student_profile, course=course))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.faculty)
+        self.url = reverse('bulk-grade-upload', args=[self.exam.pk])
+
+    def marks(self):
+        return dict(Grade.objects.filter(exam=self.exam).values_list('enrollment_id', 'marks_obtained'))
+
+    def test_json_rows(self):
+        first, second, _ = self.enrollments
+        response = self.client.post(self.url, {'grades': [
+            {'enrollment': first.pk, 'marks_obtained': 41},
+            {'roll_no': second.student.roll_no, 'marks_obtained': '37.5', 'remarks': 'Late'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'created': 2, 'updated': 0, 'errors': []})
+        self.assertEqual(self.marks(), {first.pk: 41, second.pk: 37.5})
+
+    def test_csv_body_and_file(self):
+        first, second, third = self.enrollments
+        body = f"roll_no,marks_obtained,remarks\n{first.student.roll_no},12,\n{second.student.roll_no},50,Top\n"
+        response = self.client.post(self.url, body, content_type='text/csv')
+        self.assertEqual(response.data, {'created': 2, 'updated': 0, 'errors': []})
+
+        upload = SimpleUploadedFile('grades.csv', f"enrollment,marks_obtained\n{third.pk},0\n".encode('utf-8-sig'))
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.data, {'created': 1, 'updated': 0, 'errors': []})
+        self.assertEqual(self.marks(), {first.pk: 12, second.pk: 50, third.pk: 0})
+
+    def test_invalid_rows_are_reported_and_the_rest_saved(self):
+        first, second, _ = self.enrollments
+        response = self.client.post(self.url, [
+            {'enrollment': first.pk, 'marks_obtained': 30},
+            {'enrollment': second.pk, 'marks_obtained': 'NaN'},
+            {'enrollment': second.pk, 'marks_obtained': 'inf'},
+            {'enrollment': second.pk, 'marks_obtained': 51},
+            {'enrollment': second.pk, 'marks_obtained': -1},
+            {'roll_no': 'NOBODY', 'marks_obtained': 10},
+            {'marks_obtained': 10},
+            {'enrollment': first.pk, 'marks_obtained': 20},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 0))
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(self.marks(), {first.pk: 30})
+
+    def test_only_invalid_rows_is_a_bad_request(self):
+        response = self.client.post(self.url, [{'enrollment': self.enrollments[0].pk, 'marks_obtained': 'nan'}],
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.marks(), {})
+
+    def test_second_upload_updates_in_place(self):
+        first, second, _ = self.enrollments
+        rows = [{'enrollment': first.pk, 'marks_obtained': 25}, {'enrollment': second.pk, 'marks_obtained': 35}]
+        self.client.post(self.url, rows, format='json')
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.data, {'created': 0, 'updated': 2, 'errors': []})
+
+        rows[0]['marks_obtained'] = 45
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.data, {'created': 0, 'updated': 2, 'errors': []})
+        self.assertEqual(Grade.objects.filter(exam=self.exam).count(), 2)
+        self.assertEqual(self.marks(), {first.pk: 45, second.pk: 35})
+        self.assertEqual(StudentProfile.objects.get(pk=first.student_id).credits_completed, 0)  # exam still DRAFT
+
+
+class RankingTests(TestCase):
+    """Course and batch rankings from published results, refreshed on commit by the signals."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(name='Fall 2025', start_date=date(2025, 9, 1), end_date=date(2026, 1, 31))
+        cls.other_batch = Batch.objects.create(name='Spring 2026', start_date=date(2026, 2, 1),
+                                               end_date=date(2026, 6, 30))
+        program = Program.objects.create(batch=cls.batch, name='BSCS')
+        cls.course = Course.objects.create(program=program, batch=cls.batch, code='CS101', name='Intro', semester=1)
+        cls.enrollments = []
+        for i in range(4):
+            user = User.objects.create_user(email=f'student{i}@example.edu', password='x', first_name='S',
+                                            last_name=str(i), role='STUDENT')
+            student = user.student_profile
+            student.batch = cls.batch
+            student.save()
+            cls.enrollments.append(Enrollment.objects.create(student=student, course=cls.course))
+
+    def exam(self, marks, total_marks=100, title='Midterm'):
+        with self.captureOnCommitCallbacks(execute=True):
+            exam = Exam.objects.create(course=self.course, title=title, date=date(2025, 10, 15),
+                                       total_marks=total_marks)
+            for enrollment, obtained in zip(self.enrollments, marks):
+                Grade.objects.create(exam=exam, enrollment=enrollment, marks_obtained=obtained)
+        return exam
+
+    def set_status(self, exam, result_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            exam.result_status = result_status
+            exam.save()
+
+    def standings(self, scope='COURSE', scope_id=None):
+        return {
+            student_id: (score, rank, percentile, size)
+            for student_id, score, rank, percentile, size in Ranking.objects.filter(
+                scope=scope, scope_id=scope_id or self.course.pk
+            ).values_list('student_id', 'score', 'rank', 'percentile', 'size')
+        }
+
+    def test_ties_share_a_rank_and_percentiles_are_cumulative(self):
+        first, second, third, fourth = (e.student_id for e in self.enrollments)
+        self.set_status(self.exam([80, 80, 60, 40]), 'PUBLISHED')
+        self.assertEqual(self.standings(), {
+            first: (80.0, 1, 100.0, 4),
+            second: (80.0, 1, 100.0, 4),
+            third: (60.0, 3, 50.0, 4),
+            fourth: (40.0, 4, 25.0, 4),
+        })
+        self.assertEqual(self.standings('BATCH', self.batch.pk), self.standings())
+
+    def test_scores_weigh_exams_by_total_marks(self):
+        first, second, *_ = (e.student_id for e in self.enrollments)
+        self.set_status(self.exam([90, 10]), 'PUBLISHED')
+        self.set_status(self.exam([0, 20], total_marks=20, title='Quiz'), 'PUBLISHED')
+        standings = self.standings()
+        self.assertEqual(standings[first][:2], (75.0, 1))  # 90 / 120
+        self.assertEqual(standings[second][:2], (25.0, 2))  # 30 / 120
+
+    def test_publish_and_reopen_refresh_rankings(self):
+        exam = self.exam([70, 50, 90, 30])
+        self.assertFalse(Ranking.objects.exists())
+        self.set_status(exam, 'PUBLISHED')
+        self.assertEqual(len(self.standings()), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grade = Grade.objects.get(exam=exam, enrollment=self.enrollments[3])
+            grade.marks_obtained = 100
+            grade.save()
+        self.assertEqual(self.standings()[self.enrollments[3].student_id][1], 1)
+
+        self.set_status(exam, 'DRAFT')
+        self.assertFalse(Ranking.objects.exists())
+
+    def test_moving_batch_refreshes_both_batches(self):
+        self.set_status(self.exam([70, 50, 90, 30]), 'PUBLISHED')
+        student = StudentProfile.objects.get(pk=self.enrollments[2].student_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            student.batch = self.other_batch
+            student.save()
+
+        old, new = self.standings('BATCH', self.batch.pk), self.standings('BATCH', self.other_batch.pk)
+        self.assertNotIn(student.pk, old)
+        self.assertEqual(old[self.enrollments[0].student_id][1:], (1, 100.0, 3))
+        self.assertEqual(new, {student.pk: (90.0, 1, 100.0, 1)})
@@ -0,0 +1,235 @@
+"""
+Official transcripts for a whole batch or program.
+
+Students are processed in chunks: each chunk's data is read in three queries
+(students, enrollments, published grades) and graded in this process, then
+the transcripts are rendered and written to storage by a pool of worker
+processes. A run writes <TRANSCRIPTS_DIR>/<run>/<roll_no>.html plus a
+manifest.csv, and stream_bundle() zips a run on the fly without building the
+archive in memory or on disk.
+"""
+import csv
+import hashlib
+import io
+import os
+import re
+import shutil
+import uuid
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from enrollments.models import Enrollment
+from students.models import StudentProfile
+from .grading import get_grading_scales, percentage
+from .models import Exam, Grade
+
+TRANSCRIPTS_DIR = getattr(settings, 'TRANSCRIPTS_DIR', 'transcripts')
+TRANSCRIPT_WORKERS = getattr(settings, 'TRANSCRIPT_WORKERS', os.cpu_count() or 1)
+TRANSCRIPT_CHUNK_SIZE = getattr(settings, 'TRANSCRIPT_CHUNK_SIZE', 500)
+# Largest run the API generates within a request; bigger ones go through generate_transcripts
+TRANSCRIPT_REQUEST_LIMIT = getattr(settings, 'TRANSCRIPT_REQUEST_LIMIT', 200)
+
+MANIFEST_NAME = 'manifest.csv'
+MANIFEST_FIELDS = ['roll_no', 'name', 'file', 'bytes', 'sha256', 'cgpa', 'credits']
+RUN_ID = re.compile(r'^[\w-]+$')
+
+
+def transcript_students(batch_id=None, program_id=None):
+    qs = StudentProfile.objects.order_by('roll_no')
+    if batch_id: qs = qs.filter(batch_id=batch_id)
+    if program_id: qs = qs.filter(program_id=program_id)
+    return qs
+
+
+def _ratio(points, credits):
+    return round(points / credits, 2) if credits > 0 else 0
+
+
+def load_transcripts(student_ids):
+    """
+    Plain, picklable transcript data of `student_ids` from three queries.
+    Only PUBLISHED and LOCKED results are graded, as in student_transcript().
+    """
+    scales = get_grading_scales()
+    students = {
+        row['id']: row for row in StudentProfile.objects.filter(pk__in=student_ids).values(
+            'id', 'roll_no', 'semester', 'program_id', 'batch_id', 'user__first_name', 'user__last_name',
+            'user__email', 'program__name', 'batch__name')
+    }
+    courses = defaultdict(dict)
+    for row in (Enrollment.objects.filter(student_id__in=student_ids)
+                .values('student_id', 'status', 'course_id', 'course__code', 'course__name',
+                        'course__credits', 'course__semester')
+                .order_by('course__semester', 'course__code')):
+        courses[row['student_id']][row['course_id']] = {
+            "code": row['course__code'], "name": row['course__name'], "credits": row['course__credits'],
+            "semester": row['course__semester'], "status": row['status'], "exams": [],
+        }
+    for row in (Grade.objects.filter(enrollment__student_id__in=student_ids,
+                                     exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES)
+                .values('enrollment__student_id', 'enrollment__course_id', 'marks_obtained', 'exam__title',
+                        'exam__exam_type', 'exam__date', 'exam__total_marks')
+                .order_by('exam__date', 'exam_id')):
+        student = students[row['enrollment__student_id']]
+        percent = percentage(row['marks_obtained'], row['exam__total_marks'])
+        courses[student['id']][row['enrollment__course_id']]["exams"].append({
+            "title": row['exam__title'], "exam_type": row['exam__exam_type'], "date": row['exam__date'],
+            "marks": row['marks_obtained'], "total_marks": row['exam__total_marks'], "percent": round(percent, 2),
+            "grade_point": scales.grade_point(percent, student['program_id'], student['batch_id'],
+                                              row['exam__date']),
+        })
+
+    transcripts = []
+    for student_id in student_ids:
+        student = students.get(student_id)
+        if student is None:
+            continue
+        semesters = defaultdict(list)
+        for course in courses[student_id].values():
+            semesters[course["semester"]].append(course)
+        total_points = total_credits = 0
+        terms = []
+        for semester, term_courses in sorted(semesters.items()):
+            # Every published exam counts the course's credits, like StudentProfile.cgpa (exams.services)
+            points = sum(exam["grade_point"] * c["credits"] for c in term_courses for exam in c["exams"])
+            credits = sum(c["credits"] for c in term_courses for _ in c["exams"])
+            terms.append({"semester": semester, "courses": term_courses, "gpa": _ratio(points, credits),
+                          "credits": credits})
+            total_points += points
+            total_credits += credits
+        transcripts.append({
+            "id": student_id,
+            "roll_no": student['roll_no'],
+            "name": f"{student['user__first_name']} {student['user__last_name']}",
+            "email": student['user__email'],
+            "program": student['program__name'],
+            "batch": student['batch__name'],
+            "current_semester": student['semester'],
+            "semesters": terms,
+            "cgpa": _ratio(total_points, total_credits),
+            "credits": total_credits,
+        })
+    return transcripts
+
+
+def render_transcript(transcript, generated_at):
+    return render_to_string('exams/transcript.html', {"t": transcript, "generated_at": generated_at})
+
+
+def _init_worker():
+    # Spawned workers start without Django; forked ones already have it
+    import django
+    django.setup()
+
+
+def _file_name(transcript):
+    try:
+        return f"{get_valid_filename(transcript['roll_no'])}.html"
+    except SuspiciousFileOperation:
+        return f"student-{transcript['id']}.html"
+
+
+def _write_transcript(job):
+    """Render one transcript and store it; runs in a worker process."""
+    transcript, run_dir, generated_at = job
+    content = render_transcript(transcript, generated_at).encode('utf-8')
+    # Storage renames clashing names; the manifest records the stored one
+    name = default_storage.save(f"{run_dir}/{_file_name(transcript)}", ContentFile(content))
+    return {
+        "roll_no": transcript['roll_no'],
+        "name": transcript['name'],
+        "file": os.path.basename(name),
+        "bytes": len(content),
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "cgpa": transcript['cgpa'],
+        "credits": transcript['credits'],
+    }
+
+
+def _chunks(ids, size):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def generate_transcripts(batch_id=None, program_id=None, workers=None, chunk_size=None, progress=None):
+    """
+    Write the transcripts of every student of a batch and/or program and the
+    run's manifest. At most one chunk of students is held in memory. Returns
+    (run_id, manifest rows).
+    """
+    workers = TRANSCRIPT_WORKERS if workers is None else workers
+    chunk_size = chunk_size or TRANSCRIPT_CHUNK_SIZE
+    generated_at = timezone.now()
+    scope = '-'.join(f'{name}{value}' for name, value in (('batch', batch_id), ('program', program_id)) if value)
+    run_id = f"{scope or 'all'}-{generated_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+    run_dir = f'{TRANSCRIPTS_DIR}/{run_id}'
+
+    student_ids = list(transcript_students(batch_id, program_id).values_list('id', flat=True))
+    rows = []
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+    try:
+        for ids in _chunks(student_ids, chunk_size):
+            jobs = [(transcript, run_dir, generated_at) for transcript in load_transcripts(ids)]
+            results = pool.map(_write_transcript, jobs, chunksize=max(1, len(jobs) // (workers * 4))) if pool \
+                else map(_write_transcript, jobs)
+            rows.extend(results)
+            if progress: progress(len(rows), len(student_ids))
+    finally:
+        if pool:
+            pool.shutdown()
+
+    manifest = io.StringIO()
+    writer = csv.DictWriter(manifest, fieldnames=MANIFEST_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    default_storage.save(f'{run_dir}/{MANIFEST_NAME}', ContentFile(manifest.getvalue().encode('utf-8')))
+    return run_id, rows
+
+
+def run_exists(run_id):
+    return bool(RUN_ID.match(run_id)) and default_storage.exists(f'{TRANSCRIPTS_DIR}/{run_id}/{MANIFEST_NAME}')
+
+
+class _ZipSink:
+    """Write-only file object collecting what ZipFile writes, so it can be streamed out."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_bundle(run_id):
+    """Zip archive of a run (manifest first) as a stream of bytes, one file at a time."""
+    run_dir = f'{TRANSCRIPTS_DIR}/{run_id}'
+    with default_storage.open(f'{run_dir}/{MANIFEST_NAME}', 'rb') as fh:
+        manifest = fh.read()
+    files = [row['file'] for row in csv.DictReader(io.StringIO(manifest.decode('utf-8')))]
+
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr(f'{run_id}/{MANIFEST_NAME}', manifest)
+        yield sink.drain()
+        for name in files:
+            with default_storage.open(f'{run_dir}/{name}', 'rb') as src, \
+                    bundle.open(f'{run_id}/{name}', 'w') as dest:
+                shutil.copyfileobj(src, dest, 64 * 1024)
+            yield sink.drain()
+    yield sink.drain()
@@ -2,7 +2,10 @@ from django.urls import path
 from .views import (
     ExamListCreateView, ExamDetailView,
     GradeListCreateView, GradeDetailView, MyGradesView,
-    MyGPAView, PublishExamResultsView, LockExamResultsView
+    MyGPAView, PublishExamResultsView, LockExamResultsView,
+    BulkGradeUploadView, ExamStatisticsView, DepartmentExamStatisticsView,
+    TranscriptRunView, TranscriptBundleView, ExamClashReportView,
+    RankingView
 )
 
 urlpatterns = [
@@ -15,4 +18,12 @@ urlpatterns = [
     path('grades/my/gpa/', MyGPAView.as_view(), name='my-gpa'),
     path('<int:exam_id>/publish/', PublishExamResultsView.as_view(), name='publish-exam-results'),
     path('<int:exam_id>/lock/', LockExamResultsView.as_view(), name='lock-exam-results'),
+    path('<int:exam_id>/grades/bulk/', BulkGradeUploadView.as_view(), name='bulk-grade-upload'),
+    path('<int:exam_id>/stats/', ExamStatisticsView.as_view(), name='exam-statistics'),
+    path('stats/department/<int:department_id>/', DepartmentExamStatisticsView.as_view(),
+         name='department-exam-statistics'),
+    path('rankings/', RankingView.as_view(), name='exam-rankings'),
+    path('clashes/', ExamClashReportView.as_view(), name='exam-clashes'),
+    path('transcripts/', TranscriptRunView.as_view(), name='transcript-runs'),
+    path('transcripts/<slug:run_id>/bundle/', TranscriptBundleView.as_view(), name='transcript-bundle'),
 ]
@@ -1,24 +1,21 @@
+from django.db.models import Case, ExpressionWrapper, F, FloatField, Value, When
+from .grading import get_grading_scales
 
-def percentage_to_grade_point(percentage: float) -> float:
+def percentage_expression(marks='marks_obtained', total_marks='exam__total_marks'):
+    """SQL expression for a Grade's percentage (0 when total_marks is 0)."""
+    return Case(
+        When(**{f'{total_marks}__gt': 0},
+             then=ExpressionWrapper(F(marks) * 100.0 / F(total_marks), output_field=FloatField())),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def grade_point_expression(marks='marks_obtained', total_marks='exam__total_marks',
+                           program='enrollment__student__program_id', batch='enrollment__student__batch_id',
+                           on_date='exam__date'):
     """
-    Converts percentage to grade point based on a standard 4.0 scale.
-    Adjust scale according to university policy if needed.
+    SQL CASE expression giving a Grade's grade point under its grading scale
+    (see exams.grading), so GPAs can be aggregated in the database.
     """
-    if percentage >= 85:
-        return 4.0
-    elif percentage >= 80:
-        return 3.7
-    elif percentage >= 75:
-        return 3.3
-    elif percentage >= 70:
-        return 3.0
-    elif percentage >= 65:
-        return 2.7
-    elif percentage >= 60:
-        return 2.3
-    elif percentage >= 55:
-        return 2.0
-    elif percentage >= 50:
-        return 1.7
-    else:
-        return 0.0
+    return get_grading_scales().expression(percentage_expression(marks, total_marks), program, batch, on_date)
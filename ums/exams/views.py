@@ -1,6 +1,6 @@
 from rest_framework import generics
-from .models import Exam, Grade
-from .serializers import ExamSerializer, GradeSerializer
+from .models import Exam, Grade, Ranking
+from .serializers import ExamSerializer, GradeSerializer, RankingSerializer
 from users.permissions import IsAdmin, IsFaculty, IsStudent
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -12,21 +12,49 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import Exam
 from users.permissions import IsFaculty, IsAdmin
-from notifications.utils import send_notification
+from notifications.utils import send_bulk_notification
 from enrollments.models import Enrollment
-
-
-def perform_create(self, serializer):
-    exam = serializer.save(created_by=self.request.user)
-    # Notify all students enrolled in the course
-    enrollments = Enrollment.objects.filter(course=exam.course)
-    for enrollment in enrollments:
-        send_notification(
-            user=enrollment.student.user,
-            title="New Exam Scheduled",
-            message=f"A new exam '{exam.title}' has been scheduled for {exam.date}.",
-            related_object=exam
-        )
+import csv
+import io
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from rest_framework.parsers import BaseParser, FormParser, JSONParser, MultiPartParser
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import APIException
+from academics.models import Batch
+from courses.models import Course
+from org_structure.models import DepartmentMember
+from .clashes import ClashIndex, proposed_exam_clashes, term_bounds
+from .transcripts import (
+    TRANSCRIPT_REQUEST_LIMIT, generate_transcripts, run_exists, stream_bundle, transcript_students,
+)
+from .services import (
+    bulk_upsert_grades, cached_exam_statistics, cached_student_transcript, rollup_exam_statistics,
+)
+
+
+def _int_param(value, name):
+    """An optional integer request parameter (None when absent); raises ValueError naming it."""
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer.")
+
+
+def _date_param(value, name):
+    """An optional YYYY-MM-DD request parameter (None when absent); raises ValueError naming it."""
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:  # Well formed but impossible, e.g. 2024-02-30
+        parsed = None
+    if parsed is None:
+        raise ValueError(f"{name} must be a valid date (YYYY-MM-DD).")
+    return parsed
 
 
 class PublishExamResultsView(APIView):
@@ -36,17 +64,17 @@ class PublishExamResultsView(APIView):
     permission_classes = [IsFaculty | IsAdmin]
 
     def post(self, request, exam_id):
+        exam = get_object_or_404(Exam, pk=exam_id)
         exam.result_status = 'PUBLISHED'
         exam.save(update_fields=['result_status'])
 
-        enrollments = Enrollment.objects.filter(course=exam.course)
-        for enrollment in enrollments:
-            send_notification(
-                user=enrollment.student.user,
-                title="Exam Results Published",
-                message=f"Your results for '{exam.title}' are now available.",
-                related_object=exam
-            )
+        send_bulk_notification(
+            Enrollment.objects.filter(course_id=exam.course_id),
+            title="Exam Results Published",
+            message=f"Your results for '{exam.title}' are now available.",
+            related_object=exam,
+            user_field='student__user',
+        )
         return Response({"message": f"Results for {exam.title} published."})
 
 
@@ -56,59 +84,302 @@ class LockExamResultsView(APIView):
     """
     permission_classes = [IsAdmin]
     def post(self, request, exam_id):
+        exam = get_object_or_404(Exam, pk=exam_id)
         exam.result_status = 'LOCKED'
         exam.save(update_fields=['result_status'])
 
-        enrollments = Enrollment.objects.filter(course=exam.course)
-        for enrollment in enrollments:
-            send_notification(
-                user=enrollment.student.user,
-                title="Exam Results Locked",
-                message=f"Results for '{exam.title}' are now locked. No further changes will be made.",
-                related_object=exam
-            )
+        send_bulk_notification(
+            Enrollment.objects.filter(course_id=exam.course_id),
+            title="Exam Results Locked",
+            message=f"Results for '{exam.title}' are now locked. No further changes will be made.",
+            related_object=exam,
+            user_field='student__user',
+        )
         return Response({"message": f"Results for {exam.title} locked."})
 
 
+class CSVTextParser(BaseParser):
+    """Raw text/csv request bodies, returned as text."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream.read().decode('utf-8-sig')
+
+
+class BulkGradeUploadView(APIView):
+    """
+    Faculty/Admin: Create or update the grades of a whole exam at once.
+    Accepts JSON (a list of rows, or {"grades": [...]}) or CSV (a text/csv body
+    or a multipart "file") with columns roll_no or enrollment, marks_obtained
+    and remarks. Valid rows are saved; invalid ones are reported per row.
+    """
+    permission_classes = [IsFaculty | IsAdmin]
+    parser_classes = [JSONParser, CSVTextParser, MultiPartParser, FormParser]
+
+    def _rows(self, request):
+        upload = request.FILES.get('file')
+        if upload is not None:
+            return list(csv.DictReader(io.StringIO(upload.read().decode('utf-8-sig'))))
+        data = request.data
+        if isinstance(data, str):
+            return list(csv.DictReader(io.StringIO(data)))
+        if isinstance(data, dict):
+            data = data.get('grades')
+        if isinstance(data, list):
+            return data
+        raise ValueError("Send a list of grades as JSON, or CSV as text/csv or a 'file' upload.")
+
+    def post(self, request, exam_id):
+        exam = get_object_or_404(Exam.objects.select_related('course'), pk=exam_id)
+        if not exam.can_edit_grades():
+            return Response(
+                {"detail": "Cannot add/update grades. Either grading period expired or exam is locked/published."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            rows = self._rows(request)
+        except (ValueError, UnicodeDecodeError, csv.Error) as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, updated, errors = bulk_upsert_grades(exam, rows)
+        return Response(
+            {"created": created, "updated": updated, "errors": errors},
+            status=status.HTTP_400_BAD_REQUEST if errors and not (created or updated) else status.HTTP_200_OK
+        )
+
+
+class ExamStatisticsView(APIView):
+    """
+    Faculty/Admin: Marks distribution of an exam (mean, median, std,
+    percentiles, histogram and pass rate). Cached until its grades change.
+    """
+    permission_classes = [IsFaculty | IsAdmin]
+
+    def get(self, request, exam_id):
+        exam = get_object_or_404(Exam, pk=exam_id)
+        return Response(cached_exam_statistics([exam])[exam.pk])
+
+
+class DepartmentExamStatisticsView(APIView):
+    """
+    Faculty/Admin: Exam statistics of a department's courses, rolled up per
+    course and for the department from the per-exam cached statistics.
+    Optional filters: course_id, result_status.
+    """
+    permission_classes = [IsFaculty | IsAdmin]
+
+    def get(self, request, department_id):
+        params = request.query_params
+        try:
+            course_id = _int_param(params.get('course_id'), 'course_id')
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        result_status = (params.get('result_status') or '').upper()
+        if result_status and result_status not in dict(Exam.RESULT_STATUS):
+            return Response({"detail": f"result_status must be one of {', '.join(dict(Exam.RESULT_STATUS))}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        exams = Exam.objects.filter(course__department_id=department_id).select_related('course').order_by('date', 'id')
+        if course_id is not None: exams = exams.filter(course_id=course_id)
+        if result_status: exams = exams.filter(result_status=result_status)
+
+        exams = list(exams)
+        stats = cached_exam_statistics(exams)
+        courses = {}
+        for exam in exams:
+            courses.setdefault(exam.course, []).append(stats[exam.pk])
+        return Response({
+            "department": department_id,
+            "summary": rollup_exam_statistics(stats.values()),
+            "courses": [
+                {"course": course.pk, "code": course.code, **rollup_exam_statistics(course_stats)}
+                for course, course_stats in courses.items()
+            ],
+            "exams": [stats[exam.pk] for exam in exams],
+        })
+
+
+class TranscriptRunView(APIView):
+    """
+    Admin: POST {"batch_id"} and/or {"program_id"} to generate the official
+    transcripts of those students. Returns the run id, its manifest and the
+    URL of its zip bundle. Runs are rendered in the request, so they are
+    limited to TRANSCRIPT_REQUEST_LIMIT students; larger ones go through the
+    generate_transcripts management command.
+    """
+    permission_classes = [IsAdmin]
+
+    def post(self, request):
+        try:
+            batch_id = _int_param(request.data.get('batch_id'), 'batch_id')
+            program_id = _int_param(request.data.get('program_id'), 'program_id')
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if not (batch_id or program_id):
+            return Response({"detail": "batch_id or program_id is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        students = transcript_students(batch_id, program_id).count()
+        if students > TRANSCRIPT_REQUEST_LIMIT:
+            return Response({"detail": f"{students} students is more than the {TRANSCRIPT_REQUEST_LIMIT} a request "
+                                       f"can generate; use the generate_transcripts management command."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # No worker pool inside a web worker
+        run_id, rows = generate_transcripts(batch_id=batch_id, program_id=program_id, workers=1)
+        return Response({
+            "run": run_id,
+            "transcripts": len(rows),
+            "bundle": request.build_absolute_uri(reverse('transcript-bundle', args=[run_id])),
+            "manifest": rows,
+        }, status=status.HTTP_201_CREATED)
+
+
+class TranscriptBundleView(APIView):
+    """Admin: Download a transcript run as a zip, streamed as it is built."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request, run_id):
+        if not run_exists(run_id):
+            raise Http404("No such transcript run.")
+        response = StreamingHttpResponse(stream_bundle(run_id), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="transcripts-{run_id}.zip"'
+        return response
+
+
+class RankingView(APIView):
+    """
+    Class rank and percentile from published results (see exams.rankings).
+    Students: GET their own rankings, optionally ?course_id= or ?batch_id=
+    Faculty/Admin: GET ?course_id= or ?batch_id= for the class list by rank,
+    optionally ?student_id= for one student (or ?student_id= alone)
+    """
+    permission_classes = [IsStudent | IsFaculty | IsAdmin]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            course_id = _int_param(params.get('course_id'), 'course_id')
+            batch_id = _int_param(params.get('batch_id'), 'batch_id')
+            student_id = _int_param(params.get('student_id'), 'student_id')
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rankings = Ranking.objects.select_related('student')
+        if course_id is not None:
+            rankings = rankings.filter(scope='COURSE', scope_id=course_id)
+        elif batch_id is not None:
+            rankings = rankings.filter(scope='BATCH', scope_id=batch_id)
+
+        if request.user.role == 'STUDENT':
+            rankings = rankings.filter(student__user=request.user)
+        elif student_id is not None:
+            rankings = rankings.filter(student_id=student_id)
+        elif course_id is None and batch_id is None:
+            return Response({"detail": "course_id, batch_id or student_id is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(RankingSerializer(rankings, many=True).data)
+
+
 class MyGPAView(APIView):
     """
-    GET: Returns the GPA for the current semester and overall CGPA for the logged-in student.
+    GET: Returns the GPA for the current semester, the overall CGPA and the
+    per-semester transcript of the logged-in student's published results.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         student = request.user.student_profile
+        transcript = cached_student_transcript(student.pk)
 
-        # Get all grades for this student
-        all_grades = Grade.objects.filter(enrollment__student=student)
-
-        if not all_grades.exists():
+        if not transcript["semesters"]:
             return Response({"message": "No grades available."})
 
-        total_points = 0
-        total_credits = 0
+        current = next((s for s in transcript["semesters"] if s["semester"] == student.semester), None)
+        return Response({
+            "GPA": current["gpa"] if current else transcript["cgpa"],
+            "CGPA": transcript["cgpa"],
+            "credits_completed": transcript["credits_completed"],
+            "semesters": transcript["semesters"],
+        })
 
-        for grade in all_grades:
-            total_points += grade.grade_point()
-            total_credits += grade.enrollment.course.credit_hours
+# EXAMS MANAGEMENT
+class ExamClash(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Some enrolled students already have another exam on this date."
+    default_code = 'exam_clash'
 
-        cgpa = round(total_points / total_credits, 2) if total_credits > 0 else 0
+    def __init__(self, clashes):
+        super().__init__()
+        self.detail = {"detail": self.detail, "clashes": clashes}
 
-        # Optional: calculate GPA for current semester
-        current_semester = student.semester
-        semester_grades = all_grades.filter(enrollment__semester=current_semester)
-        sem_points = sum(g.grade_point() for g in semester_grades)
-        sem_credits = sum(g.enrollment.course.credit_hours for g in semester_grades)
-        gpa = round(sem_points / sem_credits, 2) if sem_credits > 0 else cgpa
 
-        return Response({
-            "GPA": gpa,
-            "CGPA": cgpa,
-            "credits_completed": total_credits
-        })
+class ExamClashCheckMixin:
+    """
+    Rejects scheduling an exam on a date when some of its students already
+    sit another exam that day, unless allow_clashes=true is sent; the clashes
+    are then returned with the saved exam as a warning.
+    """
+    clashes = ()
+
+    def check_clashes(self, serializer):
+        instance = serializer.instance
+        course = serializer.validated_data.get('course') or instance.course
+        on_date = serializer.validated_data.get('date') or instance.date
+        if instance and course == instance.course and on_date == instance.date:
+            return
+        self.clashes = proposed_exam_clashes(course, on_date, exclude_exam_id=instance.pk if instance else None)
+        allowed = self.request.query_params.get('allow_clashes') or self.request.data.get('allow_clashes')
+        if self.clashes and str(allowed).lower() not in ('1', 'true', 'yes'):
+            raise ExamClash(self.clashes)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.clashes and response.status_code < 300:
+            response.data["clashes"] = self.clashes
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ExamClashReportView(APIView):
+    """
+    Faculty/Admin: Exam clashes, i.e. students with two exams on one date.
+    GET ?course_id=&date= checks a proposed exam (optionally ?exclude_exam_id=)
+    GET ?batch_id= or ?date_from=&date_to= reports the whole timetable
+    """
+    permission_classes = [IsFaculty | IsAdmin]
 
-# EXAMS MANAGEMENT
-class ExamListCreateView(generics.ListCreateAPIView):
+    def get(self, request):
+        params = request.query_params
+        try:
+            course_id = _int_param(params.get('course_id'), 'course_id')
+            batch_id = _int_param(params.get('batch_id'), 'batch_id')
+            exclude = _int_param(params.get('exclude_exam_id'), 'exclude_exam_id')
+            on_date = _date_param(params.get('date'), 'date')
+            date_from = _date_param(params.get('date_from'), 'date_from')
+            date_to = _date_param(params.get('date_to'), 'date_to')
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if course_id is not None:
+            course = get_object_or_404(Course.objects.select_related('batch'), pk=course_id)
+            if on_date is None:
+                return Response({"detail": "date (YYYY-MM-DD) is required with course_id."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            # Index the whole term so the check and the course's timetable share one build
+            index = ClashIndex(*term_bounds(course, on_date), course_ids=(course.pk,))
+            return Response({
+                "course": course.pk,
+                "date": on_date,
+                "clashes": index.clashes_for(course.pk, on_date, exclude),
+            })
+
+        if batch_id is not None:
+            batch = get_object_or_404(Batch, pk=batch_id)
+            date_from, date_to = batch.start_date, batch.end_date
+        if date_from is None or date_to is None:
+            return Response({"detail": "Give course_id and date, batch_id, or date_from and date_to."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(ClashIndex(date_from, date_to).report())
+
+
+class ExamListCreateView(ExamClashCheckMixin, generics.ListCreateAPIView):
     """
     GET: List all exams (Admin, Faculty, Students)
     POST: Create a new exam (Faculty & Admin)
@@ -138,14 +409,23 @@ class ExamListCreateView(generics.ListCreateAPIView):
         return queryset
 
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        self.check_clashes(serializer)
+        exam = serializer.save(created_by=self.request.user)
+        # Notify all students enrolled in the course
+        send_bulk_notification(
+            Enrollment.objects.filter(course_id=exam.course_id),
+            title="New Exam Scheduled",
+            message=f"A new exam '{exam.title}' has been scheduled for {exam.date}.",
+            related_object=exam,
+            user_field='student__user',
+        )
 
     def get_permissions(self):
         if self.request.method == 'POST':
-            return [IsFaculty() | IsAdmin()]
-        return [IsAdmin() | IsFaculty() | IsStudent()]
+            return [(IsFaculty | IsAdmin)()]
+        return [(IsAdmin | IsFaculty | IsStudent)()]
 
-class ExamDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ExamDetailView(ExamClashCheckMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     GET: Retrieve exam details
     PUT/PATCH: Update exam (Faculty & Admin)
@@ -157,12 +437,16 @@ class ExamDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ExamSerializer
     permission_classes = [IsAdmin | IsFaculty]
 
+    def perform_update(self, serializer):
+        self.check_clashes(serializer)
+        serializer.save()
+
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH']:
-            return [IsFaculty() | IsAdmin()]
+            return [(IsFaculty | IsAdmin)()]
         if self.request.method == 'DELETE':
             return [IsAdmin()]
-        return [IsAdmin() | IsFaculty() | IsStudent()]
+        return [(IsAdmin | IsFaculty | IsStudent)()]
 
 # GRADES MANAGEMENT
 class GradeListCreateView(generics.ListCreateAPIView):
@@ -175,8 +459,8 @@ class GradeListCreateView(generics.ListCreateAPIView):
 
     def get_permissions(self):
         if self.request.method == 'POST':
-            return [IsFaculty() | IsAdmin()]
-        return [IsAdmin() | IsFaculty()]
+            return [(IsFaculty | IsAdmin)()]
+        return [(IsAdmin | IsFaculty)()]
 
 class GradeDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -189,10 +473,10 @@ class GradeDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH']:
-            return [IsFaculty() | IsAdmin()]
+            return [(IsFaculty | IsAdmin)()]
         if self.request.method == 'DELETE':
             return [IsAdmin()]
-        return [IsAdmin() | IsFaculty()]
+        return [(IsAdmin | IsFaculty)()]
 
 class MyGradesView(generics.ListAPIView):
     """
@@ -204,5 +488,5 @@ class MyGradesView(generics.ListAPIView):
     def get_queryset(self):
         return Grade.objects.filter(
             enrollment__student=self.request.user.student_profile,
-            exam__result_status__in=['PUBLISHED', 'LOCKED']
+            exam__result_status__in=Exam.VISIBLE_RESULT_STATUSES
         )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from notifications.tasks import GRADING_REMINDER_DAYS, notify_grading_deadline
+
+
+class Command(BaseCommand):
+    help = "Remind faculty of DRAFT exams whose grading deadline is near (safe to re-run the same day)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=GRADING_REMINDER_DAYS,
+                            help="Remind about deadlines this many days away.")
+
+    def handle(self, *args, **options):
+        count = notify_grading_deadline(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Sent {count} grading deadline reminder(s)."))
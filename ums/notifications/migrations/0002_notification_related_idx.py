@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['related_object_type', 'related_object_id'], name='notification_related_idx'),
+        ),
+    ]
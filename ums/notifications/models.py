@@ -24,6 +24,7 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['related_object_type', 'related_object_id'], name='notification_related_idx')]
 
     def __str__(self):
         return f"{self.user.username}: {self.title} ({self.notification_type})"
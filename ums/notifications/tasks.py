@@ -1,20 +1,37 @@
-from datetime import date, timedelta
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.utils import timezone
 from exams.models import Exam
-from notifications.utils import send_notification
+from notifications.models import Notification
+from notifications.utils import _related, send_notifications
 
-def notify_grading_deadline():
-    today = date.today()
-    reminder_date = today + timedelta(days=3)  # 3 days before deadline
+GRADING_REMINDER_DAYS = getattr(settings, 'GRADING_REMINDER_DAYS', 3)  # days before the deadline
+
+def notify_grading_deadline(days=None, today=None):
+    """
+    Remind the creators of DRAFT exams whose grading deadline is `days` away.
+    The exams are selected with one indexed query on Exam.grading_due_date,
+    and a creator already reminded about an exam today is not reminded again.
+    Returns the number of reminders sent.
+    """
+    today = today or timezone.localdate()
+    reminder_date = today + timedelta(days=GRADING_REMINDER_DAYS if days is None else days)
 
     exams = Exam.objects.filter(
         result_status='DRAFT',
-        date__lte=today
-    )
-    for exam in exams:
-        if exam.grading_deadline() == reminder_date:
-            send_notification(
-                user=exam.created_by,
-                title="Grading Deadline Reminder",
-                message=f"Deadline for grading '{exam.title}' is approaching ({exam.grading_deadline()}).",
-                related_object=exam
-            )
+        grading_due_date=reminder_date,
+        created_by__isnull=False,
+    ).only('id', 'title', 'grading_due_date', 'created_by_id')
+    reminders = [
+        Notification(
+            user_id=exam.created_by_id,
+            title="Grading Deadline Reminder",
+            message=f"Deadline for grading '{exam.title}' is approaching ({exam.grading_due_date}).",
+            notification_type='REMINDER',
+            **_related(exam)
+        )
+        for exam in exams
+    ]
+    start_of_day = timezone.make_aware(datetime.combine(today, time.min)) if settings.USE_TZ \
+        else datetime.combine(today, time.min)
+    return len(send_notifications(reminders, dedupe_since=start_of_day))
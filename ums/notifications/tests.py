@@ -1,3 +1,52 @@
+from datetime import date
 from django.test import TestCase
+from academics.models import Batch, Program
+from courses.models import Course
+from exams.models import Exam
+from notifications.models import Notification
+from notifications.tasks import notify_grading_deadline
+from users.models import User
 
-# Create your tests here.
+
+class GradingDeadlineReminderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(name='Fall 2025', start_date=date(2025, 9, 1), end_date=date(2026, 1, 31))
+        program = Program.objects.create(batch=batch, name='BSCS')
+        cls.faculty = User.objects.create_user(email='faculty@example.edu', password='x', first_name='F',
+                                               last_name='L', role='FACULTY')
+        cls.course = Course.objects.create(program=program, batch=batch, code='CS101', name='Intro', semester=1,
+                                           faculty=cls.faculty)
+
+    def bulk_exams(self, *specs):
+        return Exam.objects.bulk_create([
+            Exam(course=self.course, title=title, date=exam_date, grading_deadline_days=days,
+                 result_status=status, created_by=self.faculty)
+            for title, exam_date, days, status in specs
+        ])
+
+    def test_bulk_created_exams_get_a_due_date(self):
+        self.bulk_exams(('Quiz 1', date(2025, 10, 1), 30, 'DRAFT'), ('Quiz 2', date(2025, 10, 2), 15, 'DRAFT'))
+        self.assertEqual(
+            dict(Exam.objects.values_list('title', 'grading_due_date')),
+            {'Quiz 1': date(2025, 10, 31), 'Quiz 2': date(2025, 10, 17)},
+        )
+
+    def test_queryset_updates_keep_the_due_date_in_step(self):
+        self.bulk_exams(('Quiz 1', date(2025, 10, 1), 30, 'DRAFT'))
+        Exam.objects.update(grading_deadline_days=10)
+        self.assertEqual(Exam.objects.get().grading_due_date, date(2025, 10, 11))
+        Exam.objects.update(date=date(2025, 11, 1))
+        self.assertEqual(Exam.objects.get().grading_due_date, date(2025, 11, 11))
+
+    def test_reminds_draft_exams_due_in_n_days_once(self):
+        self.bulk_exams(
+            ('Due', date(2025, 10, 1), 30, 'DRAFT'),
+            ('Published', date(2025, 10, 1), 30, 'PUBLISHED'),
+            ('Later', date(2025, 10, 2), 30, 'DRAFT'),
+        )
+        self.assertEqual(notify_grading_deadline(days=3, today=date(2025, 10, 28)), 1)
+        self.assertEqual(notify_grading_deadline(days=3, today=date(2025, 10, 28)), 0)
+        reminder = Notification.objects.get()
+        self.assertEqual(reminder.user, self.faculty)
+        self.assertEqual(reminder.related_object_id, Exam.objects.get(title='Due').pk)
@@ -1,5 +1,14 @@
+from django.conf import settings
 from .models import Notification
 
+NOTIFICATION_BATCH_SIZE = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 1000)
+
+def _related(related_object):
+    return dict(
+        related_object_type=related_object.__class__.__name__ if related_object else None,
+        related_object_id=related_object.id if related_object else None,
+    )
+
 def send_notification(user, title, message, notification_type='INFO', related_object=None):
     """
     Send a notification to a specific user.
@@ -10,6 +19,50 @@ def send_notification(user, title, message, notification_type='INFO', related_ob
         title=title,
         message=message,
         notification_type=notification_type,
-        related_object_type=related_object.__class__.__name__ if related_object else None,
-        related_object_id=related_object.id if related_object else None
+        **_related(related_object)
+    )
+
+def send_bulk_notification(recipients, title, message, notification_type='INFO', related_object=None,
+                           user_field='pk', batch_size=None):
+    """
+    Send the same notification to every user in `recipients`, a queryset of
+    users or of rows pointing at them through `user_field` (e.g.
+    Enrollment.objects.filter(course=course) with user_field='student__user').
+    User ids are read with one query and the notifications inserted with
+    bulk_create; each user is notified once. Returns the number sent.
+    """
+    user_ids = dict.fromkeys(
+        user_id for user_id in recipients.values_list(user_field, flat=True).order_by() if user_id is not None
     )
+    notifications = [
+        Notification(user_id=user_id, title=title, message=message, notification_type=notification_type,
+                     **_related(related_object))
+        for user_id in user_ids
+    ]
+    Notification.objects.bulk_create(notifications, batch_size=batch_size or NOTIFICATION_BATCH_SIZE)
+    return len(notifications)
+
+def send_notifications(notifications, dedupe_since=None, batch_size=None):
+    """
+    Insert `notifications` (unsaved Notification objects, messages may
+    differ) with bulk_create. With `dedupe_since`, a notification is skipped
+    when its user already got one with the same title about the same object
+    since then, so re-running a scheduled job does not repeat itself; that
+    check is one query. Returns the notifications created.
+    """
+    seen = set()
+    if dedupe_since is not None and notifications:
+        seen.update(Notification.objects.filter(
+            created_at__gte=dedupe_since,
+            related_object_type__in={n.related_object_type for n in notifications},
+            related_object_id__in={n.related_object_id for n in notifications},
+            title__in={n.title for n in notifications},
+        ).values_list('user_id', 'title', 'related_object_type', 'related_object_id'))
+    fresh = []
+    for notification in notifications:
+        key = (notification.user_id, notification.title, notification.related_object_type,
+               notification.related_object_id)
+        if key not in seen:
+            seen.add(key)
+            fresh.append(notification)
+    return Notification.objects.bulk_create(fresh, batch_size=batch_size or NOTIFICATION_BATCH_SIZE)
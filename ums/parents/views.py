@@ -3,7 +3,7 @@ from rest_framework.response import Response
 from django.db.models import Avg, Sum
 from .models import ParentProfile, ParentStudentLink
 from students.models import StudentProfile
-from attendance.models import Attendance
+from attendance.models import AttendanceSummary
 from fees.models import Invoice
 from exams.models import Grade
 from notifications.models import Notification
@@ -42,9 +42,10 @@ class ParentStudentDashboardView(generics.RetrieveAPIView):
             return Response({"detail": "Student not linked to your account."}, status=status.HTTP_404_NOT_FOUND)
 
         # Calculate attendance
-        total_attendance = Attendance.objects.filter(enrollment__student=student).count()
-        present_attendance = Attendance.objects.filter(enrollment__student=student, status='PRESENT').count()
-        attendance_percentage = (present_attendance / total_attendance * 100) if total_attendance > 0 else 0
+        attendance = AttendanceSummary.objects.filter(enrollment__student=student).aggregate(
+            total=Sum('total'), present=Sum('present'))
+        total_attendance = attendance['total'] or 0
+        attendance_percentage = (attendance['present'] / total_attendance * 100) if total_attendance > 0 else 0
 
         # Calculate fees due
         total_fees_due = Invoice.objects.filter(student=student, is_paid=False).aggregate(total=Sum('amount'))['total'] or 0
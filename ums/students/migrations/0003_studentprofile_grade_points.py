@@ -0,0 +1,76 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+# The grade scale at the time of this migration, frozen here so later changes
+# to the grading code can't change what it computes: (minimum percentage, grade point)
+GRADE_SCALE = [
+    (85, 4.0),
+    (80, 3.7),
+    (75, 3.3),
+    (70, 3.0),
+    (65, 2.7),
+    (60, 2.3),
+    (55, 2.0),
+    (50, 1.7),
+]
+
+
+def percentage_to_grade_point(percentage):
+    for threshold, point in GRADE_SCALE:
+        if percentage >= threshold:
+            return point
+    return 0.0
+
+
+def compute_grade_totals(apps, schema_editor):
+    Grade = apps.get_model('exams', 'Grade')
+    StudentProfile = apps.get_model('students', 'StudentProfile')
+
+    totals = {}
+    grades = Grade.objects.values_list(
+        'enrollment__student_id', 'marks_obtained', 'exam__total_marks', 'enrollment__course__credits')
+    for student_id, marks, total_marks, credits in grades.iterator(chunk_size=5000):
+        percentage = (marks / total_marks) * 100 if total_marks else 0
+        points, total_credits = totals.get(student_id, (0.0, 0))
+        totals[student_id] = (points + percentage_to_grade_point(percentage) * credits, total_credits + credits)
+
+    for student_id, (points, credits) in totals.items():
+        StudentProfile.objects.filter(pk=student_id).update(
+            grade_points=points,
+            credits_completed=credits,
+            cgpa=round(points / credits, 2) if credits else 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_studentprofile_campus_studentprofile_department'),
+        ('exams', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='grade_points',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='gpa',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='cgpa',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='credits_completed',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(compute_grade_totals, migrations.RunPython.noop),
+    ]
@@ -15,12 +15,23 @@ class StudentProfile(models.Model):
     semester = models.PositiveIntegerField(default=1)
     section = models.CharField(max_length=10, blank=True, null=True)
     admission_date = models.DateField(auto_now_add=True)
-    gpa = models.FloatField(default=0.0)
-    cgpa = models.FloatField(default=0.0)
-    credits_completed = models.PositiveIntegerField(default=0)
+    # Running totals of the student's published grades, only written by exams.services
+    gpa = models.FloatField(default=0.0, editable=False)
+    cgpa = models.FloatField(default=0.0, editable=False)
+    credits_completed = models.PositiveIntegerField(default=0, editable=False)
+    grade_points = models.FloatField(default=0.0, editable=False)  # Sum of credit-weighted grade points (see exams.signals)
     campus = models.ForeignKey(Campus, on_delete=models.SET_NULL, null=True, related_name="students")
     department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, related_name="students")
-    
+
+    GRADE_TOTAL_FIELDS = ('gpa', 'cgpa', 'credits_completed', 'grade_points')
+
+    def save(self, *args, **kwargs):
+        # The grade totals move by F() updates in the database; saving an
+        # instance loaded before one of them must not write its stale copy back.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.GRADE_TOTAL_FIELDS]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} - {self.roll_no}"
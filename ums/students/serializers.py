@@ -19,3 +19,4 @@ class StudentProfileSerializer(serializers.ModelSerializer):
             'gpa', 'cgpa',
             'campus_name', 'department_name',
         ]
+        read_only_fields = ['gpa', 'cgpa']
@@ -101,6 +101,18 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Cache used by the analytics dashboards (TTL + LRU eviction via MAX_ENTRIES).
+# Point this at a shared backend (e.g. Redis) when running several workers,
+# so cache invalidation reaches all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ums-default',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
 
 WSGI_APPLICATION = 'ums.wsgi.application'
 
@@ -162,6 +174,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Generated files (e.g. transcripts)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 